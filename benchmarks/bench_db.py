@@ -0,0 +1,132 @@
+"""测量 database.py 的批量写入和常用查询速度
+
+在临时数据库中写入若干播客和节目，分别测量首次插入、重复写入（更新）、下载状态批量更新，
+以及分页、历史 JSON、播客汇总、全文搜索和待下载查询的每秒次数，并检查含重复地址的批量写入计数。
+另在 10 万个节目的库上测量各类搜索词（单字、两字、短英文前缀、长短混合）的单次耗时，
+并检查每条结果都带有高亮。
+
+用法: python -m benchmarks.bench_db [节目数] [播客数]
+"""
+import sys
+from benchmarks.common import best_of, isolated_library, rate, save_results
+
+QUERY_REPEAT = 200
+# 搜索在 10 万个节目的库上单次查询的目标耗时（毫秒）
+SEARCH_TARGET_MS = 10
+SEARCH_QUERIES = {
+    'single_char': '期',
+    'two_chars': '简介',
+    'short_latin': 'be',
+    'long': 'benchmark7',
+    'mixed': '123 期',
+    'mixed_short': 'benchmark7 节目',
+}
+
+def make_episodes(podcast_id, count, generation=0):
+    from models.podcast_models import PodcastEpisode
+    return [
+        PodcastEpisode(
+            title=f'播客 {podcast_id} 第 {index} 期 性能测试节目 {generation}',
+            url=f'https://cdn.example.com/{podcast_id}/{index}.mp3',
+            audio_url=f'https://cdn.example.com/{podcast_id}/{index}.mp3',
+            description=f'第 {index} 期的节目简介，包含一些可以被搜索到的关键词 benchmark{index % 50}',
+            podcast_id=podcast_id,
+            index=index
+        )
+        for index in range(count)
+    ]
+
+def run(episode_count=20000, podcast_count=10):
+    import database
+    from models.podcast_models import Podcast
+
+    results = {'episodes': episode_count, 'podcasts': podcast_count}
+    per_podcast = max(1, episode_count // podcast_count)
+    with isolated_library():
+        podcast_ids = [
+            database.insert_or_update_podcast(Podcast(name=f'基准测试播客 {i}', url=f'https://castbox.fm/channel/bench{i}'))
+            for i in range(podcast_count)
+        ]
+        batches = {podcast_id: make_episodes(podcast_id, per_podcast) for podcast_id in podcast_ids}
+        total = per_podcast * len(podcast_ids)
+
+        def upsert_all(generation):
+            for podcast_id in podcast_ids:
+                episodes = batches[podcast_id] if generation == 0 else make_episodes(podcast_id, per_podcast, generation)
+                database.upsert_episodes(podcast_id, episodes)
+
+        seconds, _ = best_of(1, lambda: upsert_all(0))
+        results['upsert_insert_rows_per_sec'] = rate(total, seconds)
+        seconds, _ = best_of(1, lambda: upsert_all(1))
+        results['upsert_update_rows_per_sec'] = rate(total, seconds)
+
+        # 模拟下载状态写入器的一批更新
+        updates = [
+            {'url': f'https://cdn.example.com/{podcast_ids[0]}/{index}.mp3', 'downloaded': True,
+             'download_path': f'/tmp/{index}.mp3', 'file_size': 1024, 'file_hash': 'x' * 64}
+            for index in range(min(per_podcast, 1000))
+        ]
+        seconds, _ = best_of(3, lambda: database.apply_download_updates(updates))
+        results['download_updates_rows_per_sec'] = rate(len(updates), seconds)
+
+        queries = {
+            'episodes_page': lambda: database.get_episodes_page(limit=100),
+            'episodes_page_podcast': lambda: database.get_episodes_page(podcast_id=podcast_ids[-1], limit=100),
+            'history_page_json': lambda: database.get_history_page_json(limit=100),
+            'podcast_summaries': database.get_podcast_summaries,
+            'search': lambda: database.search_episodes('benchmark7 节目'),
+            'pending_episodes': lambda: database.get_pending_episodes(limit=100),
+            'episode_by_id': lambda: database.get_episode_by_id(total // 2),
+        }
+        for name, query in queries.items():
+            seconds, _ = best_of(3, lambda: [query() for _ in range(QUERY_REPEAT)])
+            results[f'{name}_per_sec'] = rate(QUERY_REPEAT, seconds)
+
+        # 正确性检查：同一批中地址重复的节目只计一次，其他播客已有的地址在本播客中算新增
+        check_id = database.insert_or_update_podcast(Podcast(name='重复地址检查', url='https://castbox.fm/channel/dup'))
+        episodes = make_episodes(check_id, 2) + make_episodes(check_id, 1, 'dup') + make_episodes(podcast_ids[0], 1)
+        for expected in ((3, 0), (0, 3)):
+            counts = database.upsert_episodes(check_id, episodes)
+            if counts != expected:
+                raise AssertionError(f'含重复地址的批量写入返回 {counts}，应为 {expected}')
+    return results
+
+def run_search(episode_count=100000, podcast_count=10):
+    """在 episode_count 个节目的库上测量每类搜索词的单次耗时（毫秒），结果缺少高亮时报错"""
+    import database
+    from models.podcast_models import Podcast
+
+    results = {'episodes': episode_count}
+    per_podcast = max(1, episode_count // podcast_count)
+    with isolated_library():
+        for i in range(podcast_count):
+            podcast_id = database.insert_or_update_podcast(
+                Podcast(name=f'基准测试播客 {i}', url=f'https://castbox.fm/channel/bench{i}'))
+            database.upsert_episodes(podcast_id, make_episodes(podcast_id, per_podcast))
+
+        for name, query in SEARCH_QUERIES.items():
+            found = database.search_episodes(query)
+            if not found:
+                raise AssertionError(f'搜索 {query!r} 没有结果')
+            for episode in found:
+                if '<mark>' not in (episode['title_highlight'] or '') + (episode['description_snippet'] or ''):
+                    raise AssertionError(f'搜索 {query!r} 的结果 {episode["id"]} 没有高亮')
+            seconds, _ = best_of(3, lambda: [database.search_episodes(query) for _ in range(QUERY_REPEAT)])
+            results[f'search_{name}_ms'] = round(seconds / QUERY_REPEAT * 1000, 3)
+    results['search_over_target'] = [
+        name for name in SEARCH_QUERIES if results[f'search_{name}_ms'] > SEARCH_TARGET_MS
+    ]
+    return results
+
+def main():
+    episode_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    podcast_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    results = run(episode_count, podcast_count)
+    results['search_scale'] = run_search()
+    for name, value in results.items():
+        print(f'{name:>36}: {value}')
+    print(f"结果已保存: {save_results('db', results)}")
+    return results
+
+if __name__ == '__main__':
+    main()
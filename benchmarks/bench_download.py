@@ -0,0 +1,108 @@
+"""测量 PodcastDownloader.download_episodes 在本地 CDN 上的吞吐量
+
+每个场景使用独立的临时数据库和下载目录：写入一批待下载节目（音频地址指向 benchmarks.fake_cdn），
+调用 download_episodes 下载全部节目，等待下载状态写入数据库后统计耗时、吞吐量和成功/失败数。
+开启自适应并发时并发数从“并发数”参数开始调整，结果中记录结束时的并发数和调整次数。
+带 primary/mirror 的场景为每个节目再登记一个 localhost 上的镜像地址，测量对冲请求和中途切换。
+
+用法: python -m benchmarks.bench_download [节目数] [文件大小KB] [并发数]
+"""
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+from benchmarks.common import isolated_library, rate, save_results
+from benchmarks.fake_cdn import FakeCDN
+
+# 场景名 -> FakeCDN 参数
+SCENARIOS = {
+    'local': {},
+    'ttfb_100ms': {'latency': 0.1},
+    'bandwidth_4mbps': {'bandwidth': 512 * 1024},
+    'errors_10pct': {'error_rate': 0.1},
+    'resets_10pct': {'error_rate': 0.1, 'error_mode': 'reset'},
+    'slow_primary_mirror': {'primary': {'latency': 0.5}, 'mirror': {}},
+    'stalled_primary_mirror': {'primary': {'stall': 5}, 'mirror': {}},
+    'throttled_above_4': {'bandwidth': 512 * 1024, 'max_streams': 4},
+}
+
+# 镜像场景中判定传输卡住的时间（秒），远小于默认值以免测量时间过长
+MIRROR_STALL_TIMEOUT = 1.0
+
+def run_scenario(name, options, episode_count, size, workers):
+    import database
+    from core.config import Config
+    from core.downloader import PodcastDownloader
+    from models.podcast_models import Podcast, PodcastEpisode
+
+    options = dict(options)
+    primary_params = options.pop('primary', {})
+    mirror_params = options.pop('mirror', None)
+    with isolated_library(), FakeCDN(audio_size=size, **options) as cdn:
+        podcast_id = database.insert_or_update_podcast(Podcast(name=f'下载基准 {name}', url=cdn.base_url + '/channel/bench'))
+        audio_urls = [cdn.audio_url(f'{name}-{index}', **primary_params) for index in range(episode_count)]
+        database.upsert_episodes(podcast_id, [
+            PodcastEpisode(title=f'{name} 第 {index} 期', url=audio_url, audio_url=audio_url,
+                           podcast_id=podcast_id, index=index)
+            for index, audio_url in enumerate(audio_urls)
+        ])
+        if mirror_params is not None:
+            database.save_audio_candidates({
+                audio_url: [cdn.audio_url(f'{name}-{index}', host='localhost', **mirror_params)]
+                for index, audio_url in enumerate(audio_urls)
+            })
+
+        saved_workers = Config.MAX_WORKERS
+        Config.MAX_WORKERS = workers
+        try:
+            downloader = PodcastDownloader()
+        finally:
+            Config.MAX_WORKERS = saved_workers
+        if mirror_params is not None:
+            downloader.stall_timeout = MIRROR_STALL_TIMEOUT
+        episodes = database.get_pending_episodes(podcast_id)
+
+        started = time.perf_counter()
+        # download_episodes 会逐个打印结果，测量时不输出
+        with redirect_stdout(io.StringIO()):
+            downloader.download_episodes(episodes)
+        transfer_seconds = time.perf_counter() - started
+        downloader.state_writer.flush(timeout=30)
+        seconds = time.perf_counter() - started
+
+        downloaded = database.get_downloaded_episodes(podcast_id)
+        downloaded_bytes = sum(episode.file_size or 0 for episode in downloaded)
+        return {
+            'episodes': episode_count,
+            'file_bytes': size,
+            'workers': workers,
+            'seconds': round(seconds, 3),
+            'transfer_seconds': round(transfer_seconds, 3),
+            'succeeded': len(downloaded),
+            'failed': episode_count - len(downloaded),
+            'files_per_sec': rate(len(downloaded), seconds),
+            'mib_per_sec': rate(downloaded_bytes / (1024 * 1024), seconds),
+            'server_requests': cdn.requests,
+            'final_concurrency': downloader.concurrency.limit if downloader.concurrency else workers,
+            'concurrency_changes': len(downloader.concurrency.decisions) if downloader.concurrency else 0,
+        }
+
+def run(episode_count=30, size_kb=1024, workers=3, scenarios=None):
+    results = {}
+    for name in scenarios or SCENARIOS:
+        results[name] = run_scenario(name, SCENARIOS[name], episode_count, size_kb * 1024, workers)
+    return results
+
+def main():
+    episode_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    size_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    results = run(episode_count, size_kb, workers)
+    for name, result in results.items():
+        print(f"{name:>16}: {result['seconds']:>7.2f} 秒, {result['mib_per_sec']} MiB/秒, "
+              f"成功 {result['succeeded']}, 失败 {result['failed']}")
+    print(f"结果已保存: {save_results('download', results)}")
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""测量播客提取器的速度
+
+- extract_audio_url：在仿 castbox 节目页上测量每秒提取次数，分别覆盖命中通用 MP3 模式、
+  只能从 <audio> 标签找到，以及找不到音频地址（所有模式都扫描整页）三种情况
+- get_episodes_list：用 Playwright 抓取本地仿 castbox 频道站点的总耗时（未安装 Playwright 时跳过）
+
+用法: python -m benchmarks.bench_extractor [节目页数] [页面大小KB]
+"""
+import asyncio
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+from benchmarks.common import rate, save_results
+from benchmarks.fake_cdn import FakeCDN, episode_page
+
+EXTRACT_REPEAT = 200
+
+def make_pages(filler_kb):
+    """生成三种节目页：通用 MP3 链接、仅 <audio> 标签、没有音频地址"""
+    page = episode_page('http://127.0.0.1:8765', 'bench', 1, filler_kb)
+    audio_tag = page.replace('http://127.0.0.1:8765/audio/bench-1.mp3', 'blob:stream-1').replace(
+        '</body>', '<audio controls src="/stream/1"></audio></body>')
+    missing = page.replace('http://127.0.0.1:8765/audio/bench-1.mp3', '')
+    return {'mp3_link': page, 'audio_tag': audio_tag, 'missing': missing}
+
+def bench_extract_audio_url(filler_kb=64):
+    from core.podcast_extractor import PodcastExtractor
+
+    async def extract_many(content):
+        started = time.perf_counter()
+        for _ in range(EXTRACT_REPEAT):
+            await PodcastExtractor.extract_audio_url(content)
+        return time.perf_counter() - started
+
+    results = {}
+    for name, content in make_pages(filler_kb).items():
+        seconds = min(asyncio.run(extract_many(content)) for _ in range(3))
+        results[f'{name}_per_sec'] = rate(EXTRACT_REPEAT, seconds)
+    results['page_bytes'] = len(make_pages(filler_kb)['mp3_link'].encode('utf-8'))
+    return results
+
+def bench_get_episodes_list(episode_count=20):
+    """抓取本地频道站点，返回耗时；未安装 Playwright 或无法启动浏览器时返回跳过原因"""
+    try:
+        import playwright  # noqa: F401
+    except ImportError:
+        return {'skipped': '未安装 playwright'}
+    from core.podcast_extractor import PodcastExtractor
+
+    extractor = PodcastExtractor()
+    # 测试模式只处理前 3 个节目且固定等待，不代表真实耗时
+    extractor.test_mode = False
+    with FakeCDN(channel_episodes=episode_count) as cdn:
+        started = time.perf_counter()
+        try:
+            with redirect_stdout(io.StringIO()):
+                _, episodes = asyncio.run(extractor.get_episodes_list(cdn.base_url + '/channel/bench'))
+        except Exception as e:
+            return {'skipped': f'浏览器运行失败: {e}'}
+        seconds = time.perf_counter() - started
+    return {
+        'episodes': episode_count,
+        'extracted': len(episodes),
+        'seconds': round(seconds, 3),
+        'episodes_per_sec': rate(len(episodes), seconds),
+    }
+
+def run(episode_count=20, filler_kb=64):
+    return {
+        'extract_audio_url': bench_extract_audio_url(filler_kb),
+        'get_episodes_list': bench_get_episodes_list(episode_count),
+    }
+
+def main():
+    episode_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    filler_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    results = run(episode_count, filler_kb)
+    for group, values in results.items():
+        print(f'{group}:')
+        for name, value in values.items():
+            print(f'  {name:>24}: {value}')
+    print(f"结果已保存: {save_results('extractor', results)}")
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""测量流式导入器的速度和内存占用
+
+生成一个带表头的 TSV 节目列表，导入空的临时数据库（全部新增），再导入一次（全部跳过），
+分别给出每秒行数；峰值内存用 tracemalloc 统计 Python 对象，应与文件行数无关。
+
+用法: python -m benchmarks.bench_import [行数] [播客数]
+"""
+import os
+import sys
+import tracemalloc
+from benchmarks.common import best_of, isolated_library, rate, save_results
+
+def write_tsv(path, row_count, podcast_count):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('podcast_name\tpodcast_url\ttitle\turl\n')
+        for index in range(row_count):
+            podcast = index % podcast_count
+            f.write(f'基准测试播客 {podcast}\thttps://castbox.fm/channel/bench{podcast}\t'
+                    f'第 {index} 期 导入性能测试节目\thttps://cdn.example.com/{podcast}/{index}.mp3\n')
+
+def run(row_count=100000, podcast_count=20):
+    from core.importer import LibraryImporter
+
+    results = {'rows': row_count, 'podcasts': podcast_count}
+    with isolated_library() as workdir:
+        path = os.path.join(workdir, 'library.tsv')
+        write_tsv(path, row_count, podcast_count)
+        results['file_bytes'] = os.path.getsize(path)
+
+        tracemalloc.start()
+        seconds, stats = best_of(1, lambda: LibraryImporter().import_file(path))
+        results['peak_python_memory_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+        results['insert_rows_per_sec'] = rate(stats.inserted, seconds)
+
+        seconds, stats = best_of(1, lambda: LibraryImporter().import_file(path))
+        results['skip_rows_per_sec'] = rate(stats.skipped, seconds)
+    return results
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    podcast_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    results = run(row_count, podcast_count)
+    for name, value in results.items():
+        print(f'{name:>28}: {value}')
+    print(f"结果已保存: {save_results('import', results)}")
+    return results
+
+if __name__ == '__main__':
+    main()
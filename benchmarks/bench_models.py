@@ -0,0 +1,124 @@
+"""对比 __slots__ 行模型与旧版 dataclass 模型的转换速度和内存占用
+
+用法: python -m benchmarks.bench_models [行数]
+"""
+import sqlite3
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from models.podcast_models import PodcastEpisode
+
+@dataclass
+class LegacyPodcastEpisode:
+    """旧版 dataclass 节目模型，仅用于对比"""
+    id: Optional[int] = None
+    podcast_id: int = 0
+    title: str = ""
+    url: str = ""
+    audio_url: Optional[str] = None
+    description: Optional[str] = None
+    duration: Optional[str] = None
+    publish_date: Optional[datetime] = None
+    index: int = 0
+    downloaded: bool = False
+    download_path: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'podcast_id': self.podcast_id,
+            'title': self.title,
+            'url': self.url,
+            'audio_url': self.audio_url,
+            'description': self.description,
+            'duration': self.duration,
+            'publish_date': self.publish_date.isoformat() if self.publish_date else None,
+            'index': self.index,
+            'downloaded': self.downloaded,
+            'download_path': self.download_path,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+def legacy_from_row(row):
+    """旧版 database.get_episodes_by_podcast_id 中的转换逻辑"""
+    return LegacyPodcastEpisode(
+        id=row['id'],
+        podcast_id=row['podcast_id'],
+        title=row['title'],
+        url=row['url'],
+        audio_url=row['audio_url'],
+        description=row['description'],
+        duration=row['duration'],
+        publish_date=datetime.fromisoformat(row['publish_date']) if row['publish_date'] else None,
+        index=row['index_number'],
+        downloaded=bool(row['downloaded']),
+        download_path=row['download_path'],
+        created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
+        updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None
+    )
+
+def make_rows(count):
+    """在内存数据库中生成节目行"""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('''
+        CREATE TABLE podcast_episodes (
+            id INTEGER PRIMARY KEY, podcast_id INTEGER, title TEXT, url TEXT, audio_url TEXT,
+            description TEXT, duration TEXT, publish_date TIMESTAMP, index_number INTEGER,
+            downloaded BOOLEAN, download_path TEXT, created_at TIMESTAMP, updated_at TIMESTAMP,
+            file_size INTEGER, file_hash TEXT, download_error TEXT, downloaded_at TIMESTAMP,
+            download_started_at TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO podcast_episodes VALUES (?, 1, ?, ?, ?, NULL, NULL, ?, ?, 0, NULL, ?, ?, NULL, NULL, NULL, NULL, NULL)',
+        [(i, f'节目 {i}', f'https://cdn.example.com/{i}.mp3', f'https://cdn.example.com/{i}.mp3',
+          '2024-01-01 08:00:00', i, '2024-01-02 09:30:00', '2024-01-03 10:45:00')
+         for i in range(count)]
+    )
+    return conn.execute('SELECT * FROM podcast_episodes').fetchall()
+
+def measure(name, rows, build):
+    """测量构建模型和序列化的速度及每行内存"""
+    start = time.perf_counter()
+    models = [build(row) for row in rows]
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for model in models:
+        model.to_dict()
+    dict_seconds = time.perf_counter() - start
+    del models
+
+    tracemalloc.start()
+    models = [build(row) for row in rows]
+    bytes_per_row = tracemalloc.get_traced_memory()[0] / len(rows)
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'build_rows_per_sec': round(len(rows) / build_seconds),
+        'to_dict_rows_per_sec': round(len(rows) / dict_seconds),
+        'bytes_per_row': round(bytes_per_row, 1),
+    }
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = make_rows(count)
+    results = [
+        measure('dataclass', rows, legacy_from_row),
+        measure('slots', rows, PodcastEpisode.from_row),
+    ]
+    for result in results:
+        print(f"{result['name']:>10}: 构建 {result['build_rows_per_sec']:>9} 行/秒, "
+              f"to_dict {result['to_dict_rows_per_sec']:>9} 行/秒, {result['bytes_per_row']:>7} 字节/行")
+    return results
+
+if __name__ == '__main__':
+    main()
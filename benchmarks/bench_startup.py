@@ -0,0 +1,93 @@
+"""测量应用的冷启动导入耗时和内存占用
+
+在子进程中以 python -X importtime 导入目标模块（默认 app），统计总导入耗时、
+累计耗时最高的模块以及导入完成后的常驻内存，并检查不应在启动时加载的重型模块。
+结果以 JSON 追加写入 benchmarks/results/startup.jsonl，便于跟踪变化。
+
+用法: python -m benchmarks.bench_startup [模块名] [重复次数]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+# 启动时不应被导入的模块：只在首次使用时加载
+LAZY_MODULES = ('playwright', 'requests', 'core.downloader', 'core.podcast_extractor',
+                'core.extraction_pool', 'core.archive', 'multiprocessing')
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(PROJECT_DIR, 'benchmarks', 'results', 'startup.jsonl')
+
+# 子进程中执行：导入目标模块后输出已加载的模块和峰值常驻内存（先导入目标模块，避免 json 等计入其耗时）
+PROBE = '''
+import sys
+__import__(sys.argv[1])
+import json, resource
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"modules": sorted(sys.modules), "max_rss_kb": rss_kb}))
+'''
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 {模块名: (自身耗时us, 累计耗时us)}"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+def measure(module):
+    """在全新的解释器中导入一次模块"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, module],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    probe = json.loads(proc.stdout.strip().splitlines()[-1])
+    timings = parse_importtime(proc.stderr)
+    return {
+        'wall_ms': round(wall * 1000, 1),
+        'import_ms': round(timings.get(module, (0, 0))[1] / 1000, 1),
+        'max_rss_mb': round(probe['max_rss_kb'] / 1024, 1),
+        'timings': timings,
+        'loaded_lazy_modules': [m for m in LAZY_MODULES if m in probe['modules'] and m != module],
+    }
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else 'app'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    runs = [measure(module) for _ in range(repeat)]
+    best = min(runs, key=lambda run: run['import_ms'])
+    slowest = sorted(best['timings'].items(), key=lambda item: item[1][1], reverse=True)[:15]
+
+    print(f"模块: {module}，重复 {repeat} 次，取最快一次")
+    print(f"导入耗时: {best['import_ms']} ms，进程总耗时: {best['wall_ms']} ms，峰值内存: {best['max_rss_mb']} MB")
+    print("累计耗时最高的模块:")
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    if best['loaded_lazy_modules']:
+        print(f"警告: 启动时加载了应延迟导入的模块: {', '.join(best['loaded_lazy_modules'])}")
+
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'module': module,
+            'python': sys.version.split()[0],
+            'import_ms': best['import_ms'],
+            'wall_ms': best['wall_ms'],
+            'max_rss_mb': best['max_rss_mb'],
+            'loaded_lazy_modules': best['loaded_lazy_modules'],
+            'slowest': [[name, cumulative_us] for name, (_, cumulative_us) in slowest],
+        }, ensure_ascii=False) + '\n')
+    print(f"结果已追加到 {RESULTS_FILE}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""基准测试的公共工具：隔离的临时数据库/下载目录、计时和结果保存"""
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'results')
+
+@contextmanager
+def isolated_library():
+    """把数据库和下载目录临时指向一个空目录并建表，结束后恢复配置并删除目录
+
+    基准测试不会读写项目自带的 podcasts.db 和 download/。
+    """
+    from core.config import Config
+    from database import init_db, close_db_connection
+
+    workdir = tempfile.mkdtemp(prefix='podcast-bench-')
+    saved = (Config.DATABASE_PATH, Config.DOWNLOAD_DIR)
+    Config.DATABASE_PATH = os.path.join(workdir, 'bench.db')
+    Config.DOWNLOAD_DIR = os.path.join(workdir, 'download')
+    try:
+        os.makedirs(Config.DOWNLOAD_DIR)
+        init_db()
+        yield workdir
+    finally:
+        close_db_connection()
+        Config.DATABASE_PATH, Config.DOWNLOAD_DIR = saved
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def rate(count, seconds):
+    """每秒操作数，保留一位小数"""
+    return round(count / seconds, 1) if seconds > 0 else None
+
+def best_of(repeat, func):
+    """重复执行 repeat 次，返回最短耗时（秒）和最后一次的返回值"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def git_revision():
+    """当前提交的短哈希，工作区有未提交修改时加 -dirty 后缀"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return revision + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def save_results(name, results):
+    """把一次运行的结果保存为 benchmarks/results/<名称>-<时间>-<提交>.json，返回文件路径"""
+    revision = git_revision()
+    payload = {
+        'benchmark': name,
+        'revision': revision,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(RESULTS_DIR, f'{name}-{stamp}-{revision}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
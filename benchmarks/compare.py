@@ -0,0 +1,61 @@
+"""对比两次基准测试的结果文件
+
+逐项列出数值指标的变化比例；名称以 _per_sec 结尾的指标越大越好，seconds 类指标越小越好，
+变化超过阈值（默认 10%）且变差时标记为回退，存在回退时以退出码 1 结束。
+
+用法: python -m benchmarks.compare <基准结果.json> <新结果.json> [阈值百分比]
+"""
+import json
+import sys
+
+def flatten(results, prefix=''):
+    """把嵌套的结果展开为 {'a.b.c': 数值}"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def higher_is_better(name):
+    leaf = name.rsplit('.', 1)[-1]
+    return leaf.endswith(('_per_sec', 'succeeded', 'extracted'))
+
+def lower_is_better(name):
+    leaf = name.rsplit('.', 1)[-1]
+    return leaf.endswith(('seconds', '_ms', 'failed'))
+
+def compare(base, new, threshold=10.0):
+    """返回 [(指标, 旧值, 新值, 变化百分比, 是否回退)]"""
+    rows = []
+    base_flat = flatten(base['results'])
+    new_flat = flatten(new['results'])
+    for name in sorted(base_flat.keys() & new_flat.keys()):
+        old, current = base_flat[name], new_flat[name]
+        change = (current - old) / old * 100 if old else 0.0
+        regressed = ((higher_is_better(name) and change < -threshold)
+                     or (lower_is_better(name) and change > threshold))
+        rows.append((name, old, current, change, regressed))
+    return rows
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        return 2
+    with open(sys.argv[1], encoding='utf-8') as f:
+        base = json.load(f)
+    with open(sys.argv[2], encoding='utf-8') as f:
+        new = json.load(f)
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+
+    print(f"{base.get('revision')} -> {new.get('revision')}")
+    rows = compare(base, new, threshold)
+    for name, old, current, change, regressed in rows:
+        mark = '  回退' if regressed else ''
+        print(f'{name:<56} {old:>12} -> {current:>12} {change:>+8.1f}%{mark}')
+    return 1 if any(row[4] for row in rows) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
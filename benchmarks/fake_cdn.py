@@ -0,0 +1,292 @@
+"""本地替身 CDN 和仿 castbox 频道站点，供离线基准测试使用
+
+- /audio/<名称>.mp3：合成的 MP3（ID3v2 标签 + 128kbps CBR 帧），内容由字节偏移决定，支持 Range
+- /channel/<ID>：仿 castbox 频道页（.detail-toolbox-title、.ep-item）
+- /episode/<ID>/<序号>：仿 castbox 节目页（.trackinfo-titleBox），页面中包含指向本服务器的音频地址
+
+延迟、带宽、是否支持 Range、错误注入比例在创建服务器时配置，也可以通过查询参数
+latency、bandwidth、size、error 按请求覆盖；查询参数 stall 使传输在中途停顿指定的秒数，
+unknown_total=1 使 Range 响应的 Content-Range 不给出总长度（bytes 起-止/*）。
+max_streams 模拟按连接数限流：同时传输的音频超过此数时返回 429。
+
+用法: python -m benchmarks.fake_cdn [端口]
+"""
+import html
+import random
+import re
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# MPEG-1 Layer III, 128kbps, 44.1kHz, 无填充：每帧 417 字节、1152 个采样
+FRAME_HEADER = b'\xff\xfb\x90\x00'
+FRAME_SIZE = 417
+FRAME = FRAME_HEADER + bytes(FRAME_SIZE - len(FRAME_HEADER))
+
+DEFAULT_AUDIO_SIZE = 2 * 1024 * 1024
+SEND_CHUNK_SIZE = 64 * 1024
+
+def id3_tag(title):
+    """生成只包含 TIT2（标题）帧的 ID3v2.3 标签"""
+    text = b'\x03' + title.encode('utf-8')
+    frame = b'TIT2' + struct.pack('>I', len(text)) + b'\x00\x00' + text
+    size = len(frame)
+    # 标签大小使用 synchsafe 整数（每字节 7 位）
+    synchsafe = bytes([(size >> 21) & 0x7f, (size >> 14) & 0x7f, (size >> 7) & 0x7f, size & 0x7f])
+    return b'ID3\x03\x00\x00' + synchsafe + frame
+
+def synthetic_mp3(prefix, start, end):
+    """返回合成 MP3 在 [start, end) 区间的字节：prefix 之后重复 MPEG 帧"""
+    parts = []
+    if start < len(prefix):
+        parts.append(prefix[start:min(end, len(prefix))])
+        start = len(prefix)
+    while start < end:
+        offset = (start - len(prefix)) % FRAME_SIZE
+        piece = FRAME[offset:offset + (end - start)]
+        parts.append(piece)
+        start += len(piece)
+    return b''.join(parts)
+
+def channel_page(base_url, channel_id, episodes):
+    """生成仿 castbox 的频道页"""
+    items = '\n'.join(
+        f'''<div class="ep-item">
+  <div class="ep-item-cover"><a href="/episode/{channel_id}/{index}"><img src="/cover.png"></a></div>
+  <div class="ep-item-con"><p class="ep-item-con-title">{html.escape(f"第 {episodes - index} 期 节目")}</p></div>
+</div>'''
+        for index in range(episodes)
+    )
+    return f'''<!DOCTYPE html>
+<html><head><title>基准测试频道 {channel_id} - Castbox</title></head>
+<body>
+<div class="detail-toolbox-title">基准测试频道 {channel_id}</div>
+<div class="ep-list">
+{items}
+</div>
+</body></html>'''
+
+def episode_page(base_url, channel_id, index, filler_kb=64):
+    """生成仿 castbox 的节目页，音频地址嵌在脚本数据中，前面有与真实页面量级相当的填充内容"""
+    filler = '<div class="comment">这是一段用于填充页面体积的评论内容。</div>\n' * (filler_kb * 1024 // 80)
+    audio_url = f'{base_url}/audio/{channel_id}-{index}.mp3'
+    return f'''<!DOCTYPE html>
+<html><head><title>第 {index} 期 - Castbox</title></head>
+<body>
+<div class="trackinfo-titleBox"><h1>第 {index} 期 节目</h1></div>
+{filler}
+<script>window.__INITIAL_STATE__ = {{"episode": {{"eid": {index}, "url": "{audio_url}"}}}};</script>
+</body></html>'''
+
+class FakeCDNHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _param(self, query, name, default, cast=float):
+        values = query.get(name)
+        return cast(values[0]) if values else default
+
+    def _send_page(self, body):
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        server.count_request()
+
+        match = re.fullmatch(r'/channel/(\w+)', parts.path)
+        if match:
+            episodes = self._param(query, 'episodes', server.channel_episodes, int)
+            return self._send_page(channel_page(server.base_url, match.group(1), episodes))
+
+        match = re.fullmatch(r'/episode/(\w+)/(\d+)', parts.path)
+        if match:
+            return self._send_page(episode_page(server.base_url, match.group(1), int(match.group(2))))
+
+        match = re.fullmatch(r'/audio/([\w.-]+)\.mp3', parts.path)
+        if not match:
+            self.send_error(404)
+            return
+
+        latency = self._param(query, 'latency', server.latency)
+        bandwidth = self._param(query, 'bandwidth', server.bandwidth)
+        size = self._param(query, 'size', server.audio_size, int)
+        error_rate = self._param(query, 'error', server.error_rate)
+        stall = self._param(query, 'stall', 0.0)
+        unknown_total = self._param(query, 'unknown_total', 0, int)
+
+        # 首字节延迟
+        if latency > 0:
+            time.sleep(latency)
+
+        inject_error = error_rate > 0 and server.random() < error_rate
+        if inject_error and server.error_mode == 'status':
+            self.send_error(503)
+            return
+
+        if not server.open_stream():
+            self.send_error(429)
+            return
+        try:
+            self._send_audio(server, match.group(1), size, bandwidth, stall, inject_error, unknown_total)
+        finally:
+            server.close_stream()
+
+    def _send_audio(self, server, name, size, bandwidth, stall, inject_error, unknown_total=0):
+
+        prefix = id3_tag(name)
+        start, end = 0, size
+        range_header = self.headers.get('Range')
+        range_match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header or '')
+        if server.range_support and range_match and any(range_match.groups()):
+            first, last = range_match.groups()
+            if first:
+                start = int(first)
+                end = min(int(last) + 1, size) if last else size
+            else:
+                start = max(0, size - int(last))
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end - 1}/{'*' if unknown_total else size}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(end - start))
+        if server.range_support:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        # 传输中途断开：发送一半后关闭连接
+        cutoff = start + (end - start) // 2 if inject_error else None
+        # 传输中途停顿：发送一半后暂停 stall 秒再继续
+        stall_at = start + (end - start) // 2 if stall > 0 else None
+        position = start
+        # 限速时每块约为 50ms 的数据量，使速度曲线足够平滑
+        chunk_size = SEND_CHUNK_SIZE if bandwidth <= 0 else max(1024, min(SEND_CHUNK_SIZE, int(bandwidth / 20)))
+        sent_started = time.perf_counter()
+        try:
+            while position < end:
+                chunk_end = min(position + chunk_size, end)
+                if cutoff is not None and chunk_end > cutoff:
+                    self.wfile.write(synthetic_mp3(prefix, position, cutoff))
+                    self.close_connection = True
+                    return
+                if stall_at is not None and chunk_end > stall_at:
+                    self.wfile.write(synthetic_mp3(prefix, position, stall_at))
+                    self.wfile.flush()
+                    server.count_bytes(stall_at - position)
+                    position = stall_at
+                    stall_at = None
+                    time.sleep(stall)
+                    sent_started += stall
+                    continue
+                self.wfile.write(synthetic_mp3(prefix, position, chunk_end))
+                server.count_bytes(chunk_end - position)
+                position = chunk_end
+                # 按带宽限速：已发送字节数对应的时间未到则等待
+                if bandwidth > 0:
+                    expected = (position - start) / bandwidth
+                    elapsed = time.perf_counter() - sent_started
+                    if expected > elapsed:
+                        time.sleep(expected - elapsed)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+class FakeCDN(ThreadingHTTPServer):
+    """可配置的本地 CDN/频道站点服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, bandwidth=0.0, audio_size=DEFAULT_AUDIO_SIZE,
+                 range_support=True, error_rate=0.0, error_mode='status', channel_episodes=20, seed=0,
+                 max_streams=0):
+        super().__init__(('127.0.0.1', port), FakeCDNHandler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.audio_size = audio_size
+        self.range_support = range_support
+        self.error_rate = error_rate
+        # status：返回 503；reset：发送一半后断开连接
+        self.error_mode = error_mode
+        self.channel_episodes = channel_episodes
+        # 同时传输的音频数上限，0 表示不限制
+        self.max_streams = max_streams
+        self.active_streams = 0
+        self._random = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def random(self):
+        with self._stats_lock:
+            return self._random.random()
+
+    def count_request(self):
+        with self._stats_lock:
+            self.requests += 1
+
+    def open_stream(self):
+        with self._stats_lock:
+            if self.max_streams and self.active_streams >= self.max_streams:
+                return False
+            self.active_streams += 1
+            return True
+
+    def close_stream(self):
+        with self._stats_lock:
+            self.active_streams -= 1
+
+    def count_bytes(self, count):
+        with self._stats_lock:
+            self.bytes_sent += count
+
+    def audio_url(self, name, host=None, **params):
+        """音频地址；host 可换成 localhost 等指向本机的其他主机名，模拟不同主机上的镜像"""
+        base_url = f'http://{host}:{self.server_address[1]}' if host else self.base_url
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        return f"{base_url}/audio/{name}.mp3" + (f'?{query}' if query else '')
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-cdn', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server = FakeCDN(port=port)
+    print(f"本地 CDN 已启动: {server.base_url}/channel/demo")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
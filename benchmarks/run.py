@@ -0,0 +1,29 @@
+"""运行全部离线基准测试（数据库、导入、提取器、下载），结果合并保存为一个 JSON 文件
+
+不访问外网：下载和频道抓取都使用 benchmarks.fake_cdn 启动的本地服务器。
+用 python -m benchmarks.compare 对比两次运行（例如两个提交）的结果。
+
+用法: python -m benchmarks.run [--quick]
+"""
+import sys
+from benchmarks import bench_db, bench_download, bench_extractor, bench_import
+from benchmarks.common import save_results
+
+def main():
+    quick = '--quick' in sys.argv[1:]
+    results = {}
+    print('运行数据库基准测试...')
+    results['db'] = bench_db.run(2000 if quick else 20000)
+    print('运行搜索基准测试...')
+    results['search'] = bench_db.run_search(10000 if quick else 100000)
+    print('运行导入基准测试...')
+    results['import'] = bench_import.run(10000 if quick else 100000)
+    print('运行提取器基准测试...')
+    results['extractor'] = bench_extractor.run(5 if quick else 20)
+    print('运行下载基准测试...')
+    results['download'] = bench_download.run(10 if quick else 30, 256 if quick else 1024)
+    print(f"结果已保存: {save_results('suite', results)}")
+    return results
+
+if __name__ == '__main__':
+    main()
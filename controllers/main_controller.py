@@ -1,45 +1,133 @@
 
-from flask import Flask, jsonify, request, render_template
-from core.podcast_extractor import PodcastExtractor
-from core.downloader import PodcastDownloader
+from flask import Flask, Response, g, jsonify, request, render_template
+from core.cache import response_cache, LIBRARY
 from core.config import Config
+from core.metrics import registry
 from models.download_status import DownloadStatus
-from database import get_all_episodes_with_podcast_info
-from models.podcast_models import PodcastEpisode
-from database import insert_or_update_episode
-import asyncio
+from database import get_history_page_json, get_library_version, get_podcast_summaries
+from database import get_episodes_after, search_episodes, get_pending_episodes
+from database import get_extraction_job, get_episodes_by_podcast_id
+from database import init_db, get_db_connection, get_episode_by_id
+from database import get_podcast_by_id, get_downloaded_episodes, get_active_download_leases
+from database import get_podcast_schedules, update_podcast_schedule, get_leader, set_episode_pinned
+from database import get_episode_cover, get_download_file
+from core.storage import get_storage_manager, record_access
+from core.streaming import send_range_file, content_disposition
+import hashlib
 import json
 import os
-import sqlite3
+import re
+import time
+
+# 分页接口的默认和最大每页条数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# 按路由模板统计请求耗时，避免路径参数造成标签爆炸
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'podcast_http_request_seconds', 'HTTP 请求处理耗时（秒）', ('route', 'method', 'status')
+)
 
 class MainController:
     def __init__(self, app):
         self.app = app
+        if Config.PROFILING_ENABLED:
+            # 只在开启时导入，关闭时没有任何中间件开销
+            from core.profiling import install_profiling
+            install_profiling(app)
+        self.register_metrics()
         self.register_routes()
     
     def init_db(self):
-        """初始化数据库并创建表"""
-        conn = sqlite3.connect('podcasts.db')
-        cursor = conn.cursor()
-        
-        # 创建播客单集表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS episodes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                url TEXT NOT NULL UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """创建下载目录，初始化数据库并创建表，并迁移旧版 JSON 下载状态"""
+        Config.init_config()
+        init_db()
+        DownloadStatus().import_legacy_status()
+        # 订阅刷新调度默认关闭；开启时每个 worker 都启动调度线程，由领导者租约保证只有一个执行调度
+        if Config.SCHEDULER_ENABLED:
+            from core.scheduler import ensure_scheduler
+            ensure_scheduler()
     
     def get_db_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect('podcasts.db')
-        conn.row_factory = sqlite3.Row  # 使查询结果可以通过列名访问
-        return conn
+        """获取数据库连接（当前线程共享的长连接，无需关闭）"""
+        return get_db_connection()
+    
+    def parse_limit_arg(self):
+        """解析分页大小参数，限制在 1 到 MAX_PAGE_SIZE 之间"""
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        if limit < 1:
+            raise ValueError('limit 必须为正整数')
+        return min(limit, MAX_PAGE_SIZE)
+    
+    def parse_bool_arg(self, name):
+        """解析 true/false 查询参数，未提供时返回 None"""
+        value = request.args.get(name)
+        if value is None or value == '':
+            return None
+        if value.lower() in ('1', 'true', 'yes'):
+            return True
+        if value.lower() in ('0', 'false', 'no'):
+            return False
+        raise ValueError(f'{name} 参数无效: {value}')
+    
+    def encode_cursor(self, podcast_id, index_number, episode_id):
+        """将分页位置编码为游标字符串"""
+        return f"{podcast_id}:{index_number}:{episode_id}"
+    
+    def decode_cursor(self, cursor):
+        """解析游标字符串为 (podcast_id, index_number, id)，未提供时返回 None"""
+        if not cursor:
+            return None
+        try:
+            podcast_id, index_number, episode_id = (int(part) for part in cursor.split(':'))
+        except ValueError:
+            raise ValueError(f'cursor 参数无效: {cursor}')
+        return podcast_id, index_number, episode_id
+    
+    def library_etag(self, version):
+        """根据库版本号和请求的查询参数生成 ETag，库中任何写入都会使其变化"""
+        query_digest = hashlib.sha1(request.query_string).hexdigest()[:12]
+        return f"{version}-{query_digest}"
+    
+    def cached_response(self, namespace, version, build):
+        """读穿式响应缓存：按 (版本, 请求路径) 缓存序列化后的响应体
+
+        build 返回 (响应体字节, 额外响应头)。版本号来自数据库或状态文件，
+        因此其他 worker 的写入也会使旧缓存自然失效。
+        """
+        key = f"{version}:{request.full_path}"
+        entry = response_cache.get(namespace, key)
+        if entry is None:
+            entry = build()
+            response_cache.set(namespace, key, entry)
+        body, headers = entry
+        return Response(body, mimetype='application/json', headers=headers)
+    
+    def not_modified(self, etag):
+        """返回不含响应体的 304 响应"""
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    def register_metrics(self):
+        """记录每个请求的处理耗时，并启动本进程的指标快照写入"""
+        @self.app.before_request
+        def start_request_timer():
+            g.request_started = time.perf_counter()
+        
+        @self.app.after_request
+        def record_request_latency(response):
+            started = g.pop('request_started', None)
+            if started is not None:
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started,
+                    route=route, method=request.method, status=response.status_code
+                )
+            return response
+        
+        registry.start_exporter()
     
     def register_routes(self):
         @self.app.route('/')
@@ -62,48 +150,29 @@ class MainController:
                 if not url:
                     return jsonify({"error": "URL不能为空"}), 400
                 
-                # 创建播客提取器实例
-                extractor = PodcastExtractor()
-                
-                # 获取播客列表
-                import asyncio
-                podcast_name, episodes = asyncio.run(extractor.get_episodes_list(url))
-                
-                # 保存到文件
-                extractor.save_episodes_to_file(episodes)
-                
-                # 保存播客信息到数据库
-                podcast_id = extractor.save_podcast_to_db(url, podcast_name)
-                
-                # 保存每个节目到数据库
-                for title, audio_url in episodes:
-                    episode = PodcastEpisode(
-                        title=title,
-                        url=audio_url,
-                        podcast_id=podcast_id
-                    )
-                    insert_or_update_episode(episode)
+                # 提交到提取进程池，进度和结果通过 /api/extraction-jobs/<job_id> 查询
+                from core.extraction_pool import submit_extraction_job
+                job_id = submit_extraction_job(url)
                 
                 return jsonify({
-                    "message": f"成功加载 {len(episodes)} 个播客",
-                    "episodes": episodes
-                })
+                    "message": "已提交提取任务",
+                    "job_id": job_id
+                }), 202
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
         
         @self.app.route('/api/download_episodes', methods=['POST'])
         def download_episodes():
             try:
-                # 创建播客提取器实例
-                extractor = PodcastExtractor()
-                
-                # 从文件加载播客列表
-                episodes = extractor.load_episodes_from_file()
+                # 从数据库读取下载队列，可通过 podcast_id 只下载某个播客
+                data = request.get_json(silent=True) or {}
+                episodes = get_pending_episodes(data.get('podcast_id'))
                 
                 if not episodes:
-                    return jsonify({"error": "没有找到播客列表"}), 400
+                    return jsonify({"error": "没有待下载的播客"}), 400
                 
                 # 使用下载器下载播客
+                from core.downloader import PodcastDownloader  # 下载器依赖 requests，首次使用时才导入
                 downloader = PodcastDownloader()
                 results = downloader.download_episodes(episodes)
                 
@@ -117,27 +186,59 @@ class MainController:
         @self.app.route('/api/download_status', methods=['GET'])
         def download_status():
             try:
-                # 获取下载状态
-                status_tracker = DownloadStatus()
-                status = status_tracker.get_all_status()
+                # 获取下载状态（库未变化时直接返回缓存）
+                def build():
+                    status = DownloadStatus().get_all_status()
+                    return self.app.json.dumps({"status": status}).encode('utf-8'), {}
                 
+                return self.cached_response(LIBRARY, get_library_version(), build)
+            except Exception as e:
+                return jsonify({"error": str(e)}), 500
+        
+        @self.app.route('/api/downloads/active', methods=['GET'])
+        def active_downloads():
+            """API 接口：所有 worker 进程中正在进行的下载及其进度（来自下载租约表）"""
+            try:
+                now = time.time()
+                downloads = [
+                    dict(lease, progress=(lease['bytes_done'] / lease['bytes_total'] if lease['bytes_total'] else None))
+                    for lease in get_active_download_leases(now)
+                ]
                 return jsonify({
-                    "status": status
+                    'success': True,
+                    'downloads': downloads
                 })
             except Exception as e:
-                return jsonify({"error": str(e)}), 500
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
         
         @self.app.route('/api/data', methods=['GET'])
         def get_podcast_data():
-            """API 接口：从数据库查询并返回所有播客数据（以 JSON 格式）"""
+            """API 接口：从数据库分页查询播客数据（以 JSON 格式）
+
+            查询参数：cursor（上一页最后一条的 id）、limit；下一页游标通过 X-Next-Cursor 响应头返回
+            """
             try:
-                conn = self.get_db_connection()
-                episodes = conn.execute('SELECT * FROM episodes').fetchall()
-                conn.close()
-                
-                # 将查询结果转换为字典列表
-                episodes_list = [dict(episode) for episode in episodes]
-                return jsonify(episodes_list)
+                after_id = request.args.get('cursor', 0, type=int)
+                limit = self.parse_limit_arg()
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+            
+            try:
+                def build():
+                    # 多取一行用于判断是否还有下一页
+                    episodes_list = get_episodes_after(after_id, limit + 1)
+                    headers = {}
+                    if len(episodes_list) > limit:
+                        headers['X-Next-Cursor'] = str(episodes_list[limit - 1]['id'])
+                    return self.app.json.dumps(episodes_list[:limit]).encode('utf-8'), headers
+                
+                return self.cached_response(LIBRARY, get_library_version(), build)
             except Exception as e:
                 return jsonify({
                     'success': False,
@@ -165,7 +266,7 @@ class MainController:
         
         @self.app.route('/api/load-episodes', methods=['POST'])
         def load_episodes_advanced():
-            """API 接口：加载播客列表（高级功能）"""
+            """API 接口：加载播客列表（高级功能），提交提取任务后立即返回任务ID"""
             try:
                 # 获取请求数据
                 data = request.json
@@ -177,33 +278,43 @@ class MainController:
                         'error': 'URL不能为空'
                     }), 400
                 
-                # 创建播客提取器实例
-                extractor = PodcastExtractor()
-                
-                # 获取播客列表
-                import asyncio
-                podcast_name, episodes = asyncio.run(extractor.get_episodes_list(url))
-                
-                # 保存到文件
-                extractor.save_episodes_to_file(episodes)
-                
-                # 保存播客信息到数据库
-                podcast_id = extractor.save_podcast_to_db(url, podcast_name)
-                
-                # 保存每个节目到数据库
-                for title, audio_url in episodes:
-                    episode = PodcastEpisode(
-                        title=title,
-                        url=audio_url,
-                        podcast_id=podcast_id
-                    )
-                    insert_or_update_episode(episode)
+                # 提交到提取进程池，进度和结果通过 /api/extraction-jobs/<job_id> 查询
+                from core.extraction_pool import submit_extraction_job
+                job_id = submit_extraction_job(url)
                 
                 return jsonify({
                     'success': True,
-                    'message': f"成功加载 {len(episodes)} 个播客",
-                    'episodes': episodes
-                })
+                    'message': '已提交提取任务',
+                    'job_id': job_id
+                }), 202
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/extraction-jobs/<int:job_id>', methods=['GET'])
+        def extraction_job_status(job_id):
+            """API 接口：查询频道提取任务的进度，完成后返回提取到的节目列表"""
+            try:
+                job = get_extraction_job(job_id)
+                if job is None:
+                    return jsonify({
+                        'success': False,
+                        'error': '任务不存在'
+                    }), 404
+                
+                # 进程重启后遗留的排队任务，在客户端轮询时恢复进程池
+                if job['status'] == 'queued':
+                    from core.extraction_pool import ensure_extraction_pool
+                    ensure_extraction_pool()
+                
+                result = {'success': True, 'job': job}
+                if job['status'] == 'done':
+                    episodes = get_episodes_by_podcast_id(job['podcast_id'])
+                    result['episodes'] = [(episode.title, episode.audio_url or episode.url) for episode in episodes]
+                    result['message'] = f"成功加载 {len(episodes)} 个播客"
+                return jsonify(result)
             except Exception as e:
                 return jsonify({
                     'success': False,
@@ -217,7 +328,7 @@ class MainController:
                 # 获取请求数据
                 data = request.json
                 episodes = data.get('episodes', [])
-                max_workers = data.get('max_workers', 5)
+                max_workers = data.get('max_workers')
                 download_options = data.get('download_options', {})
                 
                 if not episodes:
@@ -226,15 +337,30 @@ class MainController:
                         'error': '没有选择要下载的播客'
                     }), 400
                 
+                # max_workers 为本次下载的并发上限，不超过配置的最大并发数
+                if max_workers is not None:
+                    if not isinstance(max_workers, int) or isinstance(max_workers, bool) or max_workers < 1:
+                        return jsonify({
+                            'success': False,
+                            'error': 'max_workers 必须为正整数'
+                        }), 400
+                    max_workers = min(max_workers, Config.DOWNLOAD_MAX_CONCURRENCY)
+                
                 # 使用下载器下载播客
-                downloader = PodcastDownloader()
+                from core.downloader import PodcastDownloader  # 下载器依赖 requests，首次使用时才导入
+                downloader = PodcastDownloader(max_workers=max_workers)
                 results = downloader.download_episodes(episodes)
                 
-                return jsonify({
+                result = {
                     'success': True,
                     'message': f"成功添加 {len(results)} 个播客到下载队列",
-                    'results': results
-                })
+                    'results': results,
+                    'max_workers': downloader.max_workers
+                }
+                if downloader.concurrency is not None:
+                    result['concurrency'] = downloader.concurrency.limit
+                    result['concurrency_changes'] = list(downloader.concurrency.decisions)
+                return jsonify(result)
             except Exception as e:
                 return jsonify({
                     'success': False,
@@ -243,30 +369,102 @@ class MainController:
         
         @self.app.route('/api/podcast-history', methods=['GET'])
         def get_podcast_history():
-            """API 接口：获取按播客分类的下载历史"""
+            """API 接口：分页获取按播客分类的下载历史
+
+            查询参数：podcast_id（按播客过滤）、downloaded（true/false）、cursor（上一页返回的 next_cursor）、limit
+            """
+            try:
+                podcast_id = request.args.get('podcast_id', type=int)
+                downloaded = self.parse_bool_arg('downloaded')
+                after = self.decode_cursor(request.args.get('cursor'))
+                limit = self.parse_limit_arg()
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+            
+            try:
+                # 库未变化时直接返回 304，不查询也不序列化
+                version = get_library_version()
+                etag = self.library_etag(version)
+                if request.if_none_match.contains(etag):
+                    return self.not_modified(etag)
+                
+                def build():
+                    # 由 SQLite 完成分组和 JSON 序列化
+                    history_json, last_key, has_more = get_history_page_json(
+                        podcast_id, downloaded, after, limit)
+                    next_cursor = self.encode_cursor(*last_key) if has_more else None
+                    body = '{"success": true, "history": %s, "next_cursor": %s}' % (
+                        history_json, json.dumps(next_cursor))
+                    return body.encode('utf-8'), {}
+                
+                response = self.cached_response(LIBRARY, version, build)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/podcast-summary', methods=['GET'])
+        def get_podcast_summary():
+            """API 接口：获取每个播客的节目数量和已下载数量"""
             try:
-                # 获取所有节目及其播客信息
-                all_episodes = get_all_episodes_with_podcast_info()
-                
-                # 按播客分组
-                podcast_groups = {}
-                for episode in all_episodes:
-                    podcast_id = episode['podcast_id']
-                    if podcast_id not in podcast_groups:
-                        podcast_groups[podcast_id] = {
-                            'podcast_id': podcast_id,
-                            'podcast_name': episode['podcast_name'],
-                            'podcast_url': episode['podcast_url'],
-                            'episodes': []
-                        }
-                    podcast_groups[podcast_id]['episodes'].append(episode)
-                
-                # 转换为列表格式
-                history = list(podcast_groups.values())
+                etag = self.library_etag(get_library_version())
+                if request.if_none_match.contains(etag):
+                    return self.not_modified(etag)
+                
+                response = jsonify({
+                    'success': True,
+                    'podcasts': get_podcast_summaries()
+                })
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/search', methods=['GET'])
+        def search():
+            """API 接口：全文搜索节目标题、简介和播客名称
+
+            查询参数：q（关键词）、podcast_id（按播客过滤）、offset、limit
+            """
+            query = request.args.get('q', '').strip()
+            if not query:
+                return jsonify({
+                    'success': False,
+                    'error': '搜索关键词不能为空'
+                }), 400
+            
+            try:
+                podcast_id = request.args.get('podcast_id', type=int)
+                offset = request.args.get('offset', 0, type=int)
+                limit = self.parse_limit_arg()
+                if offset < 0:
+                    raise ValueError('offset 不能为负数')
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+            
+            try:
+                # 多取一行用于判断是否还有下一页
+                results = search_episodes(query, podcast_id, limit + 1, offset)
+                next_offset = offset + limit if len(results) > limit else None
                 
                 return jsonify({
                     'success': True,
-                    'history': history
+                    'results': results[:limit],
+                    'next_offset': next_offset
                 })
             except Exception as e:
                 return jsonify({
@@ -274,6 +472,19 @@ class MainController:
                     'error': str(e)
                 }), 500
         
+        @self.app.route('/metrics', methods=['GET'])
+        def metrics():
+            """Prometheus 文本格式的指标（合并所有存活进程）"""
+            return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+        
+        @self.app.route('/api/cache-stats', methods=['GET'])
+        def cache_stats():
+            """API 接口：获取响应缓存的命中统计"""
+            return jsonify({
+                'success': True,
+                'cache': response_cache.stats()
+            })
+        
         @self.app.route('/api/download-episode', methods=['POST'])
         def download_single_episode():
             """API 接口：下载单个播客节目"""
@@ -291,34 +502,18 @@ class MainController:
                     }), 400
                 
                 # 使用下载器下载单个播客（强制下载，不检查状态）
+                from core.downloader import PodcastDownloader  # 下载器依赖 requests，首次使用时才导入
                 downloader = PodcastDownloader()
                 episode_info = (title, url)
-                result = downloader.download_episode(episode_info, force_download=True)
-                
-                # 如果提供了episode_id，则更新数据库中的下载状态
-                if episode_id:
-                    try:
-                        # 首先获取现有的节目信息以获得podcast_id
-                        conn = self.get_db_connection()
-                        existing_episode = conn.execute(
-                            'SELECT podcast_id FROM podcast_episodes WHERE id = ?', 
-                            (episode_id,)
-                        ).fetchone()
-                        conn.close()
-                        
-                        if existing_episode:
-                            # 更新数据库中的下载状态
-                            episode = PodcastEpisode(
-                                id=episode_id,
-                                podcast_id=existing_episode['podcast_id'],
-                                title=title,
-                                audio_url=url,
-                                url=url,  # 也设置url字段
-                                downloaded=True  # 标记为已下载
-                            )
-                            insert_or_update_episode(episode)
-                    except Exception as db_error:
-                        print(f"更新数据库时出错: {db_error}")
+                result = downloader.download_episode(episode_info, force_download=True, episode_id=episode_id)
+                
+                # 下载状态由写入线程批量落库；页面收到响应后会立即刷新历史，这里等待本次结果写入
+                if not downloader.state_writer.flush(timeout=5):
+                    return jsonify({
+                        'success': False,
+                        'error': f'{result}，但下载状态暂时无法写入数据库，将在后台重试'
+                    }), 503
+                downloader.storage.make_room()
                 
                 return jsonify({
                     'success': True,
@@ -335,42 +530,275 @@ class MainController:
             """渲染历史记录页面"""
             return render_template('history.html')
         
-        @self.app.route('/api/download-file/<filename>', methods=['GET'])
-        def download_file(filename):
-            """API 接口：下载已保存的播客文件到用户本地设备"""
+        @self.app.route('/api/episodes/<int:episode_id>/audio', methods=['GET'])
+        def episode_audio(episode_id):
+            """API 接口：按节目ID播放或下载已保存的音频，支持 Range 分段请求"""
             try:
-                # 构建完整的文件路径
-                file_path = os.path.join(Config.DOWNLOAD_DIR, filename)
+                episode = get_episode_by_id(episode_id)
+                if episode is None or not episode.downloaded or not episode.download_path:
+                    return jsonify({
+                        'success': False,
+                        'error': '节目不存在或尚未下载'
+                    }), 404
+                
+                # 安全检查：确保文件在下载目录内
+                real_path = os.path.realpath(episode.download_path)
+                real_download_dir = os.path.realpath(Config.DOWNLOAD_DIR)
+                if os.path.commonpath([real_path, real_download_dir]) != real_download_dir:
+                    return jsonify({
+                        'success': False,
+                        'error': '文件访问被拒绝'
+                    }), 403
                 
-                # 检查文件是否存在
-                if not os.path.exists(file_path):
+                if not os.path.isfile(real_path):
                     return jsonify({
                         'success': False,
                         'error': '文件不存在'
                     }), 404
                 
-                # 检查是否为文件（而不是目录）
-                if not os.path.isfile(file_path):
+                # 记录访问时间，存储配额按最近最少播放清理
+                record_access(episode_id)
+                return send_range_file(
+                    real_path,
+                    mimetype='audio/mpeg',
+                    as_attachment=bool(self.parse_bool_arg('download'))
+                )
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/episodes/<int:episode_id>/cover', methods=['GET'])
+        def episode_cover(episode_id):
+            """API 接口：返回已下载音频 ID3 标签中内嵌的封面图片（下载时记录了位置，直接按偏移读取）"""
+            try:
+                cover = get_episode_cover(episode_id)
+                if cover is None or not cover['download_path']:
                     return jsonify({
                         'success': False,
-                        'error': '指定路径不是文件'
-                    }), 400
+                        'error': '节目没有内嵌封面'
+                    }), 404
                 
                 # 安全检查：确保文件在下载目录内
-                # 获取绝对路径以防止目录遍历攻击
-                abs_file_path = os.path.abspath(file_path)
-                abs_download_dir = os.path.abspath(Config.DOWNLOAD_DIR)
+                real_path = os.path.realpath(cover['download_path'])
+                real_download_dir = os.path.realpath(Config.DOWNLOAD_DIR)
+                if os.path.commonpath([real_path, real_download_dir]) != real_download_dir:
+                    return jsonify({
+                        'success': False,
+                        'error': '文件访问被拒绝'
+                    }), 403
+                
+                try:
+                    with open(real_path, 'rb') as f:
+                        f.seek(cover['cover_offset'])
+                        data = f.read(cover['cover_length'])
+                except FileNotFoundError:
+                    data = b''
+                if len(data) != cover['cover_length']:
+                    return jsonify({
+                        'success': False,
+                        'error': '文件不存在'
+                    }), 404
+                
+                response = Response(data, mimetype=cover['cover_mime'] or 'application/octet-stream')
+                response.headers['Cache-Control'] = 'private, max-age=3600'
+                return response
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/episodes/<int:episode_id>/pin', methods=['PUT'])
+        def pin_episode(episode_id):
+            """API 接口：固定或取消固定节目，固定的节目不会因超出存储配额被清理"""
+            try:
+                data = request.get_json(silent=True) or {}
+                if not set_episode_pinned(episode_id, bool(data.get('pinned', True))):
+                    return jsonify({
+                        'success': False,
+                        'error': '节目不存在'
+                    }), 404
+                return jsonify({
+                    'success': True,
+                    'pinned': bool(data.get('pinned', True))
+                })
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/storage', methods=['GET'])
+        def storage_usage():
+            """API 接口：下载目录的存储用量和配额"""
+            try:
+                return jsonify(dict(get_storage_manager().usage(), success=True))
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/storage/enforce', methods=['POST'])
+        def enforce_storage_quota():
+            """API 接口：立即按配额清理（例如调低配额之后）"""
+            try:
+                storage = get_storage_manager()
+                files, evicted_bytes = storage.make_room()
+                return jsonify(dict(storage.usage(), success=True, evicted_files=files, evicted_bytes=evicted_bytes))
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/scheduler', methods=['GET'])
+        def scheduler_status():
+            """API 接口：订阅刷新调度的领导者和所有播客的刷新计划"""
+            try:
+                from core.scheduler import LEADER_NAME
+                return jsonify({
+                    'success': True,
+                    'enabled': Config.SCHEDULER_ENABLED,
+                    'default_interval': Config.SCHEDULER_DEFAULT_INTERVAL,
+                    'leader': get_leader(LEADER_NAME),
+                    'schedules': get_podcast_schedules()
+                })
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/podcasts/<int:podcast_id>/schedule', methods=['GET', 'PUT'])
+        def podcast_schedule(podcast_id):
+            """API 接口：查看或修改播客的刷新计划
+
+            PUT 请求体可包含 enabled、refresh_interval（秒，null 表示使用默认间隔）、
+            auto_download（null 表示使用默认设置）和 refresh_now（立即安排一次刷新）。
+            """
+            try:
+                if get_podcast_by_id(podcast_id) is None:
+                    return jsonify({
+                        'success': False,
+                        'error': '播客不存在'
+                    }), 404
+                
+                if request.method == 'PUT':
+                    data = request.get_json(silent=True) or {}
+                    refresh_interval = data.get('refresh_interval')
+                    if refresh_interval is not None:
+                        try:
+                            refresh_interval = float(refresh_interval)
+                        except (TypeError, ValueError):
+                            refresh_interval = -1
+                        if refresh_interval < 60:
+                            return jsonify({
+                                'success': False,
+                                'error': '刷新间隔不能小于 60 秒'
+                            }), 400
+                    update_podcast_schedule(
+                        podcast_id,
+                        time.time(),
+                        enabled=None if data.get('enabled') is None else bool(data['enabled']),
+                        refresh_interval=refresh_interval,
+                        auto_download=None if data.get('auto_download') is None else bool(data['auto_download']),
+                        clear_interval='refresh_interval' in data and data['refresh_interval'] is None,
+                        refresh_now=bool(data.get('refresh_now'))
+                    )
+                
+                schedules = get_podcast_schedules(podcast_id)
+                return jsonify({
+                    'success': True,
+                    'schedule': schedules[0] if schedules else None
+                })
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+        
+        @self.app.route('/api/podcasts/<int:podcast_id>/archive', methods=['GET'])
+        def podcast_archive(podcast_id):
+            """API 接口：把播客所有已下载的节目打包为 ZIP 流式下载"""
+            try:
+                podcast = get_podcast_by_id(podcast_id)
+                if podcast is None:
+                    return jsonify({
+                        'success': False,
+                        'error': '播客不存在'
+                    }), 404
+                
+                # 只打包下载目录内仍然存在的文件
+                real_download_dir = os.path.realpath(Config.DOWNLOAD_DIR)
+                paths = []
+                for episode in get_downloaded_episodes(podcast_id):
+                    real_path = os.path.realpath(episode.download_path)
+                    if os.path.commonpath([real_path, real_download_dir]) == real_download_dir and os.path.isfile(real_path):
+                        paths.append(real_path)
                 
-                if not abs_file_path.startswith(abs_download_dir):
+                if not paths:
+                    return jsonify({
+                        'success': False,
+                        'error': '该播客没有已下载的节目'
+                    }), 404
+                
+                from core.archive import iter_zip, unique_arcnames
+                arcnames = unique_arcnames([os.path.basename(path) for path in paths])
+                safe_name = re.sub(r'[\\/:*?"<>|]', '', podcast.name or '').strip() or f'podcast-{podcast_id}'
+                return Response(
+                    iter_zip(zip(arcnames, paths)),
+                    mimetype='application/zip',
+                    headers={'Content-Disposition': content_disposition(f'{safe_name}.zip')},
+                    direct_passthrough=True
+                )
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+
+        @self.app.route('/api/download-file/<filename>', methods=['GET'])
+        def download_file(filename):
+            """API 接口：下载已保存的播客文件到用户本地设备（按文件名在下载文件索引中查找所在的分片目录）"""
+            try:
+                entry = get_download_file(filename)
+                if entry is None:
+                    return jsonify({
+                        'success': False,
+                        'error': '文件不存在'
+                    }), 404
+                
+                # 安全检查：确保文件在下载目录内
+                real_path = os.path.realpath(os.path.join(Config.DOWNLOAD_DIR, entry['path']))
+                real_download_dir = os.path.realpath(Config.DOWNLOAD_DIR)
+                if os.path.commonpath([real_path, real_download_dir]) != real_download_dir:
                     return jsonify({
                         'success': False,
                         'error': '文件访问被拒绝'
                     }), 403
                 
+                # 检查是否为文件（而不是目录）
+                if not os.path.isfile(real_path):
+                    return jsonify({
+                        'success': False,
+                        'error': '文件不存在'
+                    }), 404
+                
+                if entry['episode_id'] is not None:
+                    record_access(entry['episode_id'])
+                
                 # 返回文件供下载
                 from flask import send_file
                 return send_file(
-                    file_path,
+                    real_path,
                     as_attachment=True,  # 强制下载而不是在浏览器中打开
                     download_name=filename  # 设置下载文件名
                 )
@@ -0,0 +1,87 @@
+import io
+import os
+import time
+import zipfile
+
+# 每次从磁盘读取并输出的块大小
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+
+class _ChunkSink(io.RawIOBase):
+    """zipfile 的输出目标：收集写入的字节，由生成器取走后立即释放
+
+    不可 seek，zipfile 会改为在每个条目后写入数据描述符（data descriptor），
+    无需回写本地文件头，因此整个归档可以边生成边发送。
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        """取出目前为止写入的所有字节"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _zip_info(arcname, stat):
+    """按文件大小和修改时间创建存储（不压缩）条目"""
+    # ZIP 的时间格式不支持 1980 年之前的日期
+    mtime = max(stat.st_mtime, 315532800)
+    info = zipfile.ZipInfo(arcname, date_time=time.localtime(mtime)[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    # 预先给出大小，超过 4GB 的条目会自动写入 ZIP64 扩展字段
+    info.file_size = stat.st_size
+    return info
+
+def iter_zip(entries):
+    """以存储模式流式生成 ZIP 归档
+
+    内存占用只与块大小有关，不生成临时文件；条目或归档超过 4GB 时自动使用 ZIP64。
+
+    Args:
+        entries: (归档内文件名, 磁盘路径) 的可迭代对象，不存在的文件会被跳过
+
+    Yields:
+        bytes: 归档数据块
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for arcname, path in entries:
+            try:
+                src = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with src:
+                info = _zip_info(arcname, os.fstat(src.fileno()))
+                with zf.open(info, mode='w') as dest:
+                    while True:
+                        chunk = src.read(ARCHIVE_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        yield sink.drain()
+            # 数据描述符
+            yield sink.drain()
+    # 中央目录（必要时包含 ZIP64 结束记录）
+    yield sink.drain()
+
+def unique_arcnames(names):
+    """为归档内重名的文件追加序号，返回与输入等长的文件名列表"""
+    seen = set()
+    result = []
+    for name in names:
+        candidate = name
+        base, ext = os.path.splitext(name)
+        counter = 1
+        while candidate in seen:
+            candidate = f"{base}_{counter}{ext}"
+            counter += 1
+        seen.add(candidate)
+        result.append(candidate)
+    return result
@@ -0,0 +1,141 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from core.config import Config
+
+# 缓存值：(序列化后的响应体, 需要附加的响应头)
+CachedResponse = Tuple[bytes, Dict[str, str]]
+
+class ResponseCache:
+    """进程内 LRU 响应缓存，支持 TTL，可选通过本地 SQLite 文件在多个 worker 间共享
+
+    缓存的是序列化后的响应字节而不是 Python 对象。键按命名空间划分，
+    写入路径通过 invalidate(namespace) 使对应命名空间的缓存失效。
+    """
+
+    def __init__(self, max_entries=256, ttl=30.0, shared_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_path = shared_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._shared_conn = None
+
+    def _record(self, namespace, field):
+        """累加命名空间的统计计数"""
+        counters = self._stats.setdefault(namespace, {'hits': 0, 'shared_hits': 0, 'misses': 0})
+        counters[field] += 1
+
+    def _get_shared_conn(self):
+        """打开共享缓存库（调用方需持有锁）"""
+        if self._shared_conn is None:
+            conn = sqlite3.connect(self.shared_path, timeout=1.0, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    headers TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            ''')
+            conn.commit()
+            self._shared_conn = conn
+        return self._shared_conn
+
+    def _store(self, namespace, key, value, expires_at):
+        """写入内存 LRU，超出容量时淘汰最久未使用的条目（调用方需持有锁）"""
+        self._entries[(namespace, key)] = (value, expires_at)
+        self._entries.move_to_end((namespace, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, namespace: str, key: str) -> Optional[CachedResponse]:
+        """读取缓存，未命中或已过期时返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end((namespace, key))
+                    self._record(namespace, 'hits')
+                    return entry[0]
+                del self._entries[(namespace, key)]
+
+            if self.shared_path:
+                try:
+                    row = self._get_shared_conn().execute(
+                        'SELECT body, headers, expires_at FROM response_cache WHERE namespace = ? AND key = ?',
+                        (namespace, key)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"读取共享缓存时出错: {e}")
+                    row = None
+                if row is not None and row[2] > now:
+                    value = (bytes(row[0]), json.loads(row[1]))
+                    self._store(namespace, key, value, row[2])
+                    self._record(namespace, 'shared_hits')
+                    return value
+
+            self._record(namespace, 'misses')
+            return None
+
+    def set(self, namespace: str, key: str, value: CachedResponse):
+        """写入缓存"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(namespace, key, value, expires_at)
+            if self.shared_path:
+                try:
+                    conn = self._get_shared_conn()
+                    with conn:
+                        conn.execute(
+                            'INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?)',
+                            (namespace, key, value[0], json.dumps(value[1]), expires_at)
+                        )
+                        conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (time.time(),))
+                except sqlite3.Error as e:
+                    print(f"写入共享缓存时出错: {e}")
+
+    def invalidate(self, namespace: Optional[str] = None):
+        """使指定命名空间（None 表示全部）的缓存失效"""
+        with self._lock:
+            for entry_key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+                del self._entries[entry_key]
+            if self.shared_path:
+                try:
+                    conn = self._get_shared_conn()
+                    with conn:
+                        if namespace is None:
+                            conn.execute('DELETE FROM response_cache')
+                        else:
+                            conn.execute('DELETE FROM response_cache WHERE namespace = ?', (namespace,))
+                except sqlite3.Error as e:
+                    print(f"清理共享缓存时出错: {e}")
+
+    def stats(self) -> dict:
+        """返回各命名空间的命中统计及命中率"""
+        with self._lock:
+            result = {'entries': len(self._entries), 'namespaces': {}}
+            for namespace, counters in self._stats.items():
+                total = counters['hits'] + counters['shared_hits'] + counters['misses']
+                hit_ratio = (counters['hits'] + counters['shared_hits']) / total if total else 0.0
+                result['namespaces'][namespace] = dict(counters, hit_ratio=round(hit_ratio, 4))
+            return result
+
+# 缓存命名空间
+LIBRARY = 'library'
+
+# 全局响应缓存实例
+response_cache = ResponseCache(
+    max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=Config.RESPONSE_CACHE_TTL,
+    shared_path=Config.RESPONSE_CACHE_PATH
+)
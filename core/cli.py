@@ -0,0 +1,254 @@
+"""castload 命令行工具：不经过 Web 服务直接同步频道、批量下载、校验和导入
+
+    castload sync [频道URL ...] [--download]    提取频道节目并写入数据库（不指定频道时刷新库中所有播客）
+    castload download [--podcast ID] [--limit N] 下载尚未下载的节目
+    castload verify [--podcast ID] [--quick] [--fix]  校验已下载文件是否存在、大小和哈希是否一致
+    castload import 文件                          流式导入 TSV、CSV 或 OPML 节目列表
+
+全局参数 --concurrency、--max-rate 控制下载并发数上限和总下载速度；--json 时进度以每行一个 JSON
+对象输出到标准输出（其他日志输出到标准错误），便于定时任务解析。有失败时退出码为 1。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from contextlib import redirect_stdout
+from core.config import Config
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+def parse_size(value):
+    """解析带单位的字节数，如 500K、2M、1.5G"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?\s*', value, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f'无效的大小: {value}')
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+class Reporter:
+    """输出进度：--json 时每个事件一行 JSON，否则输出给人看的文字"""
+
+    def __init__(self, stream, json_output=False):
+        self.stream = stream
+        self.json_output = json_output
+
+    def event(self, name, text, **fields):
+        if self.json_output:
+            record = {'event': name, 'time': round(time.time(), 3)}
+            record.update(fields)
+            self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            self.stream.write(text + '\n')
+        self.stream.flush()
+
+def _new_downloader(args):
+    from core.downloader import PodcastDownloader  # 下载器依赖 requests，首次使用时才导入
+    return PodcastDownloader(max_workers=args.concurrency, bandwidth_limit=args.max_rate)
+
+def _download(args, reporter, episodes):
+    """下载节目并逐个报告进度，返回 (成功数, 失败数)"""
+    from database import get_episode_by_id
+    if not episodes:
+        reporter.event('download_done', '没有需要下载的节目', downloaded=0, failed=0)
+        return 0, 0
+
+    def progress(done, total, episode, result):
+        reporter.event('download_progress', f'[{done}/{total}] {result}', done=done, total=total,
+                       episode_id=episode.id, title=episode.title, result=result)
+
+    downloader = _new_downloader(args)
+    mode = '自适应并发，上限' if Config.ADAPTIVE_CONCURRENCY else '并发'
+    reporter.event('download_start', f'开始下载 {len(episodes)} 个节目（{mode} {downloader.max_workers}）',
+                   total=len(episodes), concurrency=downloader.max_workers, max_rate=args.max_rate)
+    started = time.perf_counter()
+    downloader.download_episodes(episodes, progress=progress)
+    # 下载状态异步写入，等全部落库后再统计结果
+    if not downloader.state_writer.flush(timeout=30):
+        reporter.event('download_state_pending', '部分下载状态尚未写入数据库（后台仍在重试），以下统计可能偏少',
+                       error='state write failed')
+    downloaded = sum(1 for episode in episodes if (get_episode_by_id(episode.id) or episode).downloaded)
+    failed = len(episodes) - downloaded
+    seconds = round(time.perf_counter() - started, 3)
+    fields = {}
+    if downloader.concurrency is not None:
+        # 自适应并发结束时的并发数和调整次数
+        fields = {'final_concurrency': downloader.concurrency.limit,
+                  'concurrency_changes': len(downloader.concurrency.decisions)}
+    reporter.event('download_done', f'下载完成：成功 {downloaded} 个，失败 {failed} 个，耗时 {seconds} 秒',
+                   downloaded=downloaded, failed=failed, seconds=seconds, **fields)
+    return downloaded, failed
+
+async def _extract_channels(urls, reporter, full):
+    """用同一个浏览器依次提取各频道并写入数据库，返回 [(频道URL, 播客ID或None)]"""
+    from playwright.async_api import async_playwright
+    from core.podcast_extractor import PodcastExtractor
+    extractor = PodcastExtractor()
+    if full:
+        extractor.test_mode = False
+    results = []
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            for url in urls:
+                def progress(done, total, url=url):
+                    reporter.event('sync_progress', f'{url}: {done}/{total}', url=url, done=done, total=total)
+
+                try:
+                    podcast_name, episodes = await extractor.get_episodes_list(url, browser=browser, progress=progress)
+                    podcast_id = extractor.save_podcast_to_db(url, podcast_name)
+                    inserted, updated = extractor.save_episodes_to_db(podcast_id, episodes)
+                    reporter.event('sync_done', f"{podcast_name}: {len(episodes)} 个节目，新增 {inserted}，更新 {updated}",
+                                   url=url, podcast_id=podcast_id, name=podcast_name, episodes=len(episodes),
+                                   inserted=inserted, updated=updated)
+                    results.append((url, podcast_id))
+                except Exception as e:
+                    reporter.event('sync_error', f'{url}: 提取失败: {e}', url=url, error=str(e))
+                    results.append((url, None))
+        finally:
+            await browser.close()
+    return results
+
+def cmd_sync(args, reporter):
+    from database import get_all_podcasts, get_pending_episodes
+    # 导入文件时创建的 import: 播客没有网页可以提取
+    urls = args.urls or [podcast.url for podcast in get_all_podcasts() if podcast.url.startswith(('http://', 'https://'))]
+    if not urls:
+        reporter.event('sync_error', '数据库中没有播客，请指定频道URL', error='no podcasts')
+        return 1
+
+    results = asyncio.run(_extract_channels(urls, reporter, args.full))
+    failed = sum(1 for _, podcast_id in results if podcast_id is None)
+    if args.download:
+        episodes = []
+        for _, podcast_id in results:
+            if podcast_id is not None:
+                episodes.extend(get_pending_episodes(podcast_id))
+        _, download_failed = _download(args, reporter, episodes)
+        failed += download_failed
+    return 1 if failed else 0
+
+def cmd_download(args, reporter):
+    from database import get_pending_episodes
+    episodes = get_pending_episodes(args.podcast, args.limit)
+    _, failed = _download(args, reporter, episodes)
+    return 1 if failed else 0
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cmd_verify(args, reporter):
+    from database import get_all_podcasts, get_downloaded_episodes, mark_downloads_invalid
+    podcast_ids = [args.podcast] if args.podcast is not None else [podcast.id for podcast in get_all_podcasts()]
+    checked = 0
+    problems = []
+    for podcast_id in podcast_ids:
+        for episode in get_downloaded_episodes(podcast_id):
+            checked += 1
+            path = episode.download_path
+            if not os.path.isfile(path):
+                problem = '文件不存在'
+            elif episode.file_size is not None and os.path.getsize(path) != episode.file_size:
+                problem = f'大小不一致（记录 {episode.file_size}，实际 {os.path.getsize(path)}）'
+            elif not args.quick and episode.file_hash and _file_sha256(path) != episode.file_hash:
+                problem = '哈希不一致'
+            else:
+                continue
+            problems.append(episode.id)
+            reporter.event('verify_problem', f'{episode.title}: {problem}', episode_id=episode.id,
+                           title=episode.title, path=path, problem=problem)
+
+    fixed = mark_downloads_invalid(problems, '校验失败，需要重新下载') if args.fix and problems else 0
+    reporter.event('verify_done', f'校验 {checked} 个文件，发现 {len(problems)} 个问题'
+                   + (f'，已将 {fixed} 个节目标记为未下载' if fixed else ''),
+                   checked=checked, problems=len(problems), fixed=fixed)
+    return 1 if problems and not fixed else 0
+
+def cmd_import(args, reporter):
+    from core.importer import LibraryImporter
+    if not os.path.exists(args.file):
+        reporter.event('import_error', f'文件 {args.file} 不存在', error='file not found', file=args.file)
+        return 1
+
+    def progress(stats):
+        reporter.event('import_progress', f'已读取 {stats.rows} 行，新增 {stats.inserted}，跳过 {stats.skipped}，'
+                       f'拒绝 {stats.rejected}', **stats.to_dict())
+
+    rejects = open(args.rejects, 'w', encoding='utf-8') if args.rejects else None
+
+    def reject(line_number, reason, raw):
+        if rejects is not None:
+            rejects.write(f'{line_number or ""}\t{reason}\t{raw}\n')
+        else:
+            reporter.event('import_rejected', f'第 {line_number} 行被拒绝（{reason}）: {raw}',
+                           line=line_number, reason=reason, raw=raw)
+
+    importer = LibraryImporter(podcast_name=args.podcast_name, podcast_url=args.podcast_url,
+                               batch_size=args.batch_size, on_progress=progress, on_reject=reject)
+    started = time.perf_counter()
+    try:
+        stats = importer.import_file(args.file, args.format)
+    finally:
+        if rejects is not None:
+            rejects.close()
+    seconds = round(time.perf_counter() - started, 3)
+    reporter.event('import_done', f'导入完成：读取 {stats.rows} 行，新增 {stats.inserted} 个节目、'
+                   f'{stats.podcasts_created} 个播客，跳过 {stats.skipped}，拒绝 {stats.rejected}，耗时 {seconds} 秒',
+                   file=args.file, seconds=seconds, **stats.to_dict())
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='castload', description='播客批量同步和下载工具（不需要启动 Web 服务）')
+    parser.add_argument('--json', action='store_true', help='以 JSON Lines 格式输出进度')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='同时下载的节目数上限；开启自适应并发（PODCAST_ADAPTIVE_CONCURRENCY，默认开启）时'
+                             f'默认 {Config.DOWNLOAD_MAX_CONCURRENCY}，实际并发在上限内自动调整，关闭时固定为此值'
+                             f'（默认 {Config.MAX_WORKERS}）')
+    parser.add_argument('--max-rate', type=parse_size, default=None, help='所有下载合计的最大速度（字节/秒），如 2M')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sync = subparsers.add_parser('sync', help='提取频道节目并写入数据库')
+    sync.add_argument('urls', nargs='*', help='频道URL，不指定时刷新数据库中的所有播客')
+    sync.add_argument('--download', action='store_true', help='提取后下载尚未下载的节目')
+    sync.add_argument('--full', action='store_true', help='忽略测试模式，提取全部节目')
+    sync.set_defaults(handler=cmd_sync)
+
+    download = subparsers.add_parser('download', help='下载尚未下载的节目')
+    download.add_argument('--podcast', type=int, default=None, help='只下载指定播客ID的节目')
+    download.add_argument('--limit', type=int, default=None, help='最多下载的节目数')
+    download.set_defaults(handler=cmd_download)
+
+    verify = subparsers.add_parser('verify', help='校验已下载的文件')
+    verify.add_argument('--podcast', type=int, default=None, help='只校验指定播客ID的节目')
+    verify.add_argument('--quick', action='store_true', help='只检查文件是否存在和大小，不计算哈希')
+    verify.add_argument('--fix', action='store_true', help='把有问题的节目标记为未下载，下次 download 时重新下载')
+    verify.set_defaults(handler=cmd_verify)
+
+    import_parser = subparsers.add_parser('import', help='导入节目列表文件（TSV、CSV 或 OPML）')
+    import_parser.add_argument('file', help='节目列表文件，格式说明见 core/importer.py')
+    import_parser.add_argument('--format', choices=('tsv', 'csv', 'opml'), default=None, help='文件格式，默认按扩展名判断')
+    import_parser.add_argument('--podcast-name', default=None, help='没有播客列的节目归入的播客名称，默认为文件名')
+    import_parser.add_argument('--podcast-url', default=None, help='没有播客列的节目归入的播客地址')
+    import_parser.add_argument('--batch-size', type=int, default=5000, help='每个事务写入的行数')
+    import_parser.add_argument('--rejects', default=None, help='被拒绝的行写入此文件（行号<TAB>原因<TAB>原始内容）')
+    import_parser.set_defaults(handler=cmd_import)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    reporter = Reporter(sys.stdout, args.json)
+
+    from database import init_db
+    # JSON 模式下标准输出只留给进度事件，各模块的日志改为输出到标准错误
+    with redirect_stdout(sys.stderr if args.json else sys.stdout):
+        init_db()
+        return args.handler(args, reporter)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""下载并发的自适应调整（AIMD：加性增、乘性减）
+
+下载池的线程数为并发上限，每个下载开始传输前向控制器领取名额，实际同时进行的传输数由控制器
+按每个统计窗口内的信号调整：
+
+- 拥塞：服务器错误、超时或连接中断的比例超过阈值，或首字节时间明显高于低负载时的基线，
+  并发数成倍减小；服务器明确限流（429）时不等窗口结束立即减小。因错误减小后的一段时间内
+  不再增加到出错时的并发数
+- 有排队的下载、且上次加并发后吞吐量有所提高：并发数加一
+- 加并发后吞吐量没有明显提高（带宽已用满）：退回一个并保持几个窗口再尝试
+
+每次调整都打印日志并计入指标。
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from core.metrics import registry
+
+CONCURRENCY_LIMIT = registry.gauge(
+    'podcast_download_concurrency_limit', '下载池当前允许的同时传输数（进程内所有下载池之和）'
+)
+ACTIVE_TRANSFERS = registry.gauge('podcast_download_active_transfers', '正在进行的传输数')
+CONCURRENCY_DECISIONS = registry.counter(
+    'podcast_download_concurrency_decisions_total', '并发控制器每个统计窗口的决定，按动作和原因分类', ('action', 'reason')
+)
+
+# 拥塞类错误占本窗口结束的下载的比例超过此值时减小并发
+ERROR_RATE_THRESHOLD = 0.1
+# 本窗口平均首字节时间超过基线的倍数时减小并发
+TTFB_INFLATION = 2.0
+# 首字节时间至少比基线高出的秒数，避免毫秒级的抖动被当作拥塞
+TTFB_MIN_INCREASE = 0.05
+# 拥塞时并发数乘以的系数
+DECREASE_FACTOR = 0.5
+# 加并发后吞吐量至少提高的比例，否则视为带宽已用满
+THROUGHPUT_GAIN = 0.05
+# 带宽用满退回后保持不变的窗口数
+PLATEAU_HOLD_WINDOWS = 3
+# 首字节时间基线每个窗口允许回升的比例，网络变化后基线不会一直停留在过去的最低值
+TTFB_BASELINE_DRIFT = 1.05
+# 因错误减小并发后，多少个窗口内不再增加到出错时的并发数
+CONGESTION_MEMORY_WINDOWS = 15
+
+REASONS = {
+    'errors': '拥塞类错误过多',
+    'throttled': '服务器限流',
+    'ttfb': '首字节时间升高',
+    'plateau': '吞吐量不再提高',
+    'queued': '有排队的下载',
+}
+
+class AdaptiveConcurrency:
+    """在 [min_limit, max_limit] 内调整同时进行的传输数"""
+
+    def __init__(self, min_limit, max_limit, initial=None, interval=2.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = min(max(initial or self.min_limit, self.min_limit), self.max_limit)
+        self.interval = interval
+        # 最近的调整记录，供命令行和基准测试查看
+        self.decisions = deque(maxlen=1000)
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._ttfb_baseline = None
+        self._last_throughput = None
+        self._increased = False
+        self._hold = 0
+        # 最近一次因错误减小时的并发数及其有效期
+        self._congested_limit = None
+        self._congested_until = 0.0
+        self._throttled_in_window = False
+        self._start_window(time.monotonic())
+        CONCURRENCY_LIMIT.inc(self.limit)
+
+    def _start_window(self, now):
+        self._window_started = now
+        self._bytes = 0
+        self._successes = 0
+        self._errors = 0
+        self._ttfb_total = 0.0
+        self._ttfb_count = 0
+        self._throttled_in_window = False
+
+    @contextmanager
+    def slot(self, on_wait=None, wait_interval=None):
+        """领取一个传输名额，同时进行的传输数已达上限时等待
+
+        等待期间至少每 wait_interval 秒（默认为统计窗口长度）调用一次 on_wait()，
+        调用方可以借此续约租约等；on_wait 抛出异常时放弃等待并向外抛出。
+        """
+        timeout = min(self.interval, wait_interval) if wait_interval else self.interval
+        with self._condition:
+            self._waiting += 1
+        try:
+            while True:
+                with self._condition:
+                    if self._active < self.limit:
+                        self._active += 1
+                        break
+                    # 等待时也定期检查窗口，所有传输都很慢时仍能按时调整
+                    self._condition.wait(timeout)
+                    self._maybe_adjust()
+                    if self._active < self.limit:
+                        self._active += 1
+                        break
+                # 在锁外回调，回调中的数据库写入不阻塞其他线程领取和归还名额
+                if on_wait is not None:
+                    on_wait()
+        finally:
+            with self._condition:
+                self._waiting -= 1
+        ACTIVE_TRANSFERS.inc()
+        try:
+            yield
+        finally:
+            ACTIVE_TRANSFERS.dec()
+            with self._condition:
+                self._active -= 1
+                self._maybe_adjust()
+                self._condition.notify_all()
+
+    def record_ttfb(self, seconds):
+        with self._condition:
+            self._ttfb_total += seconds
+            self._ttfb_count += 1
+            self._maybe_adjust()
+
+    def record_bytes(self, count):
+        with self._condition:
+            self._bytes += count
+            self._maybe_adjust()
+
+    def record_result(self, ok, throttled=False):
+        """记录一个下载的结果；ok 为 False 表示拥塞类错误（与服务器负载无关的错误不需要记录），
+        throttled 表示服务器明确限流，每个窗口内第一次限流时立即减小并发"""
+        with self._condition:
+            if ok:
+                self._successes += 1
+            else:
+                self._errors += 1
+            if throttled and not self._throttled_in_window:
+                self._throttled_in_window = True
+                self._decrease('throttled', time.monotonic())
+            self._maybe_adjust()
+
+    def _decrease(self, reason, now, throughput=None, error_rate=None, ttfb=None):
+        old = self.limit
+        self._set_limit(max(self.min_limit, int(old * DECREASE_FACTOR)), reason, throughput, error_rate, ttfb)
+        # 减小后等正在进行的传输结束一批再评估
+        self._hold = 1
+        if reason in ('errors', 'throttled'):
+            self._congested_limit = old
+            self._congested_until = now + CONGESTION_MEMORY_WINDOWS * self.interval
+        return old
+
+    def _set_limit(self, new, reason, throughput=None, error_rate=None, ttfb=None):
+        """修改并发数并记录指标和日志（调用时已持有锁）"""
+        old = self.limit
+        action = 'increase' if new > old else 'decrease' if new < old else 'hold'
+        CONCURRENCY_DECISIONS.inc(action=action, reason=reason)
+        if new == old:
+            return
+        self.limit = new
+        CONCURRENCY_LIMIT.inc(new - old)
+        details = []
+        if throughput is not None:
+            details.append(f'吞吐 {throughput / 1048576:.2f} MiB/秒')
+        if error_rate is not None:
+            details.append(f'错误率 {error_rate:.0%}')
+        if ttfb is not None:
+            details.append(f'首字节 {ttfb * 1000:.0f} 毫秒')
+        print(f"下载并发 {old} -> {new}：{REASONS[reason]}" + (f"（{'，'.join(details)}）" if details else ''))
+        self.decisions.append({
+            'time': time.time(), 'from': old, 'to': new, 'reason': reason,
+            'throughput': throughput, 'error_rate': error_rate, 'ttfb': ttfb,
+        })
+        self._condition.notify_all()
+
+    def close(self):
+        """下载池结束后从并发数指标中减去本控制器的份额"""
+        CONCURRENCY_LIMIT.dec(self.limit)
+
+    def _maybe_adjust(self):
+        """窗口结束时根据本窗口的统计调整并发数（调用时已持有锁）"""
+        now = time.monotonic()
+        elapsed = now - self._window_started
+        if elapsed < self.interval:
+            return
+        if not (self._bytes or self._successes or self._errors or self._ttfb_count):
+            self._start_window(now)
+            return
+
+        throughput = self._bytes / elapsed
+        finished = self._successes + self._errors
+        error_rate = self._errors / finished if finished else 0.0
+        ttfb = self._ttfb_total / self._ttfb_count if self._ttfb_count else None
+        old = self.limit
+        # 因错误减小后的一段时间内，增加并发不超过出错时的并发数减一
+        ceiling = self.max_limit
+        if self._congested_limit is not None and now < self._congested_until:
+            ceiling = min(ceiling, self._congested_limit - 1)
+        increased = False
+        if self._throttled_in_window:
+            # 本窗口已经因限流减小过
+            CONCURRENCY_DECISIONS.inc(action='hold', reason='throttled')
+        elif self._errors and error_rate > ERROR_RATE_THRESHOLD:
+            self._decrease('errors', now, throughput, error_rate, ttfb)
+        elif (ttfb is not None and self._ttfb_baseline is not None
+              and ttfb > max(self._ttfb_baseline * TTFB_INFLATION, self._ttfb_baseline + TTFB_MIN_INCREASE)):
+            self._decrease('ttfb', now, throughput, error_rate, ttfb)
+        elif self._increased and throughput < self._last_throughput * (1 + THROUGHPUT_GAIN):
+            self._set_limit(max(self.min_limit, old - 1), 'plateau', throughput, error_rate, ttfb)
+            self._hold = PLATEAU_HOLD_WINDOWS
+        elif self._hold:
+            self._hold -= 1
+            CONCURRENCY_DECISIONS.inc(action='hold', reason='cooldown')
+        elif not self._waiting:
+            CONCURRENCY_DECISIONS.inc(action='hold', reason='no_demand')
+        elif old >= ceiling:
+            CONCURRENCY_DECISIONS.inc(action='hold', reason='ceiling')
+        else:
+            self._set_limit(old + 1, 'queued', throughput, error_rate, ttfb)
+            increased = True
+
+        self._increased = increased
+        self._last_throughput = throughput
+        if ttfb is not None:
+            self._ttfb_baseline = ttfb if self._ttfb_baseline is None else min(ttfb, self._ttfb_baseline * TTFB_BASELINE_DRIFT)
+        self._start_window(now)
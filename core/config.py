@@ -1,6 +1,9 @@
 
 import os
 
+# 项目根目录
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class Config:
     # 下载目录 - 支持环境变量配置，默认为 download
     DOWNLOAD_DIR = os.environ.get('PODCAST_DOWNLOAD_DIR', 'download')
@@ -14,14 +17,83 @@ class Config:
     # 最大并发下载数
     MAX_WORKERS = int(os.environ.get('PODCAST_MAX_WORKERS', '3'))
     
+    # 数据库文件路径 - 默认位于项目根目录，不受当前工作目录影响
+    DATABASE_PATH = os.environ.get('PODCAST_DB_PATH', os.path.join(BASE_DIR, 'podcasts.db'))
+    
+    # 数据库锁等待时间（毫秒）
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('PODCAST_DB_BUSY_TIMEOUT_MS', '5000'))
+    
+    # 数据库内存映射大小（字节）和页缓存大小（负数表示 KiB）
+    DB_MMAP_SIZE = int(os.environ.get('PODCAST_DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+    DB_CACHE_SIZE = int(os.environ.get('PODCAST_DB_CACHE_SIZE', '-16000'))
+    
+    # 下载状态批量写入：最长合并间隔（毫秒）和单批最大事件数
+    DB_WRITER_FLUSH_INTERVAL_MS = int(os.environ.get('PODCAST_DB_WRITER_FLUSH_INTERVAL_MS', '200'))
+    DB_WRITER_BATCH_SIZE = int(os.environ.get('PODCAST_DB_WRITER_BATCH_SIZE', '100'))
+    
+    # 接口响应缓存：最大条目数、过期时间（秒），以及可选的跨 worker 共享缓存文件路径
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('PODCAST_RESPONSE_CACHE_MAX_ENTRIES', '256'))
+    RESPONSE_CACHE_TTL = float(os.environ.get('PODCAST_RESPONSE_CACHE_TTL', '30'))
+    RESPONSE_CACHE_PATH = os.environ.get('PODCAST_RESPONSE_CACHE_PATH') or None
+    
+    # 频道提取进程池：进程数、空闲时轮询任务的间隔（秒）、心跳超时（秒）和单个任务的最大尝试次数
+    EXTRACTION_WORKERS = int(os.environ.get('PODCAST_EXTRACTION_WORKERS', str(min(2, os.cpu_count() or 1))))
+    EXTRACTION_POLL_INTERVAL = float(os.environ.get('PODCAST_EXTRACTION_POLL_INTERVAL', '1'))
+    EXTRACTION_JOB_TIMEOUT = float(os.environ.get('PODCAST_EXTRACTION_JOB_TIMEOUT', '300'))
+    EXTRACTION_MAX_ATTEMPTS = int(os.environ.get('PODCAST_EXTRACTION_MAX_ATTEMPTS', '2'))
+    
+    # 是否由 Web 进程在首次提交任务时自动启动提取进程池；设为 false 时需单独运行 python -m core.extraction_pool
+    EXTRACTION_POOL_EMBEDDED = os.environ.get('PODCAST_EXTRACTION_POOL_EMBEDDED', 'true').lower() == 'true'
+    # 内嵌进程池的租约有效期（秒）：多个 worker 中只有持有租约的一个启动进程池，持有者退出后其他 worker 最迟在此时间后接替
+    EXTRACTION_POOL_LEASE_TTL = float(os.environ.get('PODCAST_EXTRACTION_POOL_LEASE_TTL', '90'))
+    
+    # 下载租约有效期（秒）：下载中每秒续约一次，持有进程退出后租约最迟在此时间后可被其他进程接管
+    DOWNLOAD_LEASE_TTL = float(os.environ.get('PODCAST_DOWNLOAD_LEASE_TTL', '60'))
+    
+    # 对冲下载：同时请求排名前 HEDGE_WIDTH 个候选音频地址（主地址和节目页上的镜像，按主机首字节时间排序），
+    # 使用最先返回数据的一个；传输中超过 STALL_TIMEOUT 秒收不到数据或连接中断时切换到下一个候选地址
+    DOWNLOAD_HEDGE_WIDTH = int(os.environ.get('PODCAST_DOWNLOAD_HEDGE_WIDTH', '2'))
+    DOWNLOAD_STALL_TIMEOUT = float(os.environ.get('PODCAST_DOWNLOAD_STALL_TIMEOUT', '15'))
+    
+    # 下载并发自适应调整：下载池的线程数为并发上限（默认 DOWNLOAD_MAX_CONCURRENCY，/api/download 的 max_workers
+    # 和 castload --concurrency 可以再降低），同时进行的传输数从 MAX_WORKERS 开始，每 CONCURRENCY_INTERVAL 秒
+    # 按吞吐量、错误率和首字节时间在 [MIN, 上限] 内加一或成倍减小；关闭时固定使用 MAX_WORKERS 个线程
+    ADAPTIVE_CONCURRENCY = os.environ.get('PODCAST_ADAPTIVE_CONCURRENCY', 'true').lower() == 'true'
+    DOWNLOAD_MIN_CONCURRENCY = int(os.environ.get('PODCAST_DOWNLOAD_MIN_CONCURRENCY', '1'))
+    DOWNLOAD_MAX_CONCURRENCY = int(os.environ.get('PODCAST_DOWNLOAD_MAX_CONCURRENCY', '8'))
+    DOWNLOAD_CONCURRENCY_INTERVAL = float(os.environ.get('PODCAST_DOWNLOAD_CONCURRENCY_INTERVAL', '2'))
+    
+    # 下载目录的存储配额（字节，0 表示不限制）和超出配额时的淘汰策略：
+    # lru 为最久未播放的先清理，oldest 为每个播客最早发布的节目先清理；固定的节目不会被清理
+    STORAGE_QUOTA_BYTES = int(os.environ.get('PODCAST_STORAGE_QUOTA_BYTES', '0'))
+    STORAGE_EVICTION_POLICY = os.environ.get('PODCAST_STORAGE_EVICTION_POLICY', 'lru')
+    
+    # 订阅刷新调度（默认关闭）：按每个播客的刷新间隔（未单独设置时使用默认间隔，秒）在后台提交频道提取任务，
+    # 刷新时间加入 ±JITTER 比例的随机抖动；连续无新节目时间隔按 2 的幂退避，最多放大 MAX_BACKOFF 倍；
+    # AUTO_DOWNLOAD 为未单独设置的播客是否自动下载新节目；多个 worker 中只有持有领导者租约的一个运行调度
+    SCHEDULER_ENABLED = os.environ.get('PODCAST_SCHEDULER', 'false').lower() == 'true'
+    SCHEDULER_DEFAULT_INTERVAL = float(os.environ.get('PODCAST_SCHEDULER_INTERVAL', str(6 * 3600)))
+    SCHEDULER_JITTER = float(os.environ.get('PODCAST_SCHEDULER_JITTER', '0.1'))
+    SCHEDULER_MAX_BACKOFF = float(os.environ.get('PODCAST_SCHEDULER_MAX_BACKOFF', '8'))
+    SCHEDULER_AUTO_DOWNLOAD = os.environ.get('PODCAST_SCHEDULER_AUTO_DOWNLOAD', 'false').lower() == 'true'
+    SCHEDULER_TICK = float(os.environ.get('PODCAST_SCHEDULER_TICK', '30'))
+    SCHEDULER_LEADER_TTL = float(os.environ.get('PODCAST_SCHEDULER_LEADER_TTL', '90'))
+    
+    # 指标快照目录：各进程定期把指标写入此目录，/metrics 合并输出；设置为空字符串则只输出当前进程的指标
+    METRICS_DIR = os.environ.get('PODCAST_METRICS_DIR', DATABASE_PATH + '.metrics') or None
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('PODCAST_METRICS_FLUSH_INTERVAL', '10'))
+    
+    # 性能分析（默认关闭）：开启后安装分析中间件，请求头 X-Profile 可对单个请求做 cProfile/采样分析，
+    # PROFILE_ROUTES 为逗号分隔的路径前缀，命中的请求总是做 cProfile 分析；慢请求阈值为 0 表示不记录
+    PROFILING_ENABLED = os.environ.get('PODCAST_PROFILING', 'false').lower() == 'true'
+    PROFILE_DIR = os.environ.get('PODCAST_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+    PROFILE_ROUTES = [route for route in os.environ.get('PODCAST_PROFILE_ROUTES', '').split(',') if route]
+    SLOW_REQUEST_MS = float(os.environ.get('PODCAST_SLOW_REQUEST_MS', '1000'))
+    
     # 测试模式
     TEST_MODE = os.environ.get('PODCAST_TEST_MODE', 'True').lower() == 'true'
-
-
-    # 确保下载目录存在
+    
+    # 确保下载目录存在（在应用启动时调用，导入本模块不产生副作用，重复调用无影响）
     @staticmethod
     def init_config():
         os.makedirs(Config.DOWNLOAD_DIR, exist_ok=True)
-
-# 初始化配置
-Config.init_config()
@@ -0,0 +1,131 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Optional
+from core.config import Config
+from database import apply_download_updates
+
+class DownloadStateWriter:
+    """单线程批量写入下载状态
+
+    下载线程通过 post() 投递状态变化后立即返回，写入线程每隔 flush_interval
+    或累计 batch_size 个事件时，把同一节目的多次变化合并后在一个事务中写入数据库。
+    写入失败（例如其他进程长时间持有写锁）时保留这一批，退避后与新事件合并重试，
+    不会丢弃已完成的下载结果，也不会让同一事务中释放的下载租约一直挂到过期。
+    """
+
+    # 写入失败后的首次重试间隔和最长间隔（秒），连续失败时间隔翻倍
+    RETRY_DELAY = 0.1
+    MAX_RETRY_DELAY = 10.0
+
+    # 可投递的状态字段；release_lease 为下载租约持有者，与状态在同一事务中释放租约
+    FIELDS = ('downloaded', 'download_path', 'file_size', 'file_hash', 'error', 'started_at', 'downloaded_at',
+              'title', 'duration', 'publish_date', 'cover_offset', 'cover_length', 'cover_mime', 'release_lease')
+
+    def __init__(self, flush_interval=0.2, batch_size=100):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='download-state-writer', daemon=True)
+        self._thread.start()
+
+    def post(self, episode_id: Optional[int] = None, url: Optional[str] = None, **fields):
+        """投递一个节目的状态变化，episode_id 和 url（音频地址）至少提供一个"""
+        if episode_id is None and url is None:
+            raise ValueError('episode_id 和 url 不能同时为空')
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"未知的状态字段: {', '.join(sorted(unknown))}")
+        self._queue.put(('update', (episode_id, url), fields))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待此前投递的所有变化写入数据库，返回是否在超时前写入成功
+
+        写入失败时返回 False（这些变化仍会在后台重试）。
+        """
+        waiter = _FlushWaiter()
+        self._queue.put(('flush', None, waiter))
+        return waiter.wait(timeout)
+
+    def _run(self):
+        """写入线程主循环：收集一批事件，合并后写入；失败的一批留到下一轮重试"""
+        pending = {}
+        failures = 0
+        while True:
+            waiters = []
+            event_count = 0
+            # 上一批写入失败时退避一段时间，期间到达的事件合并进来一起重试
+            deadline = None
+            if pending:
+                deadline = time.monotonic() + min(self.RETRY_DELAY * 2 ** (failures - 1), self.MAX_RETRY_DELAY)
+            while event_count < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    kind, key, payload = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if kind == 'flush':
+                    waiters.append(payload)
+                    break
+                # 同一节目的多次变化合并为一次更新，后到的字段覆盖先到的
+                merged = pending.setdefault(key, {})
+                if payload.get('downloaded'):
+                    merged.pop('error', None)
+                merged.update(payload)
+                event_count += 1
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if pending:
+                updates = [
+                    dict(fields, episode_id=episode_id, url=url)
+                    for (episode_id, url), fields in pending.items()
+                ]
+                try:
+                    apply_download_updates(updates)
+                    pending = {}
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    print(f"批量写入下载状态时出错（第 {failures} 次，{len(updates)} 个节目稍后重试）: {e}")
+            for waiter in waiters:
+                waiter.finish(not pending)
+
+class _FlushWaiter:
+    """flush() 的等待者：写入线程处理到它时通知，并告知此前的变化是否已写入"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.ok = False
+
+    def finish(self, ok):
+        self.ok = ok
+        self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout) and self.ok
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+def get_download_state_writer() -> DownloadStateWriter:
+    """获取当前进程的下载状态写入器，首次调用时启动写入线程"""
+    global _writer, _writer_pid
+    with _writer_lock:
+        # fork 出的子进程不会继承写入线程，需要重新创建
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = DownloadStateWriter(
+                flush_interval=Config.DB_WRITER_FLUSH_INTERVAL_MS / 1000,
+                batch_size=Config.DB_WRITER_BATCH_SIZE
+            )
+            _writer_pid = os.getpid()
+        return _writer
+
+@atexit.register
+def _flush_on_exit():
+    """进程退出前写入尚未落盘的状态"""
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.flush(timeout=5)
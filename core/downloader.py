@@ -1,17 +1,143 @@
 
 import requests
+import hashlib
+import itertools
 import os
+import queue
+import socket
 import threading
 import re
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from models.download_status import DownloadStatus
 from core.config import Config
+from core.db_writer import get_download_state_writer
+from core.metrics import registry, TRANSFER_BUCKETS, THROUGHPUT_BUCKETS
+from core.profiling import add_phase_time
+from core.storage import get_storage_manager
+from core.mp3_metadata import MP3MetadataParser
+from core.concurrency import AdaptiveConcurrency
+from database import (
+    claim_download_lease, renew_download_lease, release_download_lease, expire_download_lease, get_download_lease,
+    allocate_download_file, release_download_file, get_audio_candidates, record_host_latency, get_host_latencies
+)
+
+# 下载指标，按音频所在主机分标签
+DOWNLOAD_BYTES = registry.counter('podcast_download_bytes_total', '已下载的字节数', ('host',))
+DOWNLOADS = registry.counter('podcast_downloads_total', '下载次数，按结果分类', ('host', 'result'))
+DOWNLOAD_SECONDS = registry.histogram(
+    'podcast_download_duration_seconds', '单个文件的传输耗时（秒）', ('host',), TRANSFER_BUCKETS
+)
+DOWNLOAD_THROUGHPUT = registry.histogram(
+    'podcast_download_throughput_bytes_per_second', '单个文件的平均传输速度（字节/秒）', ('host',), THROUGHPUT_BUCKETS
+)
+DOWNLOAD_TTFB = registry.histogram('podcast_download_ttfb_seconds', '音频请求的首字节时间（秒）', ('host',))
+DOWNLOAD_FAILOVERS = registry.counter(
+    'podcast_download_failovers_total', '传输中断后切换到其他候选地址的次数，按中断的主机分类', ('host',)
+)
+DOWNLOAD_MIRROR_MISMATCHES = registry.counter(
+    'podcast_download_mirror_mismatch_total', '与主地址不是同一文件（长度或 ETag 不一致）而未使用的镜像', ('host',)
+)
+DOWNLOAD_SOURCES = registry.counter(
+    'podcast_download_source_total', '下载成功时实际使用的音频地址（主地址或镜像）', ('source',)
+)
+
+# 下载中续约并回写进度的间隔，以及等待其他下载者时轮询租约的间隔（秒）
+LEASE_RENEW_INTERVAL = 1.0
+LEASE_POLL_INTERVAL = 0.5
+
+def _lease_holder_is_dead(owner):
+    """租约持有者是否为本机上已经退出的进程；其他主机的持有者只能等待租约过期"""
+    host, _, rest = owner.partition(':')
+    pid = rest.partition(':')[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+def _url_host(url):
+    return urlsplit(url).hostname or 'unknown'
+
+def _error_status(error):
+    return getattr(getattr(error, 'response', None), 'status_code', None)
+
+def _is_congestion_error(error):
+    """限流、服务器错误、超时和连接中断是需要降低并发的信号；404、内容不是音频等错误与负载无关"""
+    if not isinstance(error, requests.RequestException):
+        return False
+    status = _error_status(error)
+    return status is None or status == 429 or status >= 500
+
+class _AudioSource:
+    """已收到首个数据块的候选地址响应"""
+
+    __slots__ = ('url', 'host', 'response', 'chunks', 'first_chunk', 'resumed', 'bytes_total', 'etag')
+
+    def __init__(self, url, response, chunks, first_chunk, resumed, bytes_total):
+        self.url = url
+        self.host = _url_host(url)
+        self.response = response
+        self.chunks = chunks
+        self.first_chunk = first_chunk
+        self.resumed = resumed
+        self.bytes_total = bytes_total
+        self.etag = response.headers.get('ETag')
+
+    def matches(self, bytes_total, etag):
+        """是否与给定总长度（长度未知时比较 ETag）的文件相同；都无法比较时返回 None"""
+        if self.bytes_total is not None and bytes_total is not None:
+            return self.bytes_total == bytes_total
+        if self.etag and etag:
+            return self.etag == etag
+        return None
+
+class BandwidthLimiter:
+    """限制所有下载线程合计的下载速度（令牌桶，最多允许一秒的突发）"""
+
+    def __init__(self, bytes_per_second):
+        self.rate = float(bytes_per_second)
+        self._tokens = self.rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        """记录读取了 size 字节，超出速度限制时阻塞到配额恢复"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= size
+            wait = -self._tokens / self.rate
+        # 令牌不足时记为欠账，在锁外等待，其他线程按累计的欠账等待更久
+        if wait > 0:
+            time.sleep(wait)
 
 class PodcastDownloader:
-    def __init__(self):
+    def __init__(self, max_workers=None, bandwidth_limit=None):
         self.download_dir = Config.DOWNLOAD_DIR
-        self.max_workers = Config.MAX_WORKERS
+        # 开启自适应并发时 max_workers 为同时传输数的上限，实际并发由 download_episodes 中的控制器调整
+        self.max_workers = max_workers or (
+            Config.DOWNLOAD_MAX_CONCURRENCY if Config.ADAPTIVE_CONCURRENCY else Config.MAX_WORKERS
+        )
+        self.concurrency = None
+        # 每个下载线程最近一次下载是否因拥塞类错误失败，自适应并发时据此重试
+        self._thread_state = threading.local()
+        self.rate_limiter = BandwidthLimiter(bandwidth_limit) if bandwidth_limit else None
+        self.lease_ttl = Config.DOWNLOAD_LEASE_TTL
+        self.hedge_width = max(1, Config.DOWNLOAD_HEDGE_WIDTH)
+        self.stall_timeout = Config.DOWNLOAD_STALL_TIMEOUT
         self.download_status = DownloadStatus()
+        self.state_writer = get_download_state_writer()
+        self.storage = get_storage_manager()
         
         # 确保下载目录存在
         os.makedirs(self.download_dir, exist_ok=True)
@@ -24,26 +150,219 @@ class PodcastDownloader:
         safe_title = safe_title[:100]  # 限制100个字符
         return f"{safe_title}.mp3"
     
-    def _handle_duplicate_filename(self, filepath):
-        """处理重复文件名"""
-        base_filepath = filepath
-        counter = 1
-        while os.path.exists(filepath):
-            name, ext = os.path.splitext(base_filepath)
-            filepath = f"{name}_{counter}{ext}"
-            counter += 1
-        return filepath
+    @staticmethod
+    def _new_lease_owner():
+        """生成租约持有者标识：主机名:进程ID:随机后缀（同一进程内的每次下载互不相同）"""
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    def _claim_or_follow(self, url, title, owner, episode_id):
+        """领取下载租约；已有其他下载者时跟随其进度，直到租约释放或持有者退出后再领取
+
+        Returns:
+            bool: 领取前是否跟随过其他下载者
+        """
+        followed = False
+        last_reported = None
+        while not claim_download_lease(url, owner, time.time(), self.lease_ttl, episode_id):
+            lease = get_download_lease(url)
+            if lease is None:
+                continue
+            if _lease_holder_is_dead(lease['locked_by']):
+                print(f"'{title}' 的下载者 {lease['locked_by']} 已退出，接管下载")
+                expire_download_lease(url, lease['locked_by'])
+                continue
+            if not followed:
+                print(f"'{title}' 正在由 {lease['locked_by']} 下载，等待其完成")
+                followed = True
+            progress = (lease['bytes_done'], lease['bytes_total'])
+            if progress != last_reported and lease['bytes_total']:
+                print(f"'{title}' 下载进度: {lease['bytes_done']}/{lease['bytes_total']} 字节")
+                last_reported = progress
+            time.sleep(LEASE_POLL_INTERVAL)
+        return followed
+    
+    def _rank_candidates(self, url):
+        """主地址和备用地址按主机的首字节时间排序；没有记录的主机按已知主机的中位数估计，
+        延迟相同时保持提取时的顺序（主地址在前）"""
+        candidates = [url] + [candidate for candidate in get_audio_candidates(url) if candidate != url]
+        if len(candidates) == 1:
+            return candidates
+        latencies = get_host_latencies({_url_host(candidate) for candidate in candidates})
+        known = sorted(latencies.values())
+        prior = known[len(known) // 2] if known else 0.0
+        return sorted(candidates, key=lambda candidate: latencies.get(_url_host(candidate), prior))
+    
+    def _open_source(self, url, headers, offset=0):
+        """请求一个候选地址并读取首个数据块；offset 大于 0 时请求从该位置续传，
+        服务器忽略 Range 返回完整文件时 resumed 为 False。返回的不是音频时抛出异常"""
+        if offset:
+            headers = dict(headers, Range=f'bytes={offset}-')
+        response = requests.get(url, headers=headers, stream=True, timeout=(self.stall_timeout, self.stall_timeout))
+        try:
+            response.raise_for_status()
+            content_type = (response.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+            if content_type.startswith(('text/html', 'image/')):
+                raise ValueError(f'返回的不是音频（{content_type}）')
+            resumed = bool(offset) and response.status_code == 206
+            if resumed:
+                content_range = re.match(r'bytes (\d+)-\d+/(\d+|\*)', response.headers.get('Content-Range') or '')
+                if not content_range or int(content_range.group(1)) != offset:
+                    raise ValueError('续传的起始位置与已下载的大小不一致')
+                bytes_total = int(content_range.group(2)) if content_range.group(2).isdigit() else None
+            else:
+                bytes_total = int(response.headers.get('Content-Length') or 0) or None
+            chunks = response.iter_content(chunk_size=8192)
+            first_chunk = next(chunks, b'')
+        except Exception:
+            response.close()
+            raise
+        return _AudioSource(url, response, chunks, first_chunk, resumed, bytes_total)
+    
+    def _record_latency(self, url, ttfb, failed=False, censored=False):
+        """把一次请求的首字节时间计入主机的延迟记录，失败的请求至少按卡住超时计；
+        censored 的请求只知道首字节时间的下限，不计入首字节时间直方图"""
+        host = _url_host(url)
+        if failed:
+            ttfb = max(ttfb, self.stall_timeout)
+        elif not censored:
+            DOWNLOAD_TTFB.observe(ttfb, host=host)
+        record_host_latency(host, ttfb, time.time(), failed, censored)
     
-    def download_episode(self, episode_info, force_download=False):
-        """下载单个播客剧集"""
-        title = episode_info[0]  # 标题
-        url = episode_info[1]    # URL
+    def _open_fastest(self, candidates, headers, primary=None, offset=0, reference=None):
+        """按排名同时请求至多 hedge_width 个候选地址，返回最先收到首个数据块、且与主地址为同一文件的一个；
+        失败或不一致的请求由排在后面的候选地址补上，全部失败时抛出最后一个错误
+
+        指定 primary 时主地址总在第一批请求中：镜像先返回时暂存，等主地址返回后核对总长度（或 ETag），
+        一致才使用，无法核对的镜像不使用；主地址请求失败时没有可以核对的基准，使用最先返回的镜像。
+        指定 reference=(总长度, ETag) 时（传输中切换地址），与之明确不一致的候选地址不使用。
+        """
+        results = queue.Queue()
+        
+        def probe(candidate):
+            try:
+                results.put((candidate, self._open_source(candidate, headers, offset), None))
+            except Exception as e:
+                results.put((candidate, None, e))
+        
+        pending = list(candidates)
+        if primary in pending:
+            pending.remove(primary)
+            pending.insert(0, primary)
+        else:
+            primary = None
+        started = {}
+        ttfbs = {}
+        # 先于主地址返回、等待核对的镜像
+        parked = []
+        source = None
+        error = None
+        while source is None and (pending or started):
+            while pending and len(started) < self.hedge_width:
+                candidate = pending.pop(0)
+                started[candidate] = time.perf_counter()
+                threading.Thread(target=probe, args=(candidate,), daemon=True).start()
+            candidate, result, error = results.get()
+            ttfbs[candidate] = time.perf_counter() - started.pop(candidate)
+            self._record_latency(candidate, ttfbs[candidate], failed=error is not None)
+            if result is None:
+                if candidate == primary:
+                    primary = None
+                    if parked:
+                        source = parked.pop(0)
+                continue
+            if candidate == primary:
+                primary = None
+                reference = (result.bytes_total, result.etag)
+                for mirror in parked:
+                    if source is None and mirror.matches(*reference):
+                        source = mirror
+                    else:
+                        self._reject_mirror(mirror)
+                parked = []
+                if source is None:
+                    source = result
+                else:
+                    result.response.close()
+            elif primary is not None:
+                parked.append(result)
+            elif reference is not None and result.matches(*reference) is False:
+                self._reject_mirror(result)
+                error = ValueError(f'{result.host} 上的文件与主地址不一致')
+            else:
+                source = result
+        
+        for mirror in parked:
+            mirror.response.close()
+        if source is not None and self.concurrency is not None:
+            self.concurrency.record_ttfb(ttfbs[source.url])
+        if started:
+            # 落选的请求还没有返回：已等待的时间只是其首字节时间的下限，按截尾样本记录，返回后直接关闭
+            now = time.perf_counter()
+            for candidate, probe_started in started.items():
+                self._record_latency(candidate, now - probe_started, censored=True)
+            threading.Thread(target=self._discard_sources, args=(results, len(started)), daemon=True).start()
+        if source is None:
+            raise error
+        return source
+    
+    @staticmethod
+    def _reject_mirror(source):
+        source.response.close()
+        DOWNLOAD_MIRROR_MISMATCHES.inc(host=source.host)
+        print(f"镜像 {source.url} 与主地址不是同一文件（长度 {source.bytes_total}），不使用")
+    
+    @staticmethod
+    def _discard_sources(results, count):
+        for _ in range(count):
+            _, source, _ = results.get()
+            if source is not None:
+                source.response.close()
+    
+    @staticmethod
+    def _utc_timestamp():
+        """生成与 SQLite CURRENT_TIMESTAMP 相同格式的 UTC 时间"""
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    
+    def download_episode(self, episode_info, force_download=False, episode_id=None):
+        """下载单个播客剧集，下载结果异步写入数据库
+
+        episode_info 可以是数据库中的 PodcastEpisode，也可以是 (标题, 音频URL) 元组；
+        能确定节目 ID 时按 ID 回写状态，否则按音频地址。
+        """
+        if isinstance(episode_info, (tuple, list)):
+            title = episode_info[0]  # 标题
+            url = episode_info[1]    # URL
+        else:
+            title = episode_info.title
+            url = episode_info.audio_url or episode_info.url
+            if episode_id is None:
+                episode_id = episode_info.id
         
         # 检查是否已经下载（除非强制下载）
         if not force_download and self.download_status.is_downloaded(url):
             return f"播客 '{title}' 已经下载过了，跳过。"
         
+        # 同一音频地址同一时间只有一个下载者（跨线程、跨 worker 进程），其他请求跟随其进度
+        owner = self._new_lease_owner()
+        followed = self._claim_or_follow(url, title, owner, episode_id)
+        # 租约释放与下载结果在同一事务中落库，领取到租约后再检查一次即可知道前一个下载者是否已完成
+        if (followed or not force_download) and self.download_status.is_downloaded(url):
+            release_download_lease(url, owner)
+            return f"播客 '{title}' 已由其他下载任务完成。" if followed else f"播客 '{title}' 已经下载过了，跳过。"
+        
+        host = _url_host(url)
+        filepath = None
+        part_path = None
+        # 领取到租约后才占用并发名额：跟随其他下载者等待期间不占名额，名额只用于实际传输
+        transfer_slot = ExitStack()
         try:
+            if self.concurrency is not None:
+                # 排队等待名额的时间可能超过租约有效期，等待期间定期续约，避免租约过期被其他进程接管
+                def renew_while_waiting():
+                    if not renew_download_lease(url, owner, time.time(), self.lease_ttl):
+                        raise RuntimeError('下载租约已失效，已由其他下载者接管')
+                transfer_slot.enter_context(
+                    self.concurrency.slot(on_wait=renew_while_waiting, wait_interval=self.lease_ttl / 3))
             print(f"开始下载: {title}")
             # 添加浏览器请求头以避免被服务器拒绝
             headers = {
@@ -54,44 +373,190 @@ class PodcastDownloader:
                 'Connection': 'keep-alive',
                 'Upgrade-Insecure-Requests': '1',
             }
-            response = requests.get(url, headers=headers, stream=True, timeout=30)
-            response.raise_for_status()
+            started_at = self._utc_timestamp()
+            transfer_started = time.perf_counter()
+            # 节目页上有多个音频地址时对冲请求，使用最先返回数据的一个
+            candidates = self._rank_candidates(url)
+            source = self._open_fastest(candidates, headers, primary=url)
+            host = source.host
+            tried = {source.url}
+            bytes_total = source.bytes_total
+            # 传输中切换地址时核对新地址与当前文件相同
+            reference = (source.bytes_total, source.etag)
+            
+            # 超出存储配额时先清理旧文件，为本次下载腾出空间；文件本身超过配额时放弃下载
+            try:
+                self.storage.make_room(bytes_total or 0)
+            except ValueError:
+                source.response.close()
+                raise
+            
+            # 生成文件名（使用播客标题作为文件名），由数据库分配库内唯一的名字（重名时加序号），
+            # 按播客和文件名哈希分片存放，避免单个目录中文件过多
+            filepath = allocate_download_file(self._generate_filename(title), self.download_dir, episode_id, url)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
             
-            # 生成文件名（使用播客标题作为文件名）
-            filename = self._generate_filename(title)
-            filepath = os.path.join(self.download_dir, filename)
+            # 先写入本次下载独有的临时文件，完成后再原子替换，租约失效时不会与接管者写同一个文件
+            part_path = f"{filepath}.{owner.rsplit(':', 1)[-1]}.part"
             
-            # 检查文件是否已存在，如果存在则添加序号（强制下载时总是添加序号）
-            if force_download and os.path.exists(filepath):
-                filepath = self._handle_duplicate_filename(filepath)
+            # 下载文件，同时计算大小和哈希、从开头的数据中解析 MP3 元数据（不需要再读一遍文件）；
+            # 每秒续约一次并回写进度，供跟随的请求查看
+            file_size = 0
+            file_hash = hashlib.sha256()
+            metadata_parser = MP3MetadataParser()
+            # 传输的总字节数（中途切换地址重新下载时也累计），每次续约时报告给并发控制器
+            transferred = 0
+            reported = 0
+            next_renew = time.monotonic() + LEASE_RENEW_INTERVAL
+            with open(part_path, 'wb') as f:
+                while True:
+                    try:
+                        for chunk in itertools.chain((source.first_chunk,), source.chunks):
+                            f.write(chunk)
+                            file_size += len(chunk)
+                            transferred += len(chunk)
+                            file_hash.update(chunk)
+                            metadata_parser.feed(chunk)
+                            if self.rate_limiter is not None:
+                                self.rate_limiter.consume(len(chunk))
+                            if time.monotonic() >= next_renew:
+                                if not renew_download_lease(url, owner, time.time(), self.lease_ttl, file_size, bytes_total):
+                                    raise RuntimeError('下载租约已失效，已由其他下载者接管')
+                                next_renew = time.monotonic() + LEASE_RENEW_INTERVAL
+                                if self.concurrency is not None:
+                                    self.concurrency.record_bytes(transferred - reported)
+                                    reported = transferred
+                        break
+                    except requests.RequestException as e:
+                        # 传输卡住或连接中断：切换到其他候选地址，支持断点续传时从已下载处继续
+                        source.response.close()
+                        remaining = [candidate for candidate in candidates if candidate not in tried]
+                        if not remaining:
+                            raise
+                        print(f"'{title}' 从 {source.host} 下载中断（{e}），切换到备用地址")
+                        DOWNLOAD_FAILOVERS.inc(host=source.host)
+                        if self.concurrency is not None:
+                            self.concurrency.record_result(False)
+                        self._record_latency(source.url, self.stall_timeout, failed=True)
+                        # 只有已知文件总长度时才续传，且新地址的总长度必须与之相同，否则从头下载，
+                        # 不把两个可能不同的文件拼接在一起
+                        resume_from = file_size if bytes_total is not None else 0
+                        source = self._open_fastest(remaining, headers, offset=resume_from, reference=reference)
+                        if source.resumed and source.bytes_total != bytes_total:
+                            # 续传响应没有给出总长度（Content-Range 为 */*），无法确认是同一文件：
+                            # 从头重新下载这个地址，之后以它的总长度和 ETag 为准
+                            source.response.close()
+                            source = self._open_fastest([source.url], headers)
+                            reference = (source.bytes_total, source.etag)
+                        host = source.host
+                        tried.add(source.url)
+                        if not source.resumed:
+                            bytes_total = source.bytes_total
+                            f.seek(0)
+                            f.truncate()
+                            file_size = 0
+                            file_hash = hashlib.sha256()
+                            metadata_parser = MP3MetadataParser()
+            if not renew_download_lease(url, owner, time.time(), self.lease_ttl, file_size, bytes_total):
+                raise RuntimeError('下载租约已失效，已由其他下载者接管')
+            os.replace(part_path, filepath)
+            part_path = None
             
-            # 下载文件
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            # 记录传输指标（整个文件结束后统计一次，不在分块循环中加锁）
+            elapsed = time.perf_counter() - transfer_started
+            add_phase_time('io', elapsed)
+            DOWNLOAD_BYTES.inc(file_size, host=host)
+            DOWNLOAD_SECONDS.observe(elapsed, host=host)
+            if elapsed > 0:
+                DOWNLOAD_THROUGHPUT.observe(file_size / elapsed, host=host)
+            DOWNLOADS.inc(host=host, result='success')
+            DOWNLOAD_SOURCES.inc(source='primary' if source.url == url else 'mirror')
+            if self.concurrency is not None:
+                self.concurrency.record_bytes(transferred - reported)
+                self.concurrency.record_result(True)
             
-            # 更新下载状态
-            self.download_status.mark_as_downloaded(url)
+            # 更新下载状态和音频元数据，并在同一事务中释放租约
+            metadata = metadata_parser.result(file_size)
+            self.state_writer.post(
+                episode_id=episode_id,
+                url=url,
+                downloaded=True,
+                download_path=filepath,
+                file_size=file_size,
+                file_hash=file_hash.hexdigest(),
+                started_at=started_at,
+                downloaded_at=self._utc_timestamp(),
+                title=metadata['title'],
+                duration=metadata['duration'],
+                publish_date=metadata['publish_date'],
+                cover_offset=metadata['cover_offset'],
+                cover_length=metadata['cover_length'],
+                cover_mime=metadata['cover_mime'],
+                release_lease=owner
+            )
             
             return f"成功下载: {title}"
         except Exception as e:
+            DOWNLOADS.inc(host=host, result='error')
+            if self.concurrency is not None and _is_congestion_error(e):
+                self.concurrency.record_result(False, throttled=_error_status(e) == 429)
+                self._thread_state.congested = True
+            if part_path is not None and os.path.exists(part_path):
+                os.remove(part_path)
+            if filepath is not None and not os.path.exists(filepath):
+                release_download_file(filepath)
+            self.state_writer.post(episode_id=episode_id, url=url, error=str(e), release_lease=owner)
             return f"下载 '{title}' 时出错: {str(e)}"
+        finally:
+            transfer_slot.close()
     
-    def download_episodes(self, episodes):
-        """使用多线程下载多个播客剧集"""
+    def _download_with_retry(self, episode):
+        """下载节目（传输期间占用并发控制器的名额）；因限流等拥塞类错误失败时，
+        等控制器降低并发后重新领取租约和名额重试一次"""
+        for _ in range(2):
+            self._thread_state.congested = False
+            result = self.download_episode(episode)
+            if not self._thread_state.congested:
+                break
+        return result
+    
+    def download_episodes(self, episodes, progress=None):
+        """使用多线程下载多个播客剧集，每完成一个调用 progress(已完成数, 总数, 节目, 结果)
+
+        开启自适应并发时线程数为 max_workers，同时进行的传输数由 self.concurrency 控制器在上限内调整；
+        下载结束后控制器保留在 self.concurrency 上，可查看最终并发数和调整记录。
+        """
         results = []
+        download = self.download_episode
+        if Config.ADAPTIVE_CONCURRENCY:
+            self.concurrency = AdaptiveConcurrency(
+                Config.DOWNLOAD_MIN_CONCURRENCY, self.max_workers, Config.MAX_WORKERS,
+                Config.DOWNLOAD_CONCURRENCY_INTERVAL
+            )
+            download = self._download_with_retry
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 提交所有下载任务
-            future_to_episode = {
-                executor.submit(self.download_episode, episode): episode 
-                for episode in episodes
-            }
-            
-            # 收集结果
-            for future in as_completed(future_to_episode):
-                result = future.result()
-                results.append(result)
-                print(result)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # 提交所有下载任务
+                future_to_episode = {
+                    executor.submit(download, episode): episode 
+                    for episode in episodes
+                }
+                
+                # 收集结果
+                for future in as_completed(future_to_episode):
+                    result = future.result()
+                    results.append(result)
+                    print(result)
+                    if progress is not None:
+                        progress(len(results), len(future_to_episode), future_to_episode[future], result)
+        finally:
+            if self.concurrency is not None:
+                self.concurrency.close()
+        
+        # 大小未知的文件下载前无法预留空间，全部完成并落库后再按配额检查一次
+        if self.storage.enabled:
+            self.state_writer.flush(timeout=30)
+            self.storage.make_room()
         
         return results
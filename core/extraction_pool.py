@@ -0,0 +1,270 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+from core.config import Config
+from core.metrics import registry
+from database import (
+    create_extraction_job, claim_extraction_job, update_extraction_progress, finish_extraction_job,
+    get_stale_extraction_workers, requeue_extraction_jobs, claim_leadership, release_leadership
+)
+
+# 内嵌模式下托管进程池的租约名称：所有 Web worker 竞争同一个租约，只有持有者启动进程池
+POOL_LEADER_NAME = 'extraction-pool'
+
+# 执行任务期间检查父进程是否存活的间隔（秒）
+PARENT_CHECK_INTERVAL = 5.0
+
+class ExtractionPool:
+    """受监督的频道提取进程池
+
+    每个子进程运行独立的事件循环并复用一个 Chromium 浏览器，从 extraction_jobs 表领取任务，
+    进度和结果都写回数据库。监督线程负责重启退出的子进程、终止心跳超时的子进程，
+    并把它们手上的任务重新排队，浏览器崩溃不会影响 Web 进程。
+    """
+
+    def __init__(self, workers=2, poll_interval=1.0, job_timeout=300.0, max_attempts=2):
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.max_attempts = max_attempts
+        # 使用 spawn 启动子进程，避免从多线程的 Web 进程 fork 时继承锁和数据库连接
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = {}
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _spawn(self, slot):
+        """启动（或重启）指定槽位的子进程"""
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.poll_interval, self.job_timeout),
+            name=f'extraction-worker-{slot}',
+            daemon=True
+        )
+        process.start()
+        self._processes[slot] = process
+
+    def start(self):
+        """启动所有子进程和监督线程"""
+        for slot in range(self.workers):
+            self._spawn(slot)
+        self._thread = threading.Thread(target=self._supervise, name='extraction-supervisor', daemon=True)
+        self._thread.start()
+
+    def _supervise(self):
+        """监督循环：回收异常退出的子进程，处理心跳超时的任务"""
+        while not self._stopping.wait(self.poll_interval):
+            try:
+                for slot, process in list(self._processes.items()):
+                    if process.is_alive():
+                        continue
+                    handled = requeue_extraction_jobs(self.max_attempts, worker_pid=process.pid)
+                    print(f"提取进程 {process.pid} 已退出（退出码 {process.exitcode}），回收任务 {handled} 个，正在重启")
+                    self._spawn(slot)
+
+                # 心跳超时说明子进程卡死，终止它，由上面的分支回收任务并重启
+                stale_before = time.time() - self.job_timeout
+                own_pids = {process.pid: process for process in self._processes.values()}
+                for pid in get_stale_extraction_workers(stale_before):
+                    if pid in own_pids:
+                        print(f"提取进程 {pid} 心跳超时，正在终止")
+                        own_pids[pid].terminate()
+                # 其他进程池遗留（例如所在进程已整体退出）的超时任务直接重新排队
+                requeue_extraction_jobs(self.max_attempts, stale_before=stale_before)
+            except Exception as e:
+                print(f"监督提取进程时出错: {e}")
+
+    def stop(self, timeout=5):
+        """停止监督线程并终止所有子进程"""
+        self._stopping.set()
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join(timeout)
+
+    def run_forever(self):
+        """以独立进程方式运行进程池，直到收到中断信号"""
+        self.start()
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+def _worker_main(poll_interval, job_timeout):
+    """子进程入口"""
+    # 提取指标在子进程中产生，定期写入快照供 /metrics 合并
+    registry.start_exporter()
+    # 父进程被 SIGKILL 或 OOM 终止时 daemon 子进程不会被清理，子进程发现父进程变化后自行退出
+    parent_pid = os.getppid()
+    try:
+        asyncio.run(_worker_loop(poll_interval, job_timeout, parent_pid))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+def _parent_alive(parent_pid):
+    """父进程退出后子进程会被过继给其他进程，父进程ID随之改变"""
+    return os.getppid() == parent_pid
+
+async def _worker_loop(poll_interval, job_timeout, parent_pid):
+    """领取并执行任务；浏览器在任务之间复用，断开后在下一个任务前重新启动；父进程退出后停止"""
+    from playwright.async_api import async_playwright
+    from core.podcast_extractor import PodcastExtractor
+
+    extractor = PodcastExtractor()
+    pid = os.getpid()
+    async with async_playwright() as p:
+        browser = None
+        try:
+            while _parent_alive(parent_pid):
+                job = claim_extraction_job(pid, time.time())
+                if job is None:
+                    await asyncio.sleep(poll_interval)
+                    continue
+                if browser is None or not browser.is_connected():
+                    browser = await p.chromium.launch(headless=True)
+                await _run_job(extractor, browser, job, pid, job_timeout, parent_pid)
+            print(f"提取进程 {pid} 的父进程 {parent_pid} 已退出，停止领取任务")
+        finally:
+            if browser is not None and browser.is_connected():
+                await browser.close()
+
+async def _run_job(extractor, browser, job, pid, job_timeout, parent_pid):
+    """执行单个提取任务，心跳在事件循环中定时刷新，事件循环卡死时心跳随之停止
+
+    父进程退出时中止任务、不再续心跳，由新的进程池在心跳超时后重新排队。
+    """
+    job_id = job['id']
+    print(f"提取进程 {pid} 开始处理任务 {job_id}: {job['url']}")
+    job_task = asyncio.current_task()
+
+    async def heartbeat():
+        next_beat = time.monotonic() + job_timeout / 3
+        while True:
+            await asyncio.sleep(min(job_timeout / 3, PARENT_CHECK_INTERVAL))
+            if not _parent_alive(parent_pid):
+                print(f"提取进程 {pid} 的父进程 {parent_pid} 已退出，中止任务 {job_id}")
+                job_task.cancel()
+                return
+            if time.monotonic() >= next_beat:
+                update_extraction_progress(job_id, pid, time.time())
+                next_beat = time.monotonic() + job_timeout / 3
+
+    def progress(done, total):
+        update_extraction_progress(job_id, pid, time.time(), done, total)
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        podcast_name, episodes = await extractor.get_episodes_list(job['url'], browser=browser, progress=progress)
+        podcast_id = extractor.save_podcast_to_db(job['url'], podcast_name)
+        inserted, updated = extractor.save_episodes_to_db(podcast_id, episodes)
+        finish_extraction_job(job_id, pid, podcast_id=podcast_id, inserted=inserted, updated=updated)
+        print(f"任务 {job_id} 完成：{len(episodes)} 个节目，新增 {inserted}，更新 {updated}")
+    except Exception as e:
+        finish_extraction_job(job_id, pid, error=str(e))
+        print(f"任务 {job_id} 失败: {e}")
+    finally:
+        heartbeat_task.cancel()
+
+def create_extraction_pool() -> ExtractionPool:
+    """按配置创建提取进程池"""
+    return ExtractionPool(
+        workers=Config.EXTRACTION_WORKERS,
+        poll_interval=Config.EXTRACTION_POLL_INTERVAL,
+        job_timeout=Config.EXTRACTION_JOB_TIMEOUT,
+        max_attempts=Config.EXTRACTION_MAX_ATTEMPTS
+    )
+
+class EmbeddedPoolHost:
+    """在 Web 进程中竞争进程池租约，持有租约时启动提取进程池，失去租约时停止
+
+    每个 gunicorn worker 都可能运行一个托管线程，但同一时刻只有一个 worker 启动进程池，
+    整个部署只有 EXTRACTION_WORKERS 个 Chromium；持有者退出后由其他 worker 在租约过期后接替，
+    排队中的任务留在数据库中，由新的进程池继续处理。
+    """
+
+    def __init__(self, lease_ttl=90):
+        self.lease_ttl = lease_ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.pool = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self):
+        return self.pool is not None
+
+    def start(self):
+        """启动托管线程"""
+        self._thread = threading.Thread(target=self._run, name='extraction-pool-host', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """停止托管线程和进程池，并释放租约"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.pool is not None:
+            self.pool.stop()
+            self.pool = None
+            release_leadership(POOL_LEADER_NAME, self.holder)
+
+    def _run(self):
+        # 在租约过期前多次续约，一次续约失败不会导致进程池被其他 worker 接管
+        while not self._stopping.is_set():
+            try:
+                self.tick(time.time())
+            except Exception as e:
+                print(f"托管提取进程池出错: {e}")
+            self._stopping.wait(self.lease_ttl / 3)
+
+    def tick(self, now):
+        """领取或续约租约，按结果启动或停止进程池"""
+        is_leader = claim_leadership(POOL_LEADER_NAME, self.holder, now, self.lease_ttl)
+        if is_leader and self.pool is None:
+            print(f"提取进程池由 {self.holder} 托管")
+            self.pool = create_extraction_pool()
+            self.pool.start()
+        elif not is_leader and self.pool is not None:
+            print(f"{self.holder} 失去提取进程池租约，停止进程池")
+            self.pool.stop()
+            self.pool = None
+
+_host = None
+_host_pid = None
+_host_lock = threading.Lock()
+
+def ensure_extraction_pool() -> Optional[EmbeddedPoolHost]:
+    """在当前进程中启动进程池托管线程（仅首次调用时启动）；独立部署模式下返回 None
+
+    只有领取到进程池租约的一个进程实际启动进程池，其他进程提交的任务由它从数据库中领取。
+    """
+    global _host, _host_pid
+    if not Config.EXTRACTION_POOL_EMBEDDED:
+        return None
+    with _host_lock:
+        # fork 出的子进程不会继承托管线程，需要重新启动
+        if _host is None or _host_pid != os.getpid():
+            _host = EmbeddedPoolHost(lease_ttl=Config.EXTRACTION_POOL_LEASE_TTL)
+            _host.start()
+            _host_pid = os.getpid()
+        return _host
+
+def submit_extraction_job(url: str) -> int:
+    """提交频道提取任务并确保有进程池在处理，返回任务ID"""
+    job_id = create_extraction_job(url)
+    ensure_extraction_pool()
+    return job_id
+
+if __name__ == '__main__':
+    # 独立部署：python -m core.extraction_pool，Web 进程需设置 PODCAST_EXTRACTION_POOL_EMBEDDED=false
+    from database import init_db
+    init_db()
+    create_extraction_pool().run_forever()
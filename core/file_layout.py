@@ -0,0 +1,51 @@
+"""把下载目录中的文件迁移到分片目录
+
+新下载的文件按 <播客ID>/<文件名哈希前两位>/<文件名> 存放；旧版本平铺在下载目录中的文件
+由本模块一次性移动到对应的分片目录，并更新文件名索引和节目的下载路径。可重复运行，
+中断后再次运行会从未完成的文件继续。
+
+用法: python -m core.file_layout [--dry-run]
+"""
+import os
+import sys
+from core.config import Config
+from database import get_unsharded_download_files, move_download_file, download_file_relpath
+
+def migrate_download_dir(download_dir=None, dry_run=False) -> dict:
+    """迁移文件名索引中不在分片目录的文件，返回各类文件的数量"""
+    download_dir = download_dir or Config.DOWNLOAD_DIR
+    stats = {'moved': 0, 'missing': 0, 'failed': 0}
+    for entry in get_unsharded_download_files():
+        source = os.path.join(download_dir, entry['path'])
+        path = download_file_relpath(entry['podcast_id'], entry['name'])
+        target = os.path.join(download_dir, path)
+        if dry_run:
+            print(f"{entry['path']} -> {path}")
+            stats['moved'] += 1
+            continue
+        try:
+            if os.path.exists(source):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(source, target)
+            elif not os.path.exists(target):
+                # 上次迁移在移动文件后、更新数据库前中断时目标文件已存在，否则文件已丢失
+                stats['missing'] += 1
+                continue
+            move_download_file(entry['name'], path, entry['download_path'], target)
+            stats['moved'] += 1
+        except OSError as e:
+            print(f"迁移文件 {entry['path']} 时出错: {e}")
+            stats['failed'] += 1
+    return stats
+
+def main():
+    from database import init_db
+    dry_run = '--dry-run' in sys.argv[1:]
+    init_db()
+    stats = migrate_download_dir(dry_run=dry_run)
+    print(f"{'待迁移' if dry_run else '已迁移'} {stats['moved']} 个文件，"
+          f"文件缺失 {stats['missing']} 个，失败 {stats['failed']} 个")
+    return stats
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""流式批量导入节目列表（TSV、CSV、OPML）
+
+文件逐行读取、按批写入 podcasts / podcast_episodes，内存占用与文件大小无关：
+
+- TSV / CSV：第一行包含 title 和 url（或 audio_url）列名时按列名读取，可选列有
+  podcast_name、podcast_url、description、duration、publish_date、index；
+  没有表头时每行为“标题<TAB>链接”（与 import_podcasts.py 的旧格式相同）。
+  没有播客列的行归入导入时指定的播客（默认以文件名命名）。
+- OPML：订阅列表，每个带 xmlUrl（或 htmlUrl）的 outline 导入为一个播客。
+
+已存在的播客和节目（同一播客下链接相同）会被跳过；格式不正确的行记为拒绝，
+通过 on_reject 回调报告行号和原因。未指定序号时按文件中的顺序接在播客已有节目之后。
+"""
+import csv
+import os
+import xml.etree.ElementTree as ET
+from database import ensure_podcasts, import_episode_rows
+
+DEFAULT_BATCH_SIZE = 5000
+
+# 表头别名 -> 字段名
+COLUMN_ALIASES = {
+    'title': 'title', 'episode_title': 'title', '标题': 'title',
+    'url': 'url', 'audio_url': 'url', 'link': 'url', 'enclosure': 'url', '链接': 'url',
+    'podcast_name': 'podcast_name', 'podcast_title': 'podcast_name', 'podcast': 'podcast_name',
+    'podcast_url': 'podcast_url', 'feed_url': 'podcast_url', 'channel_url': 'podcast_url',
+    'description': 'description', 'duration': 'duration',
+    'publish_date': 'publish_date', 'pub_date': 'publish_date', 'date': 'publish_date',
+    'index': 'index', 'index_number': 'index',
+}
+
+FORMATS = {'.tsv': 'tsv', '.txt': 'tsv', '.csv': 'csv', '.opml': 'opml', '.xml': 'opml'}
+
+def detect_format(path):
+    """按扩展名判断文件格式，无法判断时按 TSV 处理"""
+    return FORMATS.get(os.path.splitext(path)[1].lower(), 'tsv')
+
+def _is_url(value):
+    return value.startswith(('http://', 'https://'))
+
+class ImportStats:
+    """导入进度计数"""
+
+    __slots__ = ('rows', 'podcasts', 'podcasts_created', 'inserted', 'skipped', 'rejected')
+
+    def __init__(self):
+        self.rows = 0
+        self.podcasts = 0
+        self.podcasts_created = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.rejected = 0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class LibraryImporter:
+    """把节目列表文件分批导入数据库"""
+
+    def __init__(self, podcast_name=None, podcast_url=None, batch_size=DEFAULT_BATCH_SIZE,
+                 on_progress=None, on_reject=None):
+        self.podcast_name = podcast_name
+        self.podcast_url = podcast_url
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.on_reject = on_reject
+        self.stats = ImportStats()
+        # 播客 URL -> [播客ID, 下一个节目序号]，只保存播客，不保存节目
+        self._podcasts = {}
+
+    def import_file(self, path, file_format=None) -> ImportStats:
+        """导入文件，返回导入统计"""
+        file_format = file_format or detect_format(path)
+        if self.podcast_url is None:
+            self.podcast_url = f'import:{os.path.basename(path)}'
+        if self.podcast_name is None:
+            self.podcast_name = os.path.splitext(os.path.basename(path))[0]
+
+        if file_format == 'opml':
+            self._import_opml(path)
+        else:
+            self._import_table(path, '\t' if file_format == 'tsv' else ',')
+        self._report_progress()
+        return self.stats
+
+    def _report_progress(self):
+        if self.on_progress is not None:
+            self.on_progress(self.stats)
+
+    def _reject(self, line_number, reason, raw):
+        self.stats.rejected += 1
+        if self.on_reject is not None:
+            self.on_reject(line_number, reason, raw)
+
+    def _iter_rows(self, path, delimiter):
+        """逐行产生 (行号, 字段列表)；TSV 不处理引号，单行格式错误时报告后继续"""
+        quoting = csv.QUOTE_NONE if delimiter == '\t' else csv.QUOTE_MINIMAL
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f, delimiter=delimiter, quoting=quoting)
+            while True:
+                try:
+                    fields = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error as e:
+                    self._reject(reader.line_num, f'格式错误: {e}', '')
+                    continue
+                yield reader.line_num, fields
+
+    def _import_table(self, path, delimiter):
+        columns = None
+        batch = []
+        for line_number, fields in self._iter_rows(path, delimiter):
+            if not any(field.strip() for field in fields):
+                continue
+            if columns is None:
+                header = [COLUMN_ALIASES.get(field.strip().lower()) for field in fields]
+                if 'title' in header and 'url' in header:
+                    columns = header
+                    continue
+                columns = ['title', 'url']
+
+            self.stats.rows += 1
+            if len(fields) < 2:
+                self._reject(line_number, '列数不足', delimiter.join(fields))
+                continue
+            row = {name: field.strip() for name, field in zip(columns, fields) if name}
+            reason = self._validate(row)
+            if reason:
+                self._reject(line_number, reason, delimiter.join(fields))
+                continue
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+                self._report_progress()
+        self._flush(batch)
+
+    def _validate(self, row):
+        """检查一行节目数据，返回拒绝原因，有效时返回 None"""
+        if not row.get('title'):
+            return '缺少标题'
+        if not _is_url(row.get('url', '')):
+            return '链接不是 http(s) 地址'
+        if row.get('podcast_url') and not row['podcast_url'].startswith(('http://', 'https://', 'import:')):
+            return '播客地址无效'
+        index = row.get('index')
+        if index and not index.lstrip('-').isdigit():
+            return '序号不是整数'
+        return None
+
+    def _flush(self, batch):
+        """写入一批节目：先补齐本批新出现的播客，再一次性插入节目"""
+        if not batch:
+            return
+        new_podcasts = {}
+        for row in batch:
+            url = row.get('podcast_url') or self.podcast_url
+            if url not in self._podcasts and url not in new_podcasts:
+                new_podcasts[url] = row.get('podcast_name') or (self.podcast_name if url == self.podcast_url else url)
+        if new_podcasts:
+            self._add_podcasts([(name, url) for url, name in new_podcasts.items()])
+
+        rows = []
+        for row in batch:
+            podcast = self._podcasts[row.get('podcast_url') or self.podcast_url]
+            index = row.get('index')
+            if index:
+                index = int(index)
+            else:
+                index = podcast[1]
+                podcast[1] += 1
+            rows.append((podcast[0], row['title'], row['url'], row['url'], row.get('description') or None,
+                         row.get('duration') or None, row.get('publish_date') or None, index))
+        inserted = import_episode_rows(rows)
+        self.stats.inserted += inserted
+        self.stats.skipped += len(rows) - inserted
+
+    def _add_podcasts(self, podcasts):
+        """获取或新建一批播客并记录其ID和下一个节目序号，返回新建的播客数"""
+        known, created = ensure_podcasts(podcasts)
+        for url, (podcast_id, max_index) in known.items():
+            self._podcasts.setdefault(url, [podcast_id, max_index + 1])
+        self.stats.podcasts = len(self._podcasts)
+        self.stats.podcasts_created += created
+        return created
+
+    def _import_opml(self, path):
+        """逐个读取 outline 元素，处理完即释放，不在内存中保留整棵树"""
+        batch = []
+        for _, element in ET.iterparse(path):
+            if element.tag != 'outline':
+                continue
+            url = element.get('xmlUrl') or element.get('htmlUrl') or element.get('url')
+            name = element.get('title') or element.get('text')
+            if url is None and len(element):
+                element.clear()  # 分组节点
+                continue
+            self.stats.rows += 1
+            if not url or not _is_url(url):
+                self._reject(None, '缺少订阅地址', name or '')
+            else:
+                batch.append((name or url, url))
+            element.clear()
+            if len(batch) >= self.batch_size:
+                self._flush_podcasts(batch)
+                batch = []
+                self._report_progress()
+        self._flush_podcasts(batch)
+
+    def _flush_podcasts(self, batch):
+        if not batch:
+            return
+        self.stats.skipped += len(batch) - self._add_podcasts(batch)
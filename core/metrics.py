@@ -0,0 +1,410 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List
+from core.config import Config
+from core.profiling import add_phase_time
+
+try:
+    import fcntl
+except ImportError:  # 没有 fcntl 的平台（Windows）上归档快照时不加跨进程锁
+    fcntl = None
+
+# 已退出进程累计下来的计数器和直方图快照文件名
+RETIRED_SNAPSHOT = 'retired.json'
+
+# 耗时类直方图的默认分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 传输耗时分桶（秒）
+TRANSFER_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+# 吞吐量分桶（字节/秒）
+THROUGHPUT_BUCKETS = tuple(2 ** power for power in range(14, 28))
+
+class _CounterChild:
+    """绑定了一组标签值的计数器"""
+
+    __slots__ = ('_lock', '_state')
+
+    def __init__(self, lock):
+        self._lock = lock
+        self._state = [0.0]
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._state[0] += amount
+
+class _HistogramChild:
+    """绑定了一组标签值的直方图"""
+
+    __slots__ = ('_lock', '_buckets', '_counts', '_state')
+
+    def __init__(self, lock, buckets):
+        self._lock = lock
+        self._buckets = buckets
+        # 各分桶（最后一个为 +Inf）的非累计计数
+        self._counts = [0] * (len(buckets) + 1)
+        # [总和, 总次数]
+        self._state = [0.0, 0]
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._state[0] += value
+            self._state[1] += 1
+
+class _Metric:
+    """带标签的指标，按标签值缓存子指标，热路径上可预先绑定标签避免重复查找"""
+
+    TYPE = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """返回绑定了标签值的子指标"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    TYPE = 'counter'
+
+    def _new_child(self):
+        return _CounterChild(self._lock)
+
+    def inc(self, amount=1.0, **labels):
+        self.labels(**labels).inc(amount)
+
+    def _samples(self):
+        with self._lock:
+            return [[list(key), child._state[0]] for key, child in self._children.items()]
+
+class _GaugeChild:
+    """绑定了一组标签值的仪表"""
+
+    __slots__ = ('_lock', '_state')
+
+    def __init__(self, lock):
+        self._lock = lock
+        self._state = [0.0]
+
+    def set(self, value):
+        with self._lock:
+            self._state[0] = value
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._state[0] += amount
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+class Gauge(_Metric):
+    """可增可减的当前值；多个进程的快照合并时相加（如各 worker 的并发数之和）"""
+
+    TYPE = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild(self._lock)
+
+    def set(self, value, **labels):
+        self.labels(**labels).set(value)
+
+    def inc(self, amount=1.0, **labels):
+        self.labels(**labels).inc(amount)
+
+    def dec(self, amount=1.0, **labels):
+        self.labels(**labels).dec(amount)
+
+    def _samples(self):
+        with self._lock:
+            return [[list(key), child._state[0]] for key, child in self._children.items()]
+
+class Histogram(_Metric):
+    """分桶直方图"""
+
+    TYPE = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(float(bound) for bound in buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def _samples(self):
+        with self._lock:
+            return [[list(key), [list(child._counts), child._state[0], child._state[1]]]
+                    for key, child in self._children.items()]
+
+def timed(histogram: Histogram, phase=None, **labels):
+    """装饰器：把函数耗时记录到直方图；指定 phase 时同时计入当前请求的该阶段耗时"""
+    child = histogram.labels(**labels)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                child.observe(elapsed)
+                if phase is not None:
+                    add_phase_time(phase, elapsed)
+        return wrapper
+    return decorator
+
+def _escape(value):
+    """转义 Prometheus 标签值"""
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class MetricsRegistry:
+    """进程内指标注册表
+
+    gunicorn 的多个 worker 和提取进程池的子进程各自计数：每个进程定期把快照写入
+    共享目录下以进程ID命名的文件，/metrics 输出时合并所有存活进程的快照。
+    进程退出（如 worker 被回收）后，其计数器和直方图累加进 retired.json 再删除快照，
+    保证合并后的 _total 单调不减；仪表只反映存活进程，直接丢弃。
+    """
+
+    def __init__(self, snapshot_dir=None, flush_interval=10.0):
+        self.snapshot_dir = snapshot_dir
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._exporter_pid = None
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        """导出当前进程所有指标的可序列化快照"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {
+                'type': metric.TYPE,
+                'help': metric.help,
+                'labelnames': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'samples': metric._samples(),
+            }
+            for metric in metrics
+        }
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.snapshot_dir, f'{pid}.json')
+
+    def dump(self):
+        """把当前进程的快照原子地写入共享目录"""
+        if not self.snapshot_dir:
+            return
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def start_exporter(self):
+        """启动后台线程定期写入快照（每个进程只启动一次，fork 后重新启动）"""
+        if not self.snapshot_dir:
+            return
+        with self._lock:
+            if self._exporter_pid == os.getpid():
+                return
+            self._exporter_pid = os.getpid()
+            self._exporter = threading.Thread(target=self._export_loop, name='metrics-exporter', daemon=True)
+            self._exporter.start()
+
+    def _export_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.dump()
+            except OSError as e:
+                print(f"写入指标快照时出错: {e}")
+
+    @contextmanager
+    def _retired_lock(self):
+        """跨进程互斥地修改 retired 快照（持锁进程退出时由内核自动释放）"""
+        with open(os.path.join(self.snapshot_dir, 'retired.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_retired(self) -> dict:
+        try:
+            with open(os.path.join(self.snapshot_dir, RETIRED_SNAPSHOT), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _retire(self, path):
+        """把已退出进程的计数器和直方图累加进 retired 快照，然后删除其快照文件
+
+        读取、累加、删除都在锁内完成：其他进程拿到锁时文件已不存在，不会重复累加。
+        """
+        with self._retired_lock():
+            try:
+                with open(path, encoding='utf-8') as f:
+                    dead = json.load(f)
+            except FileNotFoundError:
+                return
+            except (OSError, ValueError):
+                dead = {}
+            retired = self._load_retired()
+            for name, data in dead.items():
+                if data['type'] == 'gauge':
+                    continue
+                target = retired.setdefault(name, dict(data, samples=[]))
+                samples = {tuple(labels): value for labels, value in target['samples']}
+                for labels, value in data['samples']:
+                    key = tuple(labels)
+                    current = samples.get(key)
+                    if data['type'] == 'counter':
+                        samples[key] = (current or 0) + value
+                    elif current is None:
+                        samples[key] = [list(value[0]), value[1], value[2]]
+                    elif len(current[0]) == len(value[0]):
+                        samples[key] = [[a + b for a, b in zip(current[0], value[0])],
+                                        current[1] + value[1], current[2] + value[2]]
+                target['samples'] = [[list(key), value] for key, value in samples.items()]
+            retired_path = os.path.join(self.snapshot_dir, RETIRED_SNAPSHOT)
+            tmp_path = f'{retired_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(retired, f, ensure_ascii=False)
+            os.replace(tmp_path, retired_path)
+            os.remove(path)
+
+    def _peer_snapshots(self) -> List[dict]:
+        """读取其他存活进程的快照和 retired 快照，把已退出进程的快照累加进 retired"""
+        if not self.snapshot_dir or not os.path.isdir(self.snapshot_dir):
+            return []
+        snapshots = []
+        for entry in os.scandir(self.snapshot_dir):
+            name, ext = os.path.splitext(entry.name)
+            if ext != '.json' or not name.isdigit() or int(name) == os.getpid():
+                continue
+            if not _pid_alive(int(name)):
+                try:
+                    self._retire(entry.path)
+                except OSError as e:
+                    print(f"归档已退出进程的指标快照时出错: {e}")
+                continue
+            try:
+                with open(entry.path, encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        retired = self._load_retired()
+        if retired:
+            snapshots.append(retired)
+        return snapshots
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式输出本进程、其他存活进程和已退出进程累计的合并指标"""
+        merged = {}
+        for snapshot in [self.snapshot()] + self._peer_snapshots():
+            for name, data in snapshot.items():
+                target = merged.setdefault(name, dict(data, samples={}))
+                for labels, value in data['samples']:
+                    key = tuple(labels)
+                    current = target['samples'].get(key)
+                    if data['type'] in ('counter', 'gauge'):
+                        target['samples'][key] = (current or 0) + value
+                    elif current is None:
+                        target['samples'][key] = [list(value[0]), value[1], value[2]]
+                    elif len(current[0]) == len(value[0]):
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+
+        lines = []
+        for name in sorted(merged):
+            data = merged[name]
+            labelnames = data['labelnames']
+            lines.append(f"# HELP {name} {data['help']}")
+            lines.append(f"# TYPE {name} {data['type']}")
+            for key in sorted(data['samples']):
+                value = data['samples'][key]
+                if data['type'] in ('counter', 'gauge'):
+                    lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(list(data['buckets']) + [float('inf')], counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labelnames, key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# 全局指标注册表
+registry = MetricsRegistry(
+    snapshot_dir=Config.METRICS_DIR,
+    flush_interval=Config.METRICS_FLUSH_INTERVAL
+)
@@ -0,0 +1,378 @@
+import re
+from typing import Optional
+
+# MPEG 音频帧头各字段的查找表
+# 版本位：0 = MPEG 2.5，2 = MPEG 2，3 = MPEG 1（1 为保留值）
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+# (是否 MPEG 1, 层) -> 比特率表（kbps），层位：3 = Layer I，2 = Layer II，1 = Layer III
+_BITRATES = {
+    (True, 3): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 1): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 3): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 1): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# 关心的 ID3 帧：帧ID -> 字段名（v2.2 使用三字符帧ID）
+_TEXT_FRAMES = {
+    b'TIT2': 'title', b'TT2': 'title',
+    b'TDRC': 'recording_time', b'TDRL': 'release_time',
+    b'TYER': 'year', b'TYE': 'year',
+    b'TDAT': 'day_month', b'TDA': 'day_month',
+}
+_PICTURE_FRAMES = (b'APIC', b'PIC')
+
+# 文本帧最多缓存的字节数，更大的帧直接跳过
+MAX_TEXT_FRAME_SIZE = 4096
+# 解析图片帧头（编码、MIME、描述）最多需要的字节数
+MAX_PICTURE_HEADER_SIZE = 1024
+# ID3 标签之后最多扫描多少字节寻找第一个音频帧
+MAX_SYNC_SCAN = 64 * 1024
+
+_ENCODINGS = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}
+
+def _synchsafe(data: bytes) -> int:
+    """解码 ID3v2 的 synchsafe 整数（每字节只用低 7 位）"""
+    value = 0
+    for byte in data:
+        value = (value << 7) | (byte & 0x7f)
+    return value
+
+def _decode_text(body: bytes) -> Optional[str]:
+    """解码 ID3 文本帧：首字节为编码，多个值以空字符分隔时取第一个"""
+    if not body:
+        return None
+    encoding = _ENCODINGS.get(body[0], 'latin-1')
+    try:
+        text = body[1:].decode(encoding, errors='replace')
+    except LookupError:
+        return None
+    text = text.split('\x00', 1)[0].strip()
+    return text or None
+
+def _terminator_end(data: bytes, start: int, wide: bool) -> int:
+    """返回从 start 开始的空字符结尾字符串之后的位置，找不到时返回 -1"""
+    if not wide:
+        end = data.find(b'\x00', start)
+        return -1 if end < 0 else end + 1
+    position = start
+    while position + 1 < len(data):
+        if data[position] == 0 and data[position + 1] == 0:
+            return position + 2
+        position += 2
+    return -1
+
+def format_duration(seconds: float) -> str:
+    """把秒数格式化为 H:MM:SS（不足一小时为 M:SS）"""
+    total = int(round(seconds))
+    hours, remainder = divmod(total, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f'{hours}:{minutes:02d}:{secs:02d}'
+    return f'{minutes}:{secs:02d}'
+
+class MP3MetadataParser:
+    """在下载过程中增量解析 MP3 元数据
+
+    只查看文件开头：ID3v2 标签（标题、日期、封面图片在文件中的偏移）和第一个音频帧
+    （比特率、采样率，以及 VBR 文件的 Xing/Info/VBRI 头中的总帧数）。不关心的帧和封面图片数据
+    只计数跳过、不缓存，解析完成后 feed() 立即返回，对下载循环几乎没有开销。
+    时长优先由 Xing/VBRI 的总帧数计算，否则在下载结束时按文件大小和首帧比特率估算。
+    """
+
+    def __init__(self):
+        self.done = False
+        self._buffer = bytearray()
+        self._offset = 0  # _buffer[0] 在文件中的偏移
+        self._skip = 0  # 尚未到达、需要直接丢弃的字节数
+        self._state = self._parse_tag_header
+        self._tag_end = 0
+        self._tag_version = 0
+        self._sync_scanned = 0
+        self.tags = {}
+        self.cover = None  # (偏移, 长度, MIME, 图片类型)
+        self.audio_offset = None
+        self.bitrate = None  # kbps
+        self.sample_rate = None
+        self.samples_per_frame = None
+        self.frame_count = None  # 来自 Xing/Info/VBRI 头
+        self.audio_bytes = None
+
+    def feed(self, data: bytes):
+        """追加一段下载到的数据"""
+        if self.done:
+            return
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            self._skip -= skipped
+            self._offset += skipped
+            data = data[skipped:]
+        self._buffer += data
+        while not self.done and self._state():
+            pass
+
+    def _consume(self, count: int):
+        """丢弃接下来的 count 个字节（超出已缓存部分的在后续 feed 中跳过）"""
+        if count <= len(self._buffer):
+            del self._buffer[:count]
+            self._offset += count
+        else:
+            self._skip = count - len(self._buffer)
+            self._offset += len(self._buffer)
+            self._buffer.clear()
+
+    def _finish(self):
+        self.done = True
+        self._buffer = bytearray()
+
+    # 以下各状态处理函数在数据足够、状态前进时返回 True，需要更多数据时返回 False
+    def _parse_tag_header(self):
+        if len(self._buffer) < 10:
+            return False
+        header = bytes(self._buffer[:10])
+        if not header.startswith(b'ID3') or header[3] not in (2, 3, 4):
+            self._state = self._find_first_frame
+            return True
+        self._tag_version = header[3]
+        flags = header[5]
+        tag_size = _synchsafe(header[6:10])
+        # 标签尾部可能另有 10 字节的页脚
+        self._tag_end = self._offset + 10 + tag_size + (10 if flags & 0x10 else 0)
+        self._consume(10)
+        if flags & 0x80:
+            # 整个标签经过反同步处理，帧内偏移不可靠，直接跳过标签
+            self._consume(self._tag_end - self._offset)
+            self._state = self._parse_tag_header
+        elif flags & 0x40 and self._tag_version >= 3:
+            self._state = self._skip_extended_header
+        else:
+            self._state = self._parse_frame
+        return True
+
+    def _skip_extended_header(self):
+        if len(self._buffer) < 4:
+            return False
+        size = (_synchsafe(self._buffer[:4]) if self._tag_version == 4
+                else int.from_bytes(self._buffer[:4], 'big') + 4)
+        self._consume(size)
+        self._state = self._parse_frame
+        return True
+
+    def _parse_frame(self):
+        header_size = 6 if self._tag_version == 2 else 10
+        remaining = self._tag_end - self._offset
+        if remaining < header_size:
+            self._consume(max(0, remaining))
+            self._state = self._parse_tag_header  # 可能紧接着还有一个 ID3 标签
+            return True
+        if len(self._buffer) < header_size:
+            return False
+        header = bytes(self._buffer[:header_size])
+        if header[0] == 0:
+            # 进入填充区
+            self._consume(remaining)
+            self._state = self._parse_tag_header
+            return True
+
+        if self._tag_version == 2:
+            frame_id, size, flags = header[:3], int.from_bytes(header[3:6], 'big'), 0
+        else:
+            frame_id = header[:4]
+            size = _synchsafe(header[4:8]) if self._tag_version == 4 else int.from_bytes(header[4:8], 'big')
+            flags = header[9]
+        size = min(size, remaining - header_size)
+
+        # 压缩、加密或单帧反同步的帧无法直接读取
+        if self._tag_version == 4:
+            unreadable = flags & 0x0e
+            prefix = (4 if flags & 0x01 else 0) + (1 if flags & 0x40 else 0)
+        elif self._tag_version == 3:
+            unreadable = flags & 0xc0
+            prefix = 1 if flags & 0x20 else 0
+        else:
+            unreadable, prefix = 0, 0
+
+        if unreadable or (frame_id not in _TEXT_FRAMES and frame_id not in _PICTURE_FRAMES):
+            self._consume(header_size + size)
+            return True
+
+        if frame_id in _TEXT_FRAMES:
+            if size > MAX_TEXT_FRAME_SIZE:
+                self._consume(header_size + size)
+                return True
+            if len(self._buffer) < header_size + size:
+                return False
+            body = bytes(self._buffer[header_size + prefix:header_size + size])
+            self.tags.setdefault(_TEXT_FRAMES[frame_id], _decode_text(body))
+            self._consume(header_size + size)
+            return True
+
+        needed = header_size + min(size, MAX_PICTURE_HEADER_SIZE)
+        if len(self._buffer) < needed:
+            return False
+        body_start = self._offset + header_size + prefix
+        body = bytes(self._buffer[header_size + prefix:needed])
+        self._parse_picture(frame_id, body, body_start, size - prefix)
+        self._consume(header_size + size)
+        return True
+
+    def _parse_picture(self, frame_id, body, body_start, body_size):
+        """从图片帧头计算图片数据在文件中的位置，优先使用封面（图片类型 3）"""
+        if len(body) < 2:
+            return
+        wide = body[0] in (1, 2)
+        if frame_id == b'PIC':
+            mime = {b'JPG': 'image/jpeg', b'PNG': 'image/png'}.get(body[1:4].upper(), 'image/jpeg')
+            picture_type_at = 4
+        else:
+            mime_end = body.find(b'\x00', 1)
+            if mime_end < 0:
+                return
+            mime = body[1:mime_end].decode('latin-1') or 'image/jpeg'
+            if '/' not in mime:
+                mime = f'image/{mime.lower()}'
+            picture_type_at = mime_end + 1
+        if picture_type_at >= len(body):
+            return
+        picture_type = body[picture_type_at]
+        data_start = _terminator_end(body, picture_type_at + 1, wide)
+        if data_start < 0:
+            return
+        if self.cover is None or (picture_type == 3 and self.cover[3] != 3):
+            self.cover = (body_start + data_start, body_size - data_start, mime, picture_type)
+
+    def _find_first_frame(self):
+        """在标签之后寻找第一个有效的音频帧（要求下一帧也能对上帧头，避免误判）"""
+        position = 0
+        buffer = self._buffer
+        while True:
+            position = buffer.find(b'\xff', position)
+            if position < 0 or position + 4 > len(buffer):
+                break
+            header = self._frame_header(buffer[position:position + 4])
+            if header is None:
+                position += 1
+                continue
+            frame_length = header[0]
+            if position + frame_length + 4 > len(buffer):
+                break  # 等待更多数据以校验下一帧
+            if self._frame_header(buffer[position + frame_length:position + frame_length + 4]) is None:
+                position += 1
+                continue
+            self._read_first_frame(position, header)
+            self._finish()
+            return True
+
+        # 末尾最多 3 个字节可能是被截断的帧头，留到下次
+        scanned = position if position >= 0 else max(0, len(buffer) - 3)
+        if self._sync_scanned + scanned > MAX_SYNC_SCAN:
+            self._finish()
+            return True
+        # 丢弃已确认不含帧头的部分，保留可能不完整的帧
+        if scanned:
+            self._sync_scanned += scanned
+            self._consume(scanned)
+        return False
+
+    @staticmethod
+    def _frame_header(data):
+        """解析 4 字节帧头，返回 (帧长度, 版本位, 层位, 比特率kbps, 采样率, 声道模式)，无效时返回 None"""
+        if len(data) < 4 or data[0] != 0xff or data[1] & 0xe0 != 0xe0:
+            return None
+        version = (data[1] >> 3) & 0x03
+        layer = (data[1] >> 1) & 0x03
+        bitrate_index = data[2] >> 4
+        sample_rate_index = (data[2] >> 2) & 0x03
+        if version == 1 or layer == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+            return None
+        padding = (data[2] >> 1) & 0x01
+        channel_mode = data[3] >> 6
+        mpeg1 = version == 3
+        bitrate = _BITRATES[(mpeg1, layer)][bitrate_index]
+        sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+        if layer == 3:
+            length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+        elif layer == 1 and not mpeg1:
+            length = 72 * bitrate * 1000 // sample_rate + padding
+        else:
+            length = 144 * bitrate * 1000 // sample_rate + padding
+        return length, version, layer, bitrate, sample_rate, channel_mode
+
+    def _read_first_frame(self, position, header):
+        """记录首帧参数，并读取其中的 Xing/Info 或 VBRI 头"""
+        frame_length, version, layer, bitrate, sample_rate, channel_mode = header
+        mpeg1 = version == 3
+        self.audio_offset = self._offset + position
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        if layer == 3:
+            self.samples_per_frame = 384
+        elif layer == 1 and not mpeg1:
+            self.samples_per_frame = 576
+        else:
+            self.samples_per_frame = 1152
+
+        frame = bytes(self._buffer[position:position + frame_length])
+        mono = channel_mode == 3
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+        xing_at = 4 + side_info
+        if frame[xing_at:xing_at + 4] in (b'Xing', b'Info') and len(frame) >= xing_at + 8:
+            flags = int.from_bytes(frame[xing_at + 4:xing_at + 8], 'big')
+            field_at = xing_at + 8
+            if flags & 0x01 and len(frame) >= field_at + 4:
+                self.frame_count = int.from_bytes(frame[field_at:field_at + 4], 'big')
+                field_at += 4
+            if flags & 0x02 and len(frame) >= field_at + 4:
+                self.audio_bytes = int.from_bytes(frame[field_at:field_at + 4], 'big')
+        elif frame[36:40] == b'VBRI' and len(frame) >= 54:
+            self.audio_bytes = int.from_bytes(frame[46:50], 'big')
+            self.frame_count = int.from_bytes(frame[50:54], 'big')
+
+    def duration(self, total_size: Optional[int] = None) -> Optional[float]:
+        """音频时长（秒）：有总帧数时精确计算，否则按文件大小和首帧比特率估算"""
+        if self.sample_rate is None:
+            return None
+        if self.frame_count:
+            return self.frame_count * self.samples_per_frame / self.sample_rate
+        audio_bytes = self.audio_bytes
+        if not audio_bytes and total_size:
+            audio_bytes = total_size - self.audio_offset
+        if not audio_bytes or not self.bitrate:
+            return None
+        return audio_bytes * 8 / (self.bitrate * 1000)
+
+    def publish_date(self) -> Optional[str]:
+        """标签中的发布日期（ISO 格式），精确到日才返回"""
+        for key in ('release_time', 'recording_time'):
+            value = self.tags.get(key)
+            match = re.match(r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2}))?)?', value or '')
+            if match:
+                year, month, day, hour, minute, second = match.groups()
+                if hour is None:
+                    return f'{year}-{month}-{day}'
+                return f'{year}-{month}-{day} {hour}:{minute}:{second or "00"}'
+        # ID3v2.3：TYER 为年份，TDAT 为 DDMM
+        year, day_month = self.tags.get('year'), self.tags.get('day_month')
+        if year and day_month and re.fullmatch(r'\d{4}', year) and re.fullmatch(r'\d{4}', day_month):
+            return f'{year}-{day_month[2:]}-{day_month[:2]}'
+        return None
+
+    def result(self, total_size: Optional[int] = None) -> dict:
+        """汇总解析结果"""
+        duration = self.duration(total_size)
+        return {
+            'title': self.tags.get('title'),
+            'publish_date': self.publish_date(),
+            'duration_seconds': duration,
+            'duration': format_duration(duration) if duration else None,
+            'bitrate': self.bitrate,
+            'sample_rate': self.sample_rate,
+            'cover_offset': self.cover[0] if self.cover else None,
+            'cover_length': self.cover[1] if self.cover else None,
+            'cover_mime': self.cover[2] if self.cover else None,
+        }
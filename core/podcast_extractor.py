@@ -1,10 +1,21 @@
 import re
 import asyncio
+import html
 import os
-from playwright.async_api import async_playwright
+import time
+from urllib.parse import urljoin
 from core.config import Config
-from database import insert_or_update_podcast, get_podcast_by_url
-from models.podcast_models import Podcast
+from database import insert_or_update_podcast, get_podcast_by_url, upsert_episodes, save_audio_candidates
+from models.podcast_models import Podcast, PodcastEpisode
+from core.metrics import registry
+
+# 提取指标：页面处理耗时（频道页/节目页）和音频地址命中的匹配层级
+EXTRACTION_PAGE_SECONDS = registry.histogram(
+    'podcast_extraction_page_seconds', '提取时单个页面的处理耗时（秒）', ('page',)
+)
+AUDIO_URL_MATCHES = registry.counter(
+    'podcast_audio_url_match_total', '音频地址提取命中的匹配层级', ('tier',)
+)
 
 class PodcastExtractor:
     """通用播客提取器，支持多种音频源"""
@@ -12,26 +23,6 @@ class PodcastExtractor:
     def __init__(self):
         self.test_mode = Config.TEST_MODE
     
-    def save_episodes_to_file(self, episodes):
-        """将播客列表保存到文件"""
-        filepath = os.path.join(Config.DOWNLOAD_DIR, 'podcast_links.txt')
-        with open(filepath, 'w', encoding='utf-8') as f:
-            for title, url in episodes:
-                f.write(f"{title},{url}\n")
-    
-    def load_episodes_from_file(self):
-        """从文件加载播客列表"""
-        filepath = os.path.join(Config.DOWNLOAD_DIR, 'podcast_links.txt')
-        if os.path.exists(filepath):
-            episodes = []
-            with open(filepath, 'r', encoding='utf-8') as f:
-                for line in f:
-                    parts = line.strip().split(',', 1)
-                    if len(parts) == 2:
-                        episodes.append((parts[0], parts[1]))
-            return episodes
-        return []
-    
     # 定义多种音频URL模式
     AUDIO_PATTERNS = [
         # 原有的vistopia模式
@@ -58,43 +49,104 @@ class PodcastExtractor:
             str or None: 找到的音频URL，如果未找到则返回None
         """
         # 尝试各种模式匹配音频URL
-        for pattern in cls.AUDIO_PATTERNS:
+        for tier, pattern in enumerate(cls.AUDIO_PATTERNS):
             match = re.search(pattern, page_content)
             if match:
+                AUDIO_URL_MATCHES.inc(tier=f'pattern_{tier}')
                 return match.group(0)
         
         # 如果正则表达式没有找到，尝试查找audio标签
         audio_match = re.search(r'<audio[^>]*src=[\'"]([^\'"]+)[\'"]', page_content)
         if audio_match:
+            AUDIO_URL_MATCHES.inc(tier='audio_tag')
             return audio_match.group(1)
             
         # 查找source标签
         source_match = re.search(r'<source[^>]*src=[\'"]([^\'"]+)[\'"][^>]*type=[\'"]audio', page_content)
         if source_match:
+            AUDIO_URL_MATCHES.inc(tier='source_tag')
             return source_match.group(1)
-            
+        
+        AUDIO_URL_MATCHES.inc(tier='none')
         return None
     
-    async def get_episodes_list(self, podcast_url=None, batch_size=10):
+    # 备用地址只从包含主地址的 <audio> 元素中收集（元素自身的 src 和其中的 <source>），
+    # 页面上其他节目、播放列表或广告的音频链接不会被当作本节目的镜像
+    AUDIO_ELEMENT_PATTERN = re.compile(r'<audio\b([^>]*)>(.*?)</audio>', re.IGNORECASE | re.DOTALL)
+    SOURCE_TAG_PATTERN = re.compile(r'<source\b[^>]*>', re.IGNORECASE)
+    SRC_PATTERN = re.compile(r'\bsrc=[\'"](https?://[^\'"]+)[\'"]', re.IGNORECASE)
+    MAX_AUDIO_CANDIDATES = 5
+    
+    @classmethod
+    def _player_sources(cls, attributes, body):
+        """一个 <audio> 元素中的音频地址：元素自身的 src 在前，<source> 子元素按出现顺序在后"""
+        urls = [html.unescape(match.group(1)) for match in cls.SRC_PATTERN.finditer(attributes)]
+        for tag in cls.SOURCE_TAG_PATTERN.finditer(body):
+            urls.extend(html.unescape(match.group(1)) for match in cls.SRC_PATTERN.finditer(tag.group(0)))
+        return urls
+    
+    @classmethod
+    async def extract_audio_urls(cls, page_content):
+        """
+        从页面内容中提取主音频URL和备用音频URL（同一个播放器中的其他音频源）
+        
+        Args:
+            page_content (str): 页面HTML内容
+            
+        Returns:
+            list: 去重后的音频URL列表，第一个与 extract_audio_url 的结果相同；未找到时为空列表
+        """
+        primary = await cls.extract_audio_url(page_content)
+        if not primary:
+            return []
+        
+        candidates = [primary]
+        for element in cls.AUDIO_ELEMENT_PATTERN.finditer(page_content):
+            urls = cls._player_sources(element.group(1), element.group(2))
+            if html.unescape(primary) not in urls:
+                continue
+            for url in urls:
+                if url not in candidates and url != html.unescape(primary):
+                    candidates.append(url)
+            break
+        return candidates[:cls.MAX_AUDIO_CANDIDATES]
+    
+    async def get_episodes_list(self, podcast_url=None, batch_size=10, browser=None, progress=None):
         """
         获取播客列表，支持分批加载
         
         Args:
             podcast_url (str): 播客频道URL
             batch_size (int): 每批处理的播客数量
+            browser: 复用已启动的 Playwright 浏览器；为 None 时临时启动一个并在结束后关闭
+            progress (callable): 每处理完一个节目调用 progress(已处理数, 总数)
             
         Returns:
-            tuple: (podcast_name, list) 包含播客名称和播客信息的元组 [('title', 'url'), ...]
+            tuple: (podcast_name, list) 包含播客名称和节目列表的元组，
+                列表元素为 (title, audio_url, alternates)，alternates 为备用音频URL列表
         """
         # 如果没有提供URL，使用配置中的默认URL
         if podcast_url is None:
             podcast_url = Config.LIST_PAGE_URL
-            
+        
+        if browser is not None:
+            return await self._extract_episodes(browser, podcast_url, batch_size, progress)
+        
+        # Playwright 导入较慢，只在真正需要启动浏览器时才加载
+        from playwright.async_api import async_playwright
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-
+            try:
+                return await self._extract_episodes(browser, podcast_url, batch_size, progress)
+            finally:
+                await browser.close()
+    
+    async def _extract_episodes(self, browser, podcast_url, batch_size, progress):
+        """使用给定的浏览器抓取频道页及各节目页"""
+        page = await browser.new_page()
+        try:
             print(f"使用Playwright访问主页: {podcast_url}")
+            channel_started = time.perf_counter()
             await page.goto(podcast_url)
             
             # 获取播客名称
@@ -147,6 +199,8 @@ class PodcastExtractor:
             }''')
 
             episodes_data = [ep for ep in episodes_data if ep['href']]
+            # 频道页耗时包含滚动加载全部节目的时间
+            EXTRACTION_PAGE_SECONDS.observe(time.perf_counter() - channel_started, page='channel')
 
             # 如果是测试模式，只处理前10个（而不是限制为5个）
             if self.test_mode:
@@ -155,6 +209,9 @@ class PodcastExtractor:
 
             all_episodes = []
             total_episodes = len(episodes_data)
+            processed = 0
+            if progress is not None:
+                progress(processed, total_episodes)
             
             # 分批处理播客
             for i in range(0, total_episodes, batch_size):
@@ -163,22 +220,26 @@ class PodcastExtractor:
                 
                 batch_episodes = []
                 for ep_data in batch:
-                    full_link = f"https://castbox.fm{ep_data['href']}"
+                    # 相对链接按频道页地址解析（castbox 频道页下等价于 https://castbox.fm + href）
+                    full_link = urljoin(podcast_url, ep_data['href'])
                     title = ep_data['title']
                     print(f"--- 正在处理: {title} ---")
 
                     new_page = await browser.new_page()
+                    page_started = time.perf_counter()
 
                     try:
                         await new_page.goto(full_link)
                         await new_page.wait_for_selector(".trackinfo-titleBox", timeout=30000)
 
                         page_content = await new_page.content()
-                        audio_url = await self.extract_audio_url(page_content)
+                        audio_urls = await self.extract_audio_urls(page_content)
 
-                        if audio_url:
-                            batch_episodes.append((title, audio_url))
-                            print(f"✓ 成功找到音频URL: {audio_url}")
+                        if audio_urls:
+                            audio_url, alternates = audio_urls[0], audio_urls[1:]
+                            batch_episodes.append((title, audio_url, alternates))
+                            print(f"✓ 成功找到音频URL: {audio_url}"
+                                  + (f"（另有 {len(alternates)} 个备用地址）" if alternates else ""))
                         else:
                             print("× 警告: 未能从页面中找到音频URL。")
                             # 尝试打印页面的部分内容以帮助调试
@@ -188,14 +249,19 @@ class PodcastExtractor:
                         print(f"处理 '{title}' 时发生错误: {e}")
                     finally:
                         await new_page.close()
+                        EXTRACTION_PAGE_SECONDS.observe(time.perf_counter() - page_started, page='episode')
+                        processed += 1
+                        if progress is not None:
+                            progress(processed, total_episodes)
                 
                 # 将这一批的结果添加到总列表中
                 all_episodes.extend(batch_episodes)
                 # 添加一个小的延迟，避免过于频繁的请求
                 await asyncio.sleep(1)
 
-            await browser.close()
             return (podcast_name, all_episodes)
+        finally:
+            await page.close()
 
     def save_podcast_to_db(self, podcast_url, podcast_name):
         """
@@ -212,4 +278,32 @@ class PodcastExtractor:
             name=podcast_name,
             url=podcast_url
         )
-        return insert_or_update_podcast(podcast)
\ No newline at end of file
+        return insert_or_update_podcast(podcast)
+    
+    def save_episodes_to_db(self, podcast_id, episodes):
+        """
+        将提取到的节目列表在单个事务中批量写入数据库，
+        备用URL另存到候选地址表，下载时用于对冲请求和失败切换
+        
+        Args:
+            podcast_id (int): 播客ID
+            episodes (list): get_episodes_list 返回的 (title, audio_url, alternates) 列表
+            
+        Returns:
+            tuple: (新增数, 更新数)
+        """
+        total = len(episodes)
+        result = upsert_episodes(podcast_id, [
+            PodcastEpisode(
+                title=title,
+                url=audio_url,
+                audio_url=audio_url,
+                podcast_id=podcast_id,
+                index=total - position  # 页面按从新到旧排列，序号越大越新
+            )
+            for position, (title, audio_url, _) in enumerate(episodes)
+        ])
+        candidates = {audio_url: alternates for _, audio_url, alternates in episodes}
+        if candidates:
+            save_audio_candidates(candidates)
+        return result
\ No newline at end of file
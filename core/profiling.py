@@ -0,0 +1,223 @@
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+from core.config import Config
+
+# 当前线程正在处理的请求的分阶段耗时；未启用性能分析时始终为 None
+_local = threading.local()
+
+def add_phase_time(phase: str, seconds: float):
+    """把耗时计入当前请求的某个阶段（db、serialize、io），不在请求中时忽略"""
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+class _SamplingProfiler:
+    """采样分析器：后台线程定期抓取目标线程的调用栈，输出 flamegraph.pl / speedscope 可读的折叠栈"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+class _ClosingBody:
+    """包装响应体，在服务器关闭响应时结束计时"""
+
+    def __init__(self, body, on_close):
+        self._body = body
+        self._on_close = on_close
+
+    def __iter__(self):
+        return iter(self._body)
+
+    def close(self):
+        try:
+            if hasattr(self._body, 'close'):
+                self._body.close()
+        finally:
+            self._on_close()
+
+class ProfilingMiddleware:
+    """可选的 WSGI 性能分析中间件
+
+    - 每个请求的数据库、序列化、I/O 和响应发送耗时写入 Server-Timing 响应头
+    - 请求头 X-Profile: cprofile|sample（或命中 PODCAST_PROFILE_ROUTES 的路径）时对该请求做性能分析，
+      cProfile 结果保存为 .prof，采样结果保存为折叠栈 .folded
+    - 处理时间超过阈值的请求由看门狗线程记录当时的调用栈
+    """
+
+    def __init__(self, app, profile_dir, slow_threshold_ms=0, profile_routes=(), sample_interval=0.005):
+        self.app = app
+        self.profile_dir = profile_dir
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.profile_routes = tuple(profile_routes)
+        self.sample_interval = sample_interval
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        if self.slow_threshold > 0:
+            threading.Thread(target=self._watchdog, name='slow-request-watchdog', daemon=True).start()
+
+    def _profile_mode(self, environ):
+        """返回本次请求的分析方式：None、'cprofile' 或 'sample'"""
+        header = environ.get('HTTP_X_PROFILE', '').strip().lower()
+        if header in ('sample', 'sampling'):
+            return 'sample'
+        if header in ('1', 'true', 'cprofile'):
+            return 'cprofile'
+        path = environ.get('PATH_INFO', '')
+        if self.profile_routes and path.startswith(self.profile_routes):
+            return 'cprofile'
+        return None
+
+    def _profile_path(self, environ, extension):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_') or 'root'
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        return os.path.join(self.profile_dir, f"{stamp}-{environ.get('REQUEST_METHOD', 'GET')}-{path}-{os.getpid()}.{extension}")
+
+    def __call__(self, environ, start_response):
+        timings = {}
+        _local.timings = timings
+        started = time.perf_counter()
+        request_id = object()
+        with self._lock:
+            self._in_flight[request_id] = (threading.get_ident(), started, environ, [False])
+
+        mode = self._profile_mode(environ)
+        profiler = None
+        if mode == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif mode == 'sample':
+            profiler = _SamplingProfiler(threading.get_ident(), self.sample_interval)
+            profiler.start()
+
+        def timed_start_response(status, headers, exc_info=None):
+            elapsed = time.perf_counter() - started
+            parts = [f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in sorted(timings.items())]
+            parts.append(f'app;dur={elapsed * 1000:.1f}')
+            headers.append(('Server-Timing', ', '.join(parts)))
+            return start_response(status, headers, exc_info)
+
+        app_returned = []
+        finished = []
+
+        def finish():
+            if finished:
+                return
+            finished.append(True)
+            total = time.perf_counter() - started
+            if app_returned:
+                timings['send'] = total - (app_returned[0] - started)
+            _local.timings = None
+            with self._lock:
+                self._in_flight.pop(request_id, None)
+            if profiler is not None:
+                self._save_profile(environ, mode, profiler)
+            if self.slow_threshold > 0 and total >= self.slow_threshold:
+                phases = ', '.join(f'{phase}={seconds * 1000:.1f}ms' for phase, seconds in sorted(timings.items()))
+                print(f"慢请求 {environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')}: "
+                      f"{total * 1000:.1f}ms ({phases})")
+
+        try:
+            body = self.app(environ, timed_start_response)
+        except BaseException:
+            finish()
+            raise
+        app_returned.append(time.perf_counter())
+
+        # 文件响应交给服务器的 sendfile，不能包装，在此结束计时
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None and isinstance(file_wrapper, type) and isinstance(body, file_wrapper):
+            finish()
+            return body
+        return _ClosingBody(body, finish)
+
+    def _save_profile(self, environ, mode, profiler):
+        """保存单个请求的分析结果"""
+        try:
+            if mode == 'cprofile':
+                profiler.disable()
+                path = self._profile_path(environ, 'prof')
+                profiler.dump_stats(path)
+            else:
+                profiler.stop()
+                path = self._profile_path(environ, 'folded')
+                profiler.dump(path)
+            print(f"性能分析结果已保存: {path}")
+        except Exception as e:
+            print(f"保存性能分析结果时出错: {e}")
+
+    def _watchdog(self):
+        """定期检查处理中的请求，超过阈值时记录一次当时的调用栈"""
+        interval = max(self.slow_threshold / 2, 0.05)
+        while True:
+            time.sleep(interval)
+            now = time.perf_counter()
+            with self._lock:
+                slow = [entry for entry in self._in_flight.values()
+                        if not entry[3][0] and now - entry[1] >= self.slow_threshold]
+                for entry in slow:
+                    entry[3][0] = True
+            frames = sys._current_frames() if slow else {}
+            for thread_id, started, environ, _ in slow:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = ''.join(traceback.format_stack(frame))
+                print(f"慢请求 {environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')} "
+                      f"已执行 {(now - started) * 1000:.0f}ms，当前调用栈:\n{stack}")
+
+def install_profiling(app):
+    """为 Flask 应用安装性能分析中间件和带计时的 JSON 序列化"""
+    from flask.json.provider import DefaultJSONProvider
+
+    class TimedJSONProvider(DefaultJSONProvider):
+        """把 JSON 序列化耗时计入 serialize 阶段"""
+
+        def dumps(self, obj, **kwargs):
+            started = time.perf_counter()
+            try:
+                return super().dumps(obj, **kwargs)
+            finally:
+                add_phase_time('serialize', time.perf_counter() - started)
+
+    app.json = TimedJSONProvider(app)
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app,
+        profile_dir=Config.PROFILE_DIR,
+        slow_threshold_ms=Config.SLOW_REQUEST_MS,
+        profile_routes=Config.PROFILE_ROUTES
+    )
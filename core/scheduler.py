@@ -0,0 +1,198 @@
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+from core.config import Config
+from core.metrics import registry
+from database import (
+    claim_leadership, release_leadership, get_unscheduled_podcast_ids, add_podcast_schedules,
+    get_due_schedules, count_refreshing_schedules, start_schedule_refresh, get_finished_schedule_refreshes,
+    finish_schedule_refresh, get_pending_episodes
+)
+
+# 领导者租约名称：所有 worker 竞争同一个租约，只有持有者执行调度
+LEADER_NAME = 'subscription-scheduler'
+
+SCHEDULED_REFRESHES = registry.counter(
+    'podcast_scheduled_refresh_total', '订阅调度的刷新次数，按结果分类', ('result',)
+)
+
+def next_refresh_delay(interval, unchanged_streak, jitter, max_backoff, rng=random):
+    """计算距下次刷新的秒数：连续 unchanged_streak 次没有新节目时间隔翻倍（最多 max_backoff 倍），
+    再乘以 [1 - jitter, 1 + jitter] 之间的随机系数"""
+    factor = min(2 ** unchanged_streak, max_backoff)
+    return interval * factor * rng.uniform(1 - jitter, 1 + jitter)
+
+class SubscriptionScheduler:
+    """订阅刷新调度器
+
+    后台线程定期竞争领导者租约，持有租约的进程为新播客创建刷新计划（首次刷新时间在一个间隔内均匀分布），
+    为到期的播客提交频道提取任务（同时进行的任务数不超过提取进程数），并在任务结束后根据是否有新节目
+    计算下次刷新时间、按需自动下载新节目。计划和任务状态都在数据库中，领导者切换后由新领导者继续。
+    """
+
+    def __init__(self, default_interval=6 * 3600, jitter=0.1, max_backoff=8, auto_download=False,
+                 tick_interval=30, leader_ttl=90, max_concurrent=2):
+        self.default_interval = default_interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.auto_download = auto_download
+        self.tick_interval = tick_interval
+        self.leader_ttl = leader_ttl
+        self.max_concurrent = max(1, max_concurrent)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._rng = random.Random()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动调度线程"""
+        self._thread = threading.Thread(target=self._run, name='subscription-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """停止调度线程并释放领导者租约"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.is_leader:
+            release_leadership(LEADER_NAME, self.holder)
+            self.is_leader = False
+
+    def run_forever(self):
+        """以独立进程方式运行调度器，直到收到中断信号"""
+        self.start()
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.tick(time.time())
+            except Exception as e:
+                print(f"订阅调度出错: {e}")
+            self._stopping.wait(self.tick_interval)
+
+    def tick(self, now):
+        """执行一轮调度；不是领导者时只尝试领取租约"""
+        was_leader = self.is_leader
+        self.is_leader = claim_leadership(LEADER_NAME, self.holder, now, self.leader_ttl)
+        if self.is_leader != was_leader:
+            print(f"订阅调度器 {self.holder} {'成为' if self.is_leader else '不再是'}领导者")
+        if not self.is_leader:
+            return
+
+        self._schedule_new_podcasts(now)
+        self._collect_finished(now)
+        self._submit_due(now)
+
+    def _schedule_new_podcasts(self, now):
+        """为新增的播客创建刷新计划，首次刷新时间在一个默认间隔内均匀分布，避免同时到期"""
+        podcast_ids = get_unscheduled_podcast_ids()
+        if podcast_ids:
+            add_podcast_schedules([
+                (podcast_id, now + self._rng.uniform(0, self.default_interval))
+                for podcast_id in podcast_ids
+            ])
+
+    def _collect_finished(self, now):
+        """处理已结束的刷新任务：计算退避和下次刷新时间，按需下载新节目"""
+        for schedule in get_finished_schedule_refreshes():
+            podcast_id = schedule['podcast_id']
+            streak = schedule['unchanged_streak']
+            error = None
+            if schedule['job_status'] == 'done' and schedule['job_inserted']:
+                streak = 0
+                result = 'changed'
+                auto_download = schedule['auto_download']
+                if auto_download if auto_download is not None else self.auto_download:
+                    self._download_new_episodes(podcast_id, schedule['baseline_episode_id'])
+            elif schedule['job_status'] == 'done':
+                streak += 1
+                result = 'unchanged'
+            else:
+                # 失败不计入退避，按当前间隔重试
+                error = schedule['job_error'] or '提取失败'
+                result = 'failed'
+
+            interval = schedule['refresh_interval'] or self.default_interval
+            delay = next_refresh_delay(interval, streak, self.jitter, self.max_backoff, self._rng)
+            finish_schedule_refresh(podcast_id, now, now + delay, streak, error)
+            SCHEDULED_REFRESHES.inc(result=result)
+
+    def _submit_due(self, now):
+        """为到期的播客提交提取任务，进行中的任务数不超过 max_concurrent，其余留到下一轮"""
+        running = count_refreshing_schedules()
+        capacity = self.max_concurrent - running
+        due = get_due_schedules(now, capacity) if capacity > 0 else []
+        if not due and not running:
+            return
+
+        # 提取进程池依赖 multiprocessing，只在有任务时导入；领导者切换后也需要在新领导者进程中启动进程池
+        from core.extraction_pool import ensure_extraction_pool, submit_extraction_job
+        ensure_extraction_pool()
+        for schedule in due:
+            job_id = submit_extraction_job(schedule['url'])
+            start_schedule_refresh(schedule['podcast_id'], job_id)
+            SCHEDULED_REFRESHES.inc(result='submitted')
+            print(f"定时刷新播客 '{schedule['name']}'，任务 {job_id}")
+
+    def _download_new_episodes(self, podcast_id, baseline_episode_id):
+        """在后台线程中下载本次刷新新增的节目（下载租约保证不会与其他下载重复）"""
+        episodes = get_pending_episodes(podcast_id, after_id=baseline_episode_id or 0)
+        if not episodes:
+            return
+
+        def download():
+            from core.downloader import PodcastDownloader  # 下载器依赖 requests，首次使用时才导入
+            PodcastDownloader().download_episodes(episodes)
+
+        print(f"自动下载播客 {podcast_id} 的 {len(episodes)} 个新节目")
+        threading.Thread(target=download, name=f'auto-download-{podcast_id}', daemon=True).start()
+
+def create_scheduler() -> SubscriptionScheduler:
+    """按配置创建调度器"""
+    return SubscriptionScheduler(
+        default_interval=Config.SCHEDULER_DEFAULT_INTERVAL,
+        jitter=Config.SCHEDULER_JITTER,
+        max_backoff=Config.SCHEDULER_MAX_BACKOFF,
+        auto_download=Config.SCHEDULER_AUTO_DOWNLOAD,
+        tick_interval=Config.SCHEDULER_TICK,
+        leader_ttl=Config.SCHEDULER_LEADER_TTL,
+        max_concurrent=Config.EXTRACTION_WORKERS
+    )
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+def ensure_scheduler() -> Optional[SubscriptionScheduler]:
+    """在当前进程中启动调度线程（仅首次调用时启动）；未开启调度时返回 None
+
+    每个 worker 都会启动调度线程，但只有领取到领导者租约的一个执行调度，领导者退出后由其他 worker 接替。
+    """
+    global _scheduler, _scheduler_pid
+    if not Config.SCHEDULER_ENABLED:
+        return None
+    with _scheduler_lock:
+        # fork 出的子进程不会继承调度线程，需要重新启动
+        if _scheduler is None or _scheduler_pid != os.getpid():
+            _scheduler = create_scheduler()
+            _scheduler.start()
+            _scheduler_pid = os.getpid()
+        return _scheduler
+
+if __name__ == '__main__':
+    # 独立部署：python -m core.scheduler（Web 进程可不开启 PODCAST_SCHEDULER）
+    from database import init_db
+    init_db()
+    create_scheduler().run_forever()
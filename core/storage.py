@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from typing import Tuple
+from core.config import Config
+from core.metrics import registry
+from database import get_storage_usage, get_eviction_candidates, evict_episode_file, touch_episode_access
+
+EVICTED_FILES = registry.counter('podcast_storage_evicted_files_total', '因超出存储配额清理的文件数')
+EVICTED_BYTES = registry.counter('podcast_storage_evicted_bytes_total', '因超出存储配额清理的字节数')
+
+# 每次从存储索引读取的淘汰候选数
+EVICTION_BATCH_SIZE = 50
+
+# 同一节目的访问时间在此间隔（秒）内只记录一次，避免播放时的每个 Range 请求都写数据库
+ACCESS_RESOLUTION = 60.0
+_recent_access = {}
+_recent_access_lock = threading.Lock()
+
+def record_access(episode_id: int):
+    """记录节目音频被访问（播放或下载到本地），用于按最近最少使用淘汰"""
+    now = time.time()
+    with _recent_access_lock:
+        if now - _recent_access.get(episode_id, 0) < ACCESS_RESOLUTION:
+            return
+        if len(_recent_access) > 10000:
+            _recent_access.clear()
+        _recent_access[episode_id] = now
+    touch_episode_access(episode_id, now)
+
+class StorageManager:
+    """下载目录的存储配额管理
+
+    已下载文件的大小和最近访问时间记录在数据库的存储索引中，总用量由触发器增量维护。
+    超出配额时按淘汰策略从索引中依次取出未固定的节目，先在数据库中标记为未下载再删除文件，
+    多个进程同时清理时每个文件只会被其中一个处理。
+    """
+
+    def __init__(self, quota_bytes=0, policy='lru', download_dir=None):
+        self.quota_bytes = quota_bytes
+        self.policy = policy
+        self.download_dir = download_dir or Config.DOWNLOAD_DIR
+
+    @property
+    def enabled(self):
+        return self.quota_bytes > 0
+
+    def usage(self) -> dict:
+        """当前用量、配额和淘汰策略"""
+        return dict(get_storage_usage(), quota_bytes=self.quota_bytes, policy=self.policy)
+
+    def make_room(self, incoming_bytes=0) -> Tuple[int, int]:
+        """清理文件直到当前用量加上即将写入的字节数不超过配额，返回 (清理的文件数, 字节数)
+
+        每个文件淘汰前在写事务中重新核对总用量，其他进程同时清理时本进程不会多删。
+        即将写入的文件本身就超过配额时抛出 ValueError，不为它清空整个库。
+        """
+        if not self.enabled:
+            return 0, 0
+        if incoming_bytes > self.quota_bytes:
+            raise ValueError(f'文件大小 {incoming_bytes} 字节超过存储配额 {self.quota_bytes} 字节')
+        # 总用量不超过此值时停止清理
+        target = max(0, self.quota_bytes - incoming_bytes)
+        evicted_files = 0
+        evicted_bytes = 0
+        while get_storage_usage()['bytes'] > target:
+            candidates = get_eviction_candidates(EVICTION_BATCH_SIZE, self.policy)
+            if not candidates:
+                print(f"存储用量超出配额 {get_storage_usage()['bytes'] - target} 字节，但没有可清理的未固定节目")
+                break
+            for candidate in candidates:
+                if not evict_episode_file(candidate['episode_id'], candidate['download_path'], above_bytes=target):
+                    # 已被其他进程清理，或其他进程的清理已使总用量降到配额以内
+                    if get_storage_usage()['bytes'] <= target:
+                        break
+                    continue
+                self._remove_file(candidate['download_path'])
+                evicted_files += 1
+                evicted_bytes += candidate['file_size']
+        if evicted_files:
+            EVICTED_FILES.inc(evicted_files)
+            EVICTED_BYTES.inc(evicted_bytes)
+            print(f"存储配额清理: 删除 {evicted_files} 个文件，释放 {evicted_bytes} 字节")
+        return evicted_files, evicted_bytes
+
+    def _remove_file(self, path):
+        """删除下载目录内的文件，目录外的路径只从数据库中移除、不删除"""
+        if not path:
+            return
+        real_path = os.path.realpath(path)
+        real_download_dir = os.path.realpath(self.download_dir)
+        if os.path.commonpath([real_path, real_download_dir]) != real_download_dir:
+            print(f"跳过删除下载目录外的文件: {path}")
+            return
+        try:
+            os.remove(real_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"删除文件 {path} 时出错: {e}")
+
+def get_storage_manager() -> StorageManager:
+    """按当前配置创建存储管理器"""
+    return StorageManager(
+        quota_bytes=Config.STORAGE_QUOTA_BYTES,
+        policy=Config.STORAGE_EVICTION_POLICY,
+        download_dir=Config.DOWNLOAD_DIR
+    )
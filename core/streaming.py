@@ -0,0 +1,107 @@
+import mimetypes
+import os
+from urllib.parse import quote
+from flask import Response, request
+from werkzeug.http import http_date, is_resource_modified, parse_date
+from werkzeug.wsgi import wrap_file
+
+# 非 sendfile 路径下每次读取的块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def _server_honours_content_length(environ):
+    """判断服务器的 wsgi.file_wrapper 是否按 Content-Length 截断输出
+
+    gunicorn 的 FileWrapper 会从文件当前位置起用 sendfile 发送 Content-Length 个字节，
+    因此可以直接把定位好的文件交给它实现零拷贝的分段响应。
+    """
+    file_wrapper = environ.get('wsgi.file_wrapper')
+    return file_wrapper is not None and type(file_wrapper).__module__.startswith('gunicorn')
+
+def _read_range(f, length):
+    """从文件当前位置读取 length 个字节的生成器，结束后关闭文件"""
+    try:
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+def send_range_file(path, mimetype=None, download_name=None, as_attachment=False):
+    """发送文件，支持 Range/206、If-Range 以及 ETag/Last-Modified 条件请求
+
+    完整文件和单段 Range 请求都通过 wsgi.file_wrapper 发送，在 gunicorn 下走 sendfile 零拷贝；
+    多段 Range 请求按完整文件返回 200。
+
+    Args:
+        path (str): 文件路径
+        mimetype (str): 响应类型，默认按扩展名推断
+        download_name (str): 下载时的文件名，默认为文件本身的名称
+        as_attachment (bool): 是否以附件形式下载而不是在浏览器中播放
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f"{stat.st_mtime_ns:x}-{size:x}"
+    mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    headers = {'Accept-Ranges': 'bytes'}
+    if as_attachment:
+        response_name = download_name or os.path.basename(path)
+        headers['Content-Disposition'] = content_disposition(response_name)
+
+    def finish(response):
+        response.set_etag(etag)
+        response.headers['Last-Modified'] = http_date(stat.st_mtime)
+        response.headers.update(headers)
+        return response
+
+    # 条件 GET：文件未变化时返回 304
+    if not is_resource_modified(request.environ, etag=etag, last_modified=stat.st_mtime):
+        return finish(Response(status=304))
+
+    # If-Range 与当前文件不一致时忽略 Range，返回完整文件
+    byte_range = request.range
+    if byte_range is not None and 'If-Range' in request.headers:
+        if_range = request.if_range
+        if if_range.etag is not None:
+            if if_range.etag != etag:
+                byte_range = None
+        elif if_range.date != parse_date(http_date(stat.st_mtime)):
+            byte_range = None
+
+    start, stop = 0, size
+    status = 200
+    if byte_range is not None and len(byte_range.ranges) == 1:
+        span = byte_range.range_for_length(size)
+        if span is None:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f"bytes */{size}"
+            return finish(response)
+        start, stop = span
+        status = 206
+
+    f = open(path, 'rb')
+    f.seek(start)
+    length = stop - start
+    if status == 200 or _server_honours_content_length(request.environ):
+        body = wrap_file(request.environ, f, STREAM_CHUNK_SIZE)
+    else:
+        # 其他服务器的 file_wrapper 会一直读到文件末尾，分段响应只能自行限制长度
+        body = _read_range(f, length)
+
+    response = Response(body, status=status, mimetype=mimetype, direct_passthrough=True)
+    response.headers['Content-Length'] = str(length)
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+    return finish(response)
+
+def content_disposition(filename):
+    """生成附件下载头，非 ASCII 文件名使用 RFC 5987 编码"""
+    try:
+        filename.encode('ascii')
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"attachment; filename*=UTF-8''{quote(filename)}"
@@ -1,15 +1,95 @@
 import sqlite3
+import hashlib
+import html
+import inspect
 import os
-from datetime import datetime
-from typing import List, Optional
+import re
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+from core.config import Config
+from core.cache import response_cache, LIBRARY
+from core.metrics import registry, timed
 from models.podcast_models import Podcast, PodcastEpisode
 
-# 数据库文件路径
-DATABASE = 'podcasts.db'
+# 数据库文件路径（兼容旧代码，实际路径以 Config.DATABASE_PATH 为准）
+DATABASE = Config.DATABASE_PATH
+
+# 每个线程持有一个长连接，避免每次查询都重新打开数据库
+_local = threading.local()
+
+def _connect(path: str) -> sqlite3.Connection:
+    """创建一个启用 WAL 并调优过 PRAGMA 的连接"""
+    conn = sqlite3.connect(path, timeout=Config.DB_BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row  # 使查询结果可以通过列名访问
+    
+    # WAL 模式下读不阻塞写、写不阻塞读；NORMAL 同步级别在 WAL 下仍然是崩溃安全的
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {int(Config.DB_BUSY_TIMEOUT_MS)}')
+    conn.execute(f'PRAGMA mmap_size = {int(Config.DB_MMAP_SIZE)}')
+    conn.execute(f'PRAGMA cache_size = {int(Config.DB_CACHE_SIZE)}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+def get_db_connection() -> sqlite3.Connection:
+    """获取当前线程的数据库连接
+
+    连接在线程内复用，不要手动关闭；fork 出的子进程（如 gunicorn worker）会重新建立连接。
+    """
+    path = Config.DATABASE_PATH
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid() or _local.path != path:
+        conn = _connect(path)
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.path = path
+    return conn
+
+def close_db_connection():
+    """关闭当前线程持有的数据库连接"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+@contextmanager
+def write_transaction():
+    """在当前线程连接上开启写事务，正常退出时提交，异常时回滚
+
+    使用 BEGIN IMMEDIATE 预先获取写锁，避免先读后写时因锁升级失败而报 database is locked。
+    """
+    conn = get_db_connection()
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        yield conn
+    # 提交成功后清除本进程的接口响应缓存（其他进程通过 library_version 感知变化）
+    response_cache.invalidate(LIBRARY)
+
+# podcast_episodes 表在初始建表之后新增的列：列名 -> 列定义
+PODCAST_EPISODE_EXTRA_COLUMNS = {
+    'file_size': 'INTEGER',
+    'file_hash': 'TEXT',
+    'download_error': 'TEXT',
+    'downloaded_at': 'TIMESTAMP',
+    'download_started_at': 'TIMESTAMP',
+    'pinned': 'INTEGER NOT NULL DEFAULT 0',
+    'evicted_at': 'TIMESTAMP',
+    'cover_offset': 'INTEGER',
+    'cover_length': 'INTEGER',
+    'cover_mime': 'TEXT',
+}
+
+def _ensure_columns(cursor: sqlite3.Cursor, table: str, columns: dict):
+    """为已有的表补充缺失的列"""
+    existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
 
 def init_db():
     """初始化数据库并创建表"""
-    conn = sqlite3.connect(DATABASE)
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     # 创建播客单集表（旧表，保留兼容性）
@@ -56,138 +136,650 @@ def init_db():
         )
     ''')
     
+    # 为旧数据库补充后续新增的列
+    _ensure_columns(cursor, 'podcast_episodes', PODCAST_EPISODE_EXTRA_COLUMNS)
+    
+    # 旧版本加载频道时只写入了 url（即音频地址），补齐 audio_url 以便下载状态按音频地址回写
+    cursor.execute('UPDATE podcast_episodes SET audio_url = url WHERE audio_url IS NULL')
+    
     # 创建索引以提高查询性能
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_podcast_episodes_podcast_id ON podcast_episodes (podcast_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_podcast_episodes_downloaded ON podcast_episodes (downloaded)')
+    # 分页游标 (podcast_id, index_number, id) 使用的复合索引，id 即 rowid 已隐式包含在索引中
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_podcast_episodes_page ON podcast_episodes (podcast_id, index_number)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_podcast_episodes_audio_url ON podcast_episodes (audio_url)')
+    # 下载队列查询 WHERE downloaded = 0 [AND podcast_id = ?] ORDER BY podcast_id, index_number DESC
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_podcast_episodes_pending ON podcast_episodes (downloaded, podcast_id, index_number)')
+    
+    # 创建库版本号表，由触发器在每次写入时递增，用作接口响应的 ETag 和缓存键
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS library_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO library_version (id, version) VALUES (1, 0)')
+    for table in ('episodes', 'podcasts', 'podcast_episodes'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE library_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+    
+    # 创建频道提取任务表，Web 进程提交任务，提取进程池领取执行并回写进度和结果
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS extraction_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress_done INTEGER NOT NULL DEFAULT 0,
+            progress_total INTEGER,
+            podcast_id INTEGER,
+            inserted INTEGER,
+            updated INTEGER,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker_pid INTEGER,
+            heartbeat_at REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (podcast_id) REFERENCES podcasts (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_extraction_jobs_status ON extraction_jobs (status, id)')
+    
+    # 创建订阅刷新计划表：每个播客一行，记录刷新间隔、下次刷新时间和连续无更新次数（用于退避）；
+    # 计划状态频繁变化，不放在 podcasts 表中，避免触发库版本号变化使接口缓存失效
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS podcast_schedules (
+            podcast_id INTEGER PRIMARY KEY,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            refresh_interval REAL,
+            auto_download INTEGER,
+            next_refresh_at REAL NOT NULL,
+            last_refresh_at REAL,
+            unchanged_streak INTEGER NOT NULL DEFAULT 0,
+            job_id INTEGER,
+            baseline_episode_id INTEGER,
+            last_error TEXT,
+            FOREIGN KEY (podcast_id) REFERENCES podcasts (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_podcast_schedules_due ON podcast_schedules (next_refresh_at)')
+    
+    # 创建领导者租约表：多个 gunicorn worker 中只有持有租约的一个运行后台任务（如订阅刷新调度）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leader_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires REAL NOT NULL
+        )
+    ''')
+    
+    # 创建下载租约表：同一音频地址同一时间只有一个下载者，其他请求跟随租约上的进度；
+    # 持有者每秒续约，进程退出后租约过期即可被接管
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS download_leases (
+            url TEXT PRIMARY KEY,
+            episode_id INTEGER,
+            locked_by TEXT NOT NULL,
+            lease_expires REAL NOT NULL,
+            bytes_done INTEGER NOT NULL DEFAULT 0,
+            bytes_total INTEGER,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # 创建备用音频地址表：节目页上除主地址外的其他音频地址（镜像），按提取时的优先级排列
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audio_url_candidates (
+            audio_url TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            PRIMARY KEY (audio_url, rank)
+        )
+    ''')
+    
+    # 创建主机延迟表：每个音频主机首字节时间的指数滑动平均，下载时据此为候选地址排序
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS host_latency (
+            host TEXT PRIMARY KEY,
+            ttfb_ewma REAL NOT NULL,
+            samples INTEGER NOT NULL DEFAULT 0,
+            failures INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL
+        )
+    ''')
     
     conn.commit()
-    conn.close()
+    
+    # 创建全文搜索索引，首次创建时从现有数据重建
+    if init_search_index():
+        rebuild_search_index()
+    if init_char_search_index():
+        rebuild_char_search_index()
+    
+    # 创建已下载文件的存储索引，首次创建时登记已有的下载文件
+    if init_storage_index():
+        rebuild_storage_index()
+    
+    # 创建下载文件名索引，首次创建时登记已有的下载文件
+    if init_file_index():
+        rebuild_file_index(Config.DOWNLOAD_DIR)
 
-def get_db_connection():
-    """获取数据库连接"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # 使查询结果可以通过列名访问
-    return conn
+def _search_tokenizer() -> str:
+    """选择全文搜索分词器：优先使用支持中文子串匹配的 trigram，旧版 SQLite 退回 unicode61"""
+    conn = get_db_connection()
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._tokenizer_probe USING fts5(x, tokenize = 'trigram')")
+        conn.execute('DROP TABLE temp._tokenizer_probe')
+        return 'trigram'
+    except sqlite3.OperationalError:
+        return 'unicode61'
 
-# 播客相关操作
-def insert_or_update_podcast(podcast: Podcast) -> int:
-    """插入或更新播客信息"""
+def init_search_index() -> bool:
+    """创建节目全文搜索表及同步触发器，返回搜索表是否为本次新建"""
     conn = get_db_connection()
-    cursor = conn.cursor()
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'episode_search'"
+    ).fetchone() is not None
     
-    # 检查播客是否已存在
-    cursor.execute('SELECT id FROM podcasts WHERE url = ?', (podcast.url,))
-    existing = cursor.fetchone()
+    with conn:
+        cursor = conn.cursor()
+        
+        # rowid 与 podcast_episodes.id 一致
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS episode_search USING fts5(
+                title, description, podcast_name,
+                tokenize = '{_search_tokenizer()}'
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS podcast_episodes_search_insert
+            AFTER INSERT ON podcast_episodes BEGIN
+                INSERT INTO episode_search (rowid, title, description, podcast_name)
+                VALUES (new.id, new.title, new.description,
+                        (SELECT name FROM podcasts WHERE id = new.podcast_id));
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS podcast_episodes_search_delete
+            AFTER DELETE ON podcast_episodes BEGIN
+                DELETE FROM episode_search WHERE rowid = old.id;
+            END
+        ''')
+        # 重新加载频道时 upsert 会把标题原样写回，内容未变化时跳过索引更新
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS podcast_episodes_search_update
+            AFTER UPDATE OF title, description, podcast_id ON podcast_episodes
+            WHEN old.title IS NOT new.title
+              OR old.description IS NOT new.description
+              OR old.podcast_id IS NOT new.podcast_id
+            BEGIN
+                DELETE FROM episode_search WHERE rowid = old.id;
+                INSERT INTO episode_search (rowid, title, description, podcast_name)
+                VALUES (new.id, new.title, new.description,
+                        (SELECT name FROM podcasts WHERE id = new.podcast_id));
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS podcasts_search_update
+            AFTER UPDATE OF name ON podcasts
+            WHEN old.name IS NOT new.name
+            BEGIN
+                UPDATE episode_search SET podcast_name = new.name
+                WHERE rowid IN (SELECT id FROM podcast_episodes WHERE podcast_id = new.id);
+            END
+        ''')
     
-    if existing:
-        # 更新现有播客
+    return not exists
+
+def rebuild_search_index():
+    """清空并根据节目表重建全文搜索索引"""
+    with write_transaction() as conn:
+        conn.execute('DELETE FROM episode_search')
+        conn.execute('''
+            INSERT INTO episode_search (rowid, title, description, podcast_name)
+            SELECT pe.id, pe.title, pe.description, p.name
+            FROM podcast_episodes pe
+            LEFT JOIN podcasts p ON pe.podcast_id = p.id
+        ''')
+        conn.execute("INSERT INTO episode_search (episode_search) VALUES ('optimize')")
+
+# 中日韩文字：逐字搜索索引中每个字单独作为一个词
+CJK_CHAR_PATTERN = re.compile('([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af])')
+
+def _segment_search_text(text):
+    """在每个中日韩文字两侧加空格，unicode61 分词后每个字是一个词，连续的字可以按短语匹配"""
+    if not text:
+        return text
+    return CJK_CHAR_PATTERN.sub(r' \1 ', text)
+
+# 逐字搜索索引早期版本中调用 search_segment() 的触发器，没有注册该函数的连接无法写入节目表，初始化时删除
+LEGACY_CHAR_SEARCH_TRIGGERS = (
+    'podcast_episodes_char_search_insert', 'podcast_episodes_char_search_delete',
+    'podcast_episodes_char_search_update', 'podcasts_char_search_update',
+)
+
+def init_char_search_index() -> bool:
+    """创建逐字搜索表、待同步队列及触发器，返回搜索表是否为本次新建
+
+    trigram 无法匹配少于 3 个字符的词，episode_search_chars 保存切分后的文本：中日韩文字逐字成词，
+    短词按相邻字组成的短语匹配；其他文字按 unicode61 分词，并为 1~2 个字符的前缀建索引，
+    短的英文词按前缀匹配。
+    切分在 Python 中完成：触发器只用纯 SQL 把新增或修改的节目记入 episode_search_chars_pending，
+    由批量写入函数和搜索前的 sync_char_search_index() 补齐，命令行等任何连接都可以照常写入节目表。
+    """
+    conn = get_db_connection()
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'episode_search_chars'"
+    ).fetchone() is not None
+    
+    with conn:
+        cursor = conn.cursor()
+        
+        # rowid 与 podcast_episodes.id 一致
         cursor.execute('''
-            UPDATE podcasts 
-            SET name = ?, description = ?, cover_image_url = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE url = ?
-        ''', (podcast.name, podcast.description, podcast.cover_image_url, podcast.url))
-        podcast_id = existing['id']
-    else:
-        # 插入新播客
+            CREATE VIRTUAL TABLE IF NOT EXISTS episode_search_chars USING fts5(
+                title, description, podcast_name,
+                tokenize = 'unicode61', prefix = '1 2'
+            )
+        ''')
         cursor.execute('''
-            INSERT INTO podcasts (name, url, description, cover_image_url)
-            VALUES (?, ?, ?, ?)
-        ''', (podcast.name, podcast.url, podcast.description, podcast.cover_image_url))
-        podcast_id = cursor.lastrowid
+            CREATE TABLE IF NOT EXISTS episode_search_chars_pending (
+                episode_id INTEGER PRIMARY KEY
+            )
+        ''')
+        
+        for trigger in LEGACY_CHAR_SEARCH_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS podcast_episodes_char_search_queue_insert
+            AFTER INSERT ON podcast_episodes BEGIN
+                INSERT OR IGNORE INTO episode_search_chars_pending (episode_id) VALUES (new.id);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS podcast_episodes_char_search_queue_delete
+            AFTER DELETE ON podcast_episodes BEGIN
+                DELETE FROM episode_search_chars WHERE rowid = old.id;
+                DELETE FROM episode_search_chars_pending WHERE episode_id = old.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS podcast_episodes_char_search_queue_update
+            AFTER UPDATE OF title, description, podcast_id ON podcast_episodes
+            WHEN old.title IS NOT new.title
+              OR old.description IS NOT new.description
+              OR old.podcast_id IS NOT new.podcast_id
+            BEGIN
+                INSERT OR IGNORE INTO episode_search_chars_pending (episode_id) VALUES (new.id);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS podcasts_char_search_queue_update
+            AFTER UPDATE OF name ON podcasts
+            WHEN old.name IS NOT new.name
+            BEGIN
+                INSERT OR IGNORE INTO episode_search_chars_pending (episode_id)
+                SELECT id FROM podcast_episodes WHERE podcast_id = new.id;
+            END
+        ''')
+    
+    return not exists
+
+def _char_search_rows(rows) -> List[tuple]:
+    """把 (节目ID, 标题, 简介, 播客名称) 切分为逐字搜索表的行"""
+    return [(row[0], _segment_search_text(row[1]), _segment_search_text(row[2]), _segment_search_text(row[3]))
+            for row in rows]
+
+def _sync_char_search_index(conn: sqlite3.Connection) -> int:
+    """在调用方已开启的写事务中把待同步队列中的节目写入逐字搜索表，返回同步的节目数"""
+    rows = conn.execute('''
+        SELECT pe.id, pe.title, pe.description, p.name
+        FROM episode_search_chars_pending q
+        JOIN podcast_episodes pe ON pe.id = q.episode_id
+        LEFT JOIN podcasts p ON p.id = pe.podcast_id
+    ''').fetchall()
+    conn.execute('''
+        DELETE FROM episode_search_chars
+        WHERE rowid IN (SELECT episode_id FROM episode_search_chars_pending)
+    ''')
+    conn.executemany(
+        'INSERT INTO episode_search_chars (rowid, title, description, podcast_name) VALUES (?, ?, ?, ?)',
+        _char_search_rows(rows))
+    conn.execute('DELETE FROM episode_search_chars_pending')
+    return len(rows)
+
+def sync_char_search_index() -> int:
+    """补齐逐字搜索索引（其他连接写入或改名后留下的待同步节目），返回同步的节目数
+
+    逐字搜索表不参与库版本号，不使接口缓存失效。
+    """
+    conn = get_db_connection()
+    if conn.execute('SELECT 1 FROM episode_search_chars_pending LIMIT 1').fetchone() is None:
+        return 0
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        return _sync_char_search_index(conn)
+
+def rebuild_char_search_index():
+    """清空并根据节目表重建逐字搜索索引"""
+    with write_transaction() as conn:
+        rows = conn.execute('''
+            SELECT pe.id, pe.title, pe.description, p.name
+            FROM podcast_episodes pe
+            LEFT JOIN podcasts p ON pe.podcast_id = p.id
+        ''').fetchall()
+        conn.execute('DELETE FROM episode_search_chars')
+        conn.execute('DELETE FROM episode_search_chars_pending')
+        conn.executemany(
+            'INSERT INTO episode_search_chars (rowid, title, description, podcast_name) VALUES (?, ?, ?, ?)',
+            _char_search_rows(rows))
+        conn.execute("INSERT INTO episode_search_chars (episode_search_chars) VALUES ('optimize')")
+
+def init_storage_index() -> bool:
+    """创建已下载文件的存储索引表及总用量计数，返回索引表是否为本次新建
+
+    episode_storage 每个已下载节目一行，记录文件大小和最近访问时间，按访问时间建索引，
+    淘汰时顺着索引取最久未访问的文件，无需遍历下载目录；storage_usage 由触发器维护总字节数。
+    这两张表不参与库版本号，记录访问时间不会使接口缓存失效。
+    """
+    conn = get_db_connection()
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'episode_storage'"
+    ).fetchone() is not None
+    
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS episode_storage (
+                episode_id INTEGER PRIMARY KEY,
+                file_size INTEGER NOT NULL DEFAULT 0,
+                last_accessed_at REAL NOT NULL,
+                FOREIGN KEY (episode_id) REFERENCES podcast_episodes (id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_episode_storage_lru ON episode_storage (last_accessed_at)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS storage_usage (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                bytes INTEGER NOT NULL DEFAULT 0,
+                files INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO storage_usage (id, bytes, files) VALUES (1, 0, 0)')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS episode_storage_usage_insert
+            AFTER INSERT ON episode_storage BEGIN
+                UPDATE storage_usage SET bytes = bytes + new.file_size, files = files + 1 WHERE id = 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS episode_storage_usage_delete
+            AFTER DELETE ON episode_storage BEGIN
+                UPDATE storage_usage SET bytes = bytes - old.file_size, files = files - 1 WHERE id = 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS episode_storage_usage_update
+            AFTER UPDATE OF file_size ON episode_storage BEGIN
+                UPDATE storage_usage SET bytes = bytes + new.file_size - old.file_size WHERE id = 1;
+            END
+        ''')
+    
+    return not exists
+
+def rebuild_storage_index():
+    """清空并根据节目表重建存储索引，未记录文件大小的旧下载按磁盘上的实际大小登记"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT id, file_size, download_path,
+               CAST(strftime('%s', COALESCE(downloaded_at, updated_at)) AS REAL) AS downloaded_ts
+        FROM podcast_episodes
+        WHERE downloaded = 1 AND download_path IS NOT NULL
+    ''').fetchall()
+    entries = []
+    for row in rows:
+        size = row['file_size']
+        if size is None:
+            try:
+                size = os.path.getsize(row['download_path'])
+            except OSError:
+                size = 0
+        entries.append((row['id'], size, row['downloaded_ts'] or 0))
+    with conn:
+        conn.execute('DELETE FROM episode_storage')
+        conn.executemany(
+            'INSERT INTO episode_storage (episode_id, file_size, last_accessed_at) VALUES (?, ?, ?)', entries)
+        # 触发器按增量维护，重建后以实际数据校正一次
+        conn.execute('''
+            UPDATE storage_usage
+            SET bytes = (SELECT COALESCE(SUM(file_size), 0) FROM episode_storage),
+                files = (SELECT COUNT(*) FROM episode_storage)
+            WHERE id = 1
+        ''')
+
+def init_file_index() -> bool:
+    """创建下载文件名索引表，返回索引表是否为本次新建
+
+    download_files 每个下载文件一行，文件名（不含目录）在整个库中唯一，记录相对下载目录的分片路径；
+    下载时在这张表中占用文件名，不再逐个探测文件系统，按文件名下载时也通过它找到文件。
+    file_name_counters 记录每个基础文件名下一个可用的序号，重名时直接从该序号开始分配。
+    """
+    conn = get_db_connection()
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'download_files'"
+    ).fetchone() is not None
+    
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS download_files (
+                name TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                episode_id INTEGER,
+                FOREIGN KEY (episode_id) REFERENCES podcast_episodes (id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_download_files_episode ON download_files (episode_id)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS file_name_counters (
+                stem TEXT PRIMARY KEY,
+                next_suffix INTEGER NOT NULL
+            )
+        ''')
+    
+    return not exists
+
+def rebuild_file_index(download_dir: str):
+    """根据节目表登记下载目录内已有的下载文件（保持原路径，分片迁移见 core.file_layout）"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT id, download_path FROM podcast_episodes
+        WHERE downloaded = 1 AND download_path IS NOT NULL
+    ''').fetchall()
+    real_download_dir = os.path.realpath(download_dir)
+    entries = []
+    for row in rows:
+        real_path = os.path.realpath(row['download_path'])
+        if os.path.commonpath([real_path, real_download_dir]) != real_download_dir:
+            continue
+        entries.append((os.path.basename(real_path), os.path.relpath(real_path, real_download_dir), row['id']))
+    with conn:
+        conn.executemany('INSERT OR IGNORE INTO download_files (name, path, episode_id) VALUES (?, ?, ?)', entries)
+
+# 播客相关操作
+def insert_or_update_podcast(podcast: Podcast) -> int:
+    """插入或更新播客信息"""
+    with write_transaction() as conn:
+        cursor = conn.cursor()
+    
+        # 检查播客是否已存在
+        cursor.execute('SELECT id FROM podcasts WHERE url = ?', (podcast.url,))
+        existing = cursor.fetchone()
+    
+        if existing:
+            # 更新现有播客
+            cursor.execute('''
+                UPDATE podcasts 
+                SET name = ?, description = ?, cover_image_url = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE url = ?
+            ''', (podcast.name, podcast.description, podcast.cover_image_url, podcast.url))
+            podcast_id = existing['id']
+        else:
+            # 插入新播客
+            cursor.execute('''
+                INSERT INTO podcasts (name, url, description, cover_image_url)
+                VALUES (?, ?, ?, ?)
+            ''', (podcast.name, podcast.url, podcast.description, podcast.cover_image_url))
+            podcast_id = cursor.lastrowid
     
-    conn.commit()
-    conn.close()
     return podcast_id
 
 def get_all_podcasts() -> List[Podcast]:
     """获取所有播客"""
     conn = get_db_connection()
     podcasts = conn.execute('SELECT * FROM podcasts ORDER BY name').fetchall()
-    conn.close()
-    
-    return [Podcast(
-        id=row['id'],
-        name=row['name'],
-        url=row['url'],
-        description=row['description'],
-        cover_image_url=row['cover_image_url'],
-        created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-        updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None
-    ) for row in podcasts]
+    
+    return [Podcast.from_row(row) for row in podcasts]
 
 def get_podcast_by_id(podcast_id: int) -> Optional[Podcast]:
     """根据ID获取播客"""
     conn = get_db_connection()
     row = conn.execute('SELECT * FROM podcasts WHERE id = ?', (podcast_id,)).fetchone()
-    conn.close()
     
     if row:
-        return Podcast(
-            id=row['id'],
-            name=row['name'],
-            url=row['url'],
-            description=row['description'],
-            cover_image_url=row['cover_image_url'],
-            created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-            updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None
-        )
+        return Podcast.from_row(row)
     return None
 
 def get_podcast_by_url(url: str) -> Optional[Podcast]:
     """根据URL获取播客"""
     conn = get_db_connection()
     row = conn.execute('SELECT * FROM podcasts WHERE url = ?', (url,)).fetchone()
-    conn.close()
     
     if row:
-        return Podcast(
-            id=row['id'],
-            name=row['name'],
-            url=row['url'],
-            description=row['description'],
-            cover_image_url=row['cover_image_url'],
-            created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-            updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None
-        )
+        return Podcast.from_row(row)
     return None
 
 # 节目相关操作
 def insert_or_update_episode(episode: PodcastEpisode) -> int:
     """插入或更新节目信息"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with write_transaction() as conn:
+        cursor = conn.cursor()
     
-    # 检查节目是否已存在
-    cursor.execute('SELECT id FROM podcast_episodes WHERE podcast_id = ? AND url = ?', 
-                   (episode.podcast_id, episode.url))
-    existing = cursor.fetchone()
+        # 检查节目是否已存在
+        cursor.execute('SELECT id FROM podcast_episodes WHERE podcast_id = ? AND url = ?', 
+                       (episode.podcast_id, episode.url))
+        existing = cursor.fetchone()
     
-    if existing:
-        # 更新现有节目
-        cursor.execute('''
-            UPDATE podcast_episodes 
-            SET title = ?, audio_url = ?, description = ?, duration = ?, 
-                publish_date = ?, index_number = ?, downloaded = ?, download_path = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE podcast_id = ? AND url = ?
-        ''', (episode.title, episode.audio_url, episode.description, episode.duration,
-              episode.publish_date, episode.index, episode.downloaded, episode.download_path,
-              episode.podcast_id, episode.url))
-        episode_id = existing['id']
-    else:
-        # 插入新节目
-        cursor.execute('''
-            INSERT INTO podcast_episodes 
+        if existing:
+            # 更新现有节目
+            cursor.execute('''
+                UPDATE podcast_episodes 
+                SET title = ?, audio_url = ?, description = ?, duration = ?, 
+                    publish_date = ?, index_number = ?, downloaded = ?, download_path = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE podcast_id = ? AND url = ?
+            ''', (episode.title, episode.audio_url, episode.description, episode.duration,
+                  episode.publish_date, episode.index, episode.downloaded, episode.download_path,
+                  episode.podcast_id, episode.url))
+            episode_id = existing['id']
+        else:
+            # 插入新节目
+            cursor.execute('''
+                INSERT INTO podcast_episodes 
+                (podcast_id, title, url, audio_url, description, duration, publish_date, index_number, downloaded, download_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (episode.podcast_id, episode.title, episode.url, episode.audio_url, 
+                  episode.description, episode.duration, episode.publish_date, episode.index,
+                  episode.downloaded, episode.download_path))
+            episode_id = cursor.lastrowid
+    
+    return episode_id
+
+def upsert_episodes(podcast_id: int, episodes: List[PodcastEpisode]) -> Tuple[int, int]:
+    """在单个事务中批量插入或更新节目，返回 (新增数, 更新数)
+
+    已有节目的下载状态和下载路径不会被覆盖，可选字段为空时保留原值。
+    同一批中地址重复的节目先合并为一行（与逐行写入的结果相同），每个地址只计一次。
+    """
+    by_url = {}
+    for episode in episodes:
+        row = [podcast_id, episode.title, episode.url, episode.audio_url,
+               episode.description, episode.duration, episode.publish_date, episode.index,
+               episode.downloaded, episode.download_path]
+        merged = by_url.get(episode.url)
+        if merged is None:
+            by_url[episode.url] = row
+            continue
+        # 后出现的覆盖标题和序号，可选字段为空时保留前一行的值；下载状态只在插入时写入，沿用第一行
+        merged[1] = row[1]
+        merged[7] = row[7]
+        for column in (3, 4, 5, 6):
+            if row[column] is not None:
+                merged[column] = row[column]
+    rows = [tuple(row) for row in by_url.values()]
+    if not rows:
+        return 0, 0
+    
+    # 计数与写入处于同一个写事务中，新增数不受其他写入者干扰
+    with write_transaction() as conn:
+        count_sql = 'SELECT COUNT(*) FROM podcast_episodes WHERE podcast_id = ?'
+        before = conn.execute(count_sql, (podcast_id,)).fetchone()[0]
+        conn.executemany('''
+            INSERT INTO podcast_episodes
             (podcast_id, title, url, audio_url, description, duration, publish_date, index_number, downloaded, download_path)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (episode.podcast_id, episode.title, episode.url, episode.audio_url, 
-              episode.description, episode.duration, episode.publish_date, episode.index,
-              episode.downloaded, episode.download_path))
-        episode_id = cursor.lastrowid
+            ON CONFLICT(podcast_id, url) DO UPDATE SET
+                title = excluded.title,
+                audio_url = COALESCE(excluded.audio_url, podcast_episodes.audio_url),
+                description = COALESCE(excluded.description, podcast_episodes.description),
+                duration = COALESCE(excluded.duration, podcast_episodes.duration),
+                publish_date = COALESCE(excluded.publish_date, podcast_episodes.publish_date),
+                index_number = excluded.index_number,
+                updated_at = CURRENT_TIMESTAMP
+        ''', rows)
+        after = conn.execute(count_sql, (podcast_id,)).fetchone()[0]
+        _sync_char_search_index(conn)
     
-    conn.commit()
-    conn.close()
-    return episode_id
+    inserted = after - before
+    return inserted, len(rows) - inserted
+
+def ensure_podcasts(podcasts: List[Tuple[str, str]]) -> Tuple[dict, int]:
+    """按 (名称, URL) 批量获取播客，不存在的新建（已有播客不修改），
+    返回 ({URL: (播客ID, 当前最大节目序号)}, 新建数)"""
+    result = {}
+    with write_transaction() as conn:
+        created = conn.executemany('INSERT OR IGNORE INTO podcasts (name, url) VALUES (?, ?)', podcasts).rowcount
+        for _, url in podcasts:
+            row = conn.execute('''
+                SELECT p.id, (SELECT COALESCE(MAX(index_number), 0) FROM podcast_episodes WHERE podcast_id = p.id)
+                FROM podcasts p WHERE p.url = ?
+            ''', (url,)).fetchone()
+            result[url] = (row[0], row[1])
+    return result, created
+
+def import_episode_rows(rows: List[tuple]) -> int:
+    """批量导入节目，已存在的 (播客, 链接) 直接忽略，返回新增数
+
+    每行为 (podcast_id, title, url, audio_url, description, duration, publish_date, index_number)。
+    """
+    if not rows:
+        return 0
+    with write_transaction() as conn:
+        cursor = conn.executemany('''
+            INSERT OR IGNORE INTO podcast_episodes
+            (podcast_id, title, url, audio_url, description, duration, publish_date, index_number)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        inserted = cursor.rowcount
+        _sync_char_search_index(conn)
+    return inserted
 
 def get_episodes_by_podcast_id(podcast_id: int) -> List[PodcastEpisode]:
     """根据播客ID获取所有节目"""
@@ -197,23 +789,8 @@ def get_episodes_by_podcast_id(podcast_id: int) -> List[PodcastEpisode]:
         WHERE podcast_id = ? 
         ORDER BY index_number DESC
     ''', (podcast_id,)).fetchall()
-    conn.close()
-    
-    return [PodcastEpisode(
-        id=row['id'],
-        podcast_id=row['podcast_id'],
-        title=row['title'],
-        url=row['url'],
-        audio_url=row['audio_url'],
-        description=row['description'],
-        duration=row['duration'],
-        publish_date=datetime.fromisoformat(row['publish_date']) if row['publish_date'] else None,
-        index=row['index_number'],
-        downloaded=bool(row['downloaded']),
-        download_path=row['download_path'],
-        created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-        updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None
-    ) for row in episodes]
+    
+    return [PodcastEpisode.from_row(row) for row in episodes]
 
 def get_all_episodes_with_podcast_info() -> List[dict]:
     """获取所有节目及其播客信息"""
@@ -224,46 +801,1008 @@ def get_all_episodes_with_podcast_info() -> List[dict]:
         JOIN podcasts p ON pe.podcast_id = p.id
         ORDER BY p.name, pe.index_number DESC
     ''').fetchall()
-    conn.close()
     
     return [dict(row) for row in episodes]
 
+def _episode_page_filter(podcast_id: Optional[int], downloaded: Optional[bool],
+                         after: Optional[Tuple[int, int, int]]) -> Tuple[str, list]:
+    """生成节目分页查询的 WHERE 子句及参数"""
+    conditions = []
+    params = []
+    if podcast_id is not None:
+        conditions.append('pe.podcast_id = ?')
+        params.append(podcast_id)
+    if downloaded is not None:
+        conditions.append('pe.downloaded = ?')
+        params.append(1 if downloaded else 0)
+    if after is not None:
+        last_podcast_id, last_index, last_id = after
+        conditions.append('''(pe.podcast_id > ? OR (pe.podcast_id = ? AND
+            (pe.index_number < ? OR (pe.index_number = ? AND pe.id < ?))))''')
+        params.extend([last_podcast_id, last_podcast_id, last_index, last_index, last_id])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where, params
+
+def get_episodes_page(podcast_id: Optional[int] = None, downloaded: Optional[bool] = None,
+                      after: Optional[Tuple[int, int, int]] = None, limit: int = 100) -> List[dict]:
+    """按 (podcast_id, index_number, id) 键集分页获取节目及其播客信息
+
+    Args:
+        podcast_id (int): 只返回该播客的节目，None 表示全部播客
+        downloaded (bool): 按下载状态过滤，None 表示不过滤
+        after (tuple): 上一页最后一行的 (podcast_id, index_number, id)，None 表示第一页
+        limit (int): 每页最多返回的行数
+
+    Returns:
+        list: 节目字典列表，按 podcast_id 升序、index_number 和 id 降序排列
+    """
+    where, params = _episode_page_filter(podcast_id, downloaded, after)
+    params.append(limit)
+    
+    conn = get_db_connection()
+    episodes = conn.execute(f'''
+        SELECT pe.*, p.name as podcast_name, p.url as podcast_url
+        FROM podcast_episodes pe
+        JOIN podcasts p ON pe.podcast_id = p.id
+        {where}
+        ORDER BY pe.podcast_id, pe.index_number DESC, pe.id DESC
+        LIMIT ?
+    ''', params).fetchall()
+    
+    return [dict(row) for row in episodes]
+
+def get_history_page_json(podcast_id: Optional[int] = None, downloaded: Optional[bool] = None,
+                          after: Optional[Tuple[int, int, int]] = None,
+                          limit: int = 100) -> Tuple[str, Optional[Tuple[int, int, int]], bool]:
+    """与 get_episodes_page 分页规则相同，但由 SQLite 直接按播客分组生成 JSON
+
+    Returns:
+        tuple: (按播客分组的 JSON 数组字符串, 本页最后一行的 (podcast_id, index_number, id), 是否还有下一页)
+    """
+    where, params = _episode_page_filter(podcast_id, downloaded, after)
+    # 多取一行用于判断是否还有下一页
+    params.extend([limit + 1, limit])
+    
+    conn = get_db_connection()
+    row = conn.execute(f'''
+        WITH fetched AS MATERIALIZED (
+            SELECT pe.*, p.name as podcast_name, p.url as podcast_url
+            FROM podcast_episodes pe
+            JOIN podcasts p ON pe.podcast_id = p.id
+            {where}
+            ORDER BY pe.podcast_id, pe.index_number DESC, pe.id DESC
+            LIMIT ?
+        ),
+        page AS MATERIALIZED (
+            SELECT * FROM fetched
+            ORDER BY podcast_id, index_number DESC, id DESC
+            LIMIT ?
+        ),
+        groups AS (
+            SELECT podcast_id, json_object(
+                'podcast_id', podcast_id,
+                'podcast_name', podcast_name,
+                'podcast_url', podcast_url,
+                'episodes', json_group_array(json_object(
+                    'id', id,
+                    'podcast_id', podcast_id,
+                    'title', title,
+                    'url', url,
+                    'audio_url', audio_url,
+                    'description', description,
+                    'duration', duration,
+                    'publish_date', publish_date,
+                    'index_number', index_number,
+                    'downloaded', downloaded,
+                    'download_path', download_path,
+                    'file_size', file_size,
+                    'download_error', download_error,
+                    'downloaded_at', downloaded_at,
+                    'pinned', pinned,
+                    'evicted_at', evicted_at,
+                    'cover_mime', cover_mime,
+                    'created_at', created_at,
+                    'updated_at', updated_at,
+                    'podcast_name', podcast_name,
+                    'podcast_url', podcast_url
+                ))
+            ) as podcast_json
+            -- 子查询已排好序，分组聚合保持节目在组内的顺序
+            FROM (SELECT * FROM page ORDER BY podcast_id, index_number DESC, id DESC)
+            GROUP BY podcast_id
+        ),
+        last AS (
+            SELECT podcast_id, index_number, id FROM page
+            ORDER BY podcast_id DESC, index_number, id
+            LIMIT 1
+        )
+        SELECT
+            (SELECT json_group_array(json(podcast_json))
+             FROM (SELECT podcast_json FROM groups ORDER BY podcast_id)) as history,
+            (SELECT COUNT(*) FROM fetched) > ? as has_more,
+            last.podcast_id, last.index_number, last.id
+        FROM (SELECT 1) LEFT JOIN last
+    ''', params + [limit]).fetchone()
+    
+    last_key = (row['podcast_id'], row['index_number'], row['id']) if row['id'] is not None else None
+    return row['history'], last_key, bool(row['has_more'])
+
+def get_library_version() -> int:
+    """获取播客库的变更版本号，episodes、podcasts、podcast_episodes 的任何增删改都会使其递增"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT version FROM library_version WHERE id = 1').fetchone()
+    return row['version'] if row else 0
+
+def get_podcast_summaries() -> List[dict]:
+    """获取每个播客的节目总数和已下载数量（不返回节目明细）"""
+    conn = get_db_connection()
+    summaries = conn.execute('''
+        SELECT p.id as podcast_id, p.name as podcast_name, p.url as podcast_url,
+               COUNT(pe.id) as episode_count,
+               COALESCE(SUM(pe.downloaded = 1), 0) as downloaded_count
+        FROM podcasts p
+        LEFT JOIN podcast_episodes pe ON pe.podcast_id = p.id
+        GROUP BY p.id
+        ORDER BY p.name
+    ''').fetchall()
+    
+    return [dict(row) for row in summaries]
+
+# 简介摘要在第一个匹配之前保留的字符数和摘要总长度
+SNIPPET_CONTEXT = 16
+SNIPPET_LENGTH = 64
+
+def _search_match_expression(query: str) -> Tuple[Optional[str], Optional[str], List[str]]:
+    """将用户输入拆分为 episode_search 和 episode_search_chars 的 MATCH 表达式，并返回用于高亮的词
+
+    每个词作为短语加引号，避免用户输入中的 FTS5 语法字符导致查询出错；
+    trigram 分词器无法匹配少于 3 个字符的词，这些词切分后在逐字索引中按短语匹配，
+    以字母或数字结尾的短词按前缀匹配。不含任何文字的短词（如单个标点）忽略。
+    """
+    phrases = []
+    char_phrases = []
+    terms = []
+    for term in query.split():
+        if len(term) >= 3:
+            phrases.append('"' + term.replace('"', '""') + '"')
+            terms.append(term)
+            continue
+        segmented = _segment_search_text(term)
+        if not re.search(r'\w', segmented):
+            continue
+        phrase = '"' + segmented.replace('"', '""') + '"'
+        if term[-1].isalnum() and not CJK_CHAR_PATTERN.match(term[-1]):
+            phrase += '*'
+        char_phrases.append(phrase)
+        terms.append(term)
+    return (' '.join(phrases) or None), (' '.join(char_phrases) or None), terms
+
+def _highlight(text: Optional[str], pattern) -> Optional[str]:
+    """HTML 转义 text 并用 <mark> 标记其中与搜索词匹配的部分
+
+    标题和简介是从网页抓取的原文，先按匹配位置切分再分别转义，标记本身不会被转义，
+    原文中的标签也不会被当作 HTML 输出。
+    """
+    if not text:
+        return text
+    parts = []
+    position = 0
+    for found in pattern.finditer(text):
+        parts.append(html.escape(text[position:found.start()]))
+        parts.append('<mark>' + html.escape(found.group(0)) + '</mark>')
+        position = found.end()
+    parts.append(html.escape(text[position:]))
+    return ''.join(parts)
+
+def _snippet(text: Optional[str], pattern) -> Optional[str]:
+    """截取简介中第一个匹配附近的一段，转义后标记匹配部分，截断处加省略号"""
+    if not text:
+        return text
+    found = pattern.search(text)
+    start = max(0, found.start() - SNIPPET_CONTEXT) if found else 0
+    end = start + SNIPPET_LENGTH
+    return (('…' if start > 0 else '') + _highlight(text[start:end], pattern)
+            + ('…' if end < len(text) else ''))
+
+def search_episodes(query: str, podcast_id: Optional[int] = None,
+                    limit: int = 20, offset: int = 0) -> List[dict]:
+    """全文搜索节目标题、简介和播客名称
+
+    Args:
+        query (str): 搜索关键词，多个词之间为“与”关系
+        podcast_id (int): 只搜索该播客的节目，None 表示全部播客
+        limit (int): 每页最多返回的行数
+        offset (int): 跳过的行数
+
+    Returns:
+        list: 节目字典列表，title_highlight/description_snippet 已经过 HTML 转义，匹配部分以 <mark> 标记，
+              可以直接插入页面。含 3 个字符以上的词时按相关度排序，只有短词时按节目从新到旧排序
+    """
+    match, char_match, terms = _search_match_expression(query)
+    if match is None and char_match is None:
+        return []
+    if char_match is not None:
+        sync_char_search_index()
+    
+    conditions = []
+    params = []
+    if match is not None:
+        # 长词走 trigram 索引排序，短词按 rowid 逐行在逐字索引中核对
+        source = 'episode_search s JOIN podcast_episodes pe ON pe.id = s.rowid'
+        conditions.append('episode_search MATCH ?')
+        params.append(match)
+        if char_match is not None:
+            source += ' JOIN episode_search_chars c ON c.rowid = s.rowid'
+            conditions.append('episode_search_chars MATCH ?')
+            params.append(char_match)
+        order = 's.rank'
+    else:
+        # 只有短词时按 rowid 倒序扫描逐字索引，取满一页即停止，常见字也不必为全部匹配计算相关度
+        source = 'episode_search_chars c JOIN podcast_episodes pe ON pe.id = c.rowid'
+        conditions.append('episode_search_chars MATCH ?')
+        params.append(char_match)
+        order = 'c.rowid DESC'
+    if podcast_id is not None:
+        conditions.append('pe.podcast_id = ?')
+        params.append(podcast_id)
+    params.extend([limit, offset])
+    
+    conn = get_db_connection()
+    results = conn.execute(f'''
+        SELECT pe.id, pe.podcast_id, pe.title, pe.url, pe.audio_url, pe.publish_date,
+               pe.index_number, pe.downloaded, pe.download_path,
+               p.name as podcast_name, pe.description
+        FROM {source}
+        LEFT JOIN podcasts p ON p.id = pe.podcast_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+    ''', params).fetchall()
+    
+    pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.I)
+    episodes = []
+    for row in results:
+        episode = dict(row)
+        episode['title_highlight'] = _highlight(episode['title'], pattern)
+        episode['description_snippet'] = _snippet(episode.pop('description'), pattern)
+        episodes.append(episode)
+    return episodes
+
+def apply_download_updates(updates: List[dict]) -> int:
+    """在单个事务中批量写入下载状态变化，返回更新的行数
+
+    每个更新字典包含 episode_id 或 url（音频地址）用于定位节目，以及可选的
+    downloaded、download_path、file_size、file_hash、error、started_at、downloaded_at 字段；
+    值为 None 的字段保持不变。下载成功时清除错误信息，未提供 downloaded_at 时以写入时间为完成时间。
+    下载时从音频中解析出的 duration、cover_offset、cover_length、cover_mime 覆盖原值，
+    title 和 publish_date 只在原来为空时写入。
+    提供 release_lease（租约持有者）时在同一事务中释放该音频地址的下载租约，
+    保证其他进程看到租约释放时下载结果已经落库。
+    """
+    by_id = []
+    by_url = []
+    for update in updates:
+        params = {
+            'downloaded': update.get('downloaded'),
+            'download_path': update.get('download_path'),
+            'file_size': update.get('file_size'),
+            'file_hash': update.get('file_hash'),
+            'error': update.get('error'),
+            'started_at': update.get('started_at'),
+            'downloaded_at': update.get('downloaded_at'),
+            'title': update.get('title'),
+            'duration': update.get('duration'),
+            'publish_date': update.get('publish_date'),
+            'cover_offset': update.get('cover_offset'),
+            'cover_length': update.get('cover_length'),
+            'cover_mime': update.get('cover_mime'),
+            'key': update.get('episode_id') if update.get('episode_id') is not None else update.get('url'),
+        }
+        (by_id if update.get('episode_id') is not None else by_url).append(params)
+    
+    assignments = '''
+        downloaded = COALESCE(:downloaded, downloaded),
+        download_path = COALESCE(:download_path, download_path),
+        file_size = COALESCE(:file_size, file_size),
+        file_hash = COALESCE(:file_hash, file_hash),
+        download_error = CASE WHEN :downloaded THEN NULL ELSE COALESCE(:error, download_error) END,
+        downloaded_at = CASE WHEN :downloaded THEN COALESCE(:downloaded_at, CURRENT_TIMESTAMP) ELSE downloaded_at END,
+        download_started_at = COALESCE(:started_at, download_started_at),
+        evicted_at = CASE WHEN :downloaded THEN NULL ELSE evicted_at END,
+        title = COALESCE(NULLIF(title, ''), :title, title),
+        duration = COALESCE(:duration, duration),
+        publish_date = COALESCE(publish_date, :publish_date),
+        cover_offset = COALESCE(:cover_offset, cover_offset),
+        cover_length = COALESCE(:cover_length, cover_length),
+        cover_mime = COALESCE(:cover_mime, cover_mime),
+        updated_at = CURRENT_TIMESTAMP
+    '''
+    # 下载成功的文件登记到存储索引，下载完成时间作为初始访问时间
+    register_storage = '''
+        INSERT INTO episode_storage (episode_id, file_size, last_accessed_at)
+        SELECT id, COALESCE(file_size, 0), CAST(strftime('%s', 'now') AS REAL)
+        FROM podcast_episodes
+        WHERE {key} = :key AND :downloaded AND download_path IS NOT NULL
+        ON CONFLICT (episode_id) DO UPDATE
+        SET file_size = excluded.file_size, last_accessed_at = excluded.last_accessed_at
+    '''
+    releases = [
+        (update['url'], update['release_lease'])
+        for update in updates
+        if update.get('release_lease') and update.get('url')
+    ]
+    updated = 0
+    with write_transaction() as conn:
+        if by_id:
+            updated += conn.executemany(
+                f'UPDATE podcast_episodes SET {assignments} WHERE id = :key', by_id).rowcount
+            conn.executemany(register_storage.format(key='id'), by_id)
+        if by_url:
+            updated += conn.executemany(
+                f'UPDATE podcast_episodes SET {assignments} WHERE audio_url = :key', by_url).rowcount
+            conn.executemany(register_storage.format(key='audio_url'), by_url)
+        if releases:
+            conn.executemany('DELETE FROM download_leases WHERE url = ? AND locked_by = ?', releases)
+    return updated
+
+def get_episode_by_id(episode_id: int) -> Optional[PodcastEpisode]:
+    """根据ID获取节目"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM podcast_episodes WHERE id = ?', (episode_id,)).fetchone()
+    
+    if row:
+        return PodcastEpisode.from_row(row)
+    return None
+
+def get_episode_cover(episode_id: int) -> Optional[dict]:
+    """获取已下载节目音频中内嵌封面的位置（文件路径、偏移、长度、MIME），没有封面时返回 None"""
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT download_path, cover_offset, cover_length, cover_mime FROM podcast_episodes
+        WHERE id = ? AND downloaded = 1 AND cover_length > 0
+    ''', (episode_id,)).fetchone()
+    return dict(row) if row else None
+
+def get_pending_episodes(podcast_id: Optional[int] = None,
+                         limit: Optional[int] = None,
+                         after_id: Optional[int] = None) -> List[PodcastEpisode]:
+    """获取尚未下载的节目（下载队列），可按播客过滤；提供 after_id 时只返回 ID 更大（之后新增）的节目
+
+    因超出存储配额被清理的节目不在队列中，需要时单独重新下载。
+    """
+    sql = 'SELECT * FROM podcast_episodes WHERE downloaded = 0 AND evicted_at IS NULL'
+    params = []
+    if podcast_id is not None:
+        sql += ' AND podcast_id = ?'
+        params.append(podcast_id)
+    if after_id is not None:
+        sql += ' AND id > ?'
+        params.append(after_id)
+    sql += ' ORDER BY podcast_id, index_number DESC'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    
+    conn = get_db_connection()
+    episodes = conn.execute(sql, params).fetchall()
+    
+    return [PodcastEpisode.from_row(row) for row in episodes]
+
+def get_downloaded_episodes(podcast_id: int) -> List[PodcastEpisode]:
+    """获取播客已下载的节目，按节目顺序从旧到新排列"""
+    conn = get_db_connection()
+    episodes = conn.execute('''
+        SELECT * FROM podcast_episodes
+        WHERE podcast_id = ? AND downloaded = 1 AND download_path IS NOT NULL
+        ORDER BY index_number ASC, id ASC
+    ''', (podcast_id,)).fetchall()
+    
+    return [PodcastEpisode.from_row(row) for row in episodes]
+
+def is_audio_url_downloaded(audio_url: str) -> bool:
+    """检查指定音频地址的节目是否已下载"""
+    conn = get_db_connection()
+    row = conn.execute(
+        'SELECT 1 FROM podcast_episodes WHERE audio_url = ? AND downloaded = 1 LIMIT 1', (audio_url,)
+    ).fetchone()
+    return row is not None
+
+def get_downloaded_audio_urls() -> List[str]:
+    """获取所有已下载节目的音频地址"""
+    conn = get_db_connection()
+    rows = conn.execute('SELECT DISTINCT audio_url FROM podcast_episodes WHERE downloaded = 1').fetchall()
+    return [row['audio_url'] for row in rows]
+
 def check_episode_exists(podcast_id: int, url: str) -> bool:
     """检查节目是否已存在"""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('SELECT 1 FROM podcast_episodes WHERE podcast_id = ? AND url = ?', (podcast_id, url))
     result = cursor.fetchone()
-    conn.close()
     return result is not None
 
+# 频道提取任务（任务表不参与库版本号，写入时不需要清除接口缓存，因此直接使用 with conn 提交）
+def create_extraction_job(url: str) -> int:
+    """提交一个频道提取任务，返回任务ID"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute('INSERT INTO extraction_jobs (url) VALUES (?)', (url,))
+    return cursor.lastrowid
+
+def get_extraction_job(job_id: int) -> Optional[dict]:
+    """获取提取任务的状态、进度和结果"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM extraction_jobs WHERE id = ?', (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def claim_extraction_job(worker_pid: int, now: float) -> Optional[dict]:
+    """领取最早提交的排队任务，条件更新保证同一任务只会被一个进程领取"""
+    conn = get_db_connection()
+    with conn:
+        row = conn.execute('''
+            UPDATE extraction_jobs
+            SET status = 'running', worker_pid = ?, heartbeat_at = ?, attempts = attempts + 1,
+                started_at = CURRENT_TIMESTAMP, progress_done = 0, progress_total = NULL
+            WHERE id = (SELECT id FROM extraction_jobs WHERE status = 'queued' ORDER BY id LIMIT 1)
+              AND status = 'queued'
+            RETURNING *
+        ''', (worker_pid, now)).fetchone()
+    return dict(row) if row else None
+
+def update_extraction_progress(job_id: int, worker_pid: int, now: float,
+                               done: Optional[int] = None, total: Optional[int] = None):
+    """刷新任务心跳，并在提供 done/total 时回写进度"""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            UPDATE extraction_jobs
+            SET heartbeat_at = ?, progress_done = COALESCE(?, progress_done),
+                progress_total = COALESCE(?, progress_total)
+            WHERE id = ? AND worker_pid = ? AND status = 'running'
+        ''', (now, done, total, job_id, worker_pid))
+
+def finish_extraction_job(job_id: int, worker_pid: int, podcast_id: Optional[int] = None,
+                          inserted: Optional[int] = None, updated: Optional[int] = None,
+                          error: Optional[str] = None) -> bool:
+    """标记任务完成，提供 error 时标记为失败；任务已被重新排队（不再属于该进程）时返回 False"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute('''
+            UPDATE extraction_jobs
+            SET status = ?, podcast_id = ?, inserted = ?, updated = ?, error = ?,
+                worker_pid = NULL, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND worker_pid = ? AND status = 'running'
+        ''', ('failed' if error else 'done', podcast_id, inserted, updated, error, job_id, worker_pid))
+    return cursor.rowcount > 0
+
+def get_stale_extraction_workers(stale_before: float) -> List[int]:
+    """获取心跳超时的运行中任务所属的进程ID"""
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT DISTINCT worker_pid FROM extraction_jobs WHERE status = 'running' AND heartbeat_at < ?",
+        (stale_before,)
+    ).fetchall()
+    return [row['worker_pid'] for row in rows]
+
+def requeue_extraction_jobs(max_attempts: int, worker_pid: Optional[int] = None,
+                            stale_before: Optional[float] = None) -> int:
+    """把崩溃进程（worker_pid）或心跳超时（stale_before）的运行中任务重新排队，
+    已达到最大尝试次数的任务标记为失败，返回处理的任务数"""
+    conditions = ["status = 'running'"]
+    params = []
+    if worker_pid is not None:
+        conditions.append('worker_pid = ?')
+        params.append(worker_pid)
+    if stale_before is not None:
+        conditions.append('heartbeat_at < ?')
+        params.append(stale_before)
+    where = ' AND '.join(conditions)
+    
+    conn = get_db_connection()
+    with conn:
+        failed = conn.execute(f'''
+            UPDATE extraction_jobs
+            SET status = 'failed', error = '提取进程异常退出', worker_pid = NULL, finished_at = CURRENT_TIMESTAMP
+            WHERE {where} AND attempts >= ?
+        ''', params + [max_attempts]).rowcount
+        requeued = conn.execute(f'''
+            UPDATE extraction_jobs SET status = 'queued', worker_pid = NULL
+            WHERE {where}
+        ''', params).rowcount
+    return failed + requeued
+
+# 领导者租约
+def claim_leadership(name: str, holder: str, now: float, ttl: float) -> bool:
+    """领取或续约名为 name 的领导者租约，租约不存在、已过期或已属于 holder 时成功"""
+    conn = get_db_connection()
+    with conn:
+        row = conn.execute('''
+            INSERT INTO leader_leases (name, holder, expires) VALUES (?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires = excluded.expires
+            WHERE leader_leases.expires < ? OR leader_leases.holder = excluded.holder
+            RETURNING holder
+        ''', (name, holder, now + ttl, now)).fetchone()
+    return row is not None
+
+def release_leadership(name: str, holder: str) -> bool:
+    """释放 holder 持有的领导者租约"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute('DELETE FROM leader_leases WHERE name = ? AND holder = ?', (name, holder))
+    return cursor.rowcount > 0
+
+def get_leader(name: str) -> Optional[dict]:
+    """获取领导者租约的持有者和到期时间"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM leader_leases WHERE name = ?', (name,)).fetchone()
+    return dict(row) if row else None
+
+# 订阅刷新计划（不参与库版本号）
+def get_unscheduled_podcast_ids() -> List[int]:
+    """获取还没有刷新计划的播客ID（只包括有网页地址、可以提取的播客）"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT p.id FROM podcasts p
+        LEFT JOIN podcast_schedules s ON s.podcast_id = p.id
+        WHERE s.podcast_id IS NULL AND (p.url LIKE 'http://%' OR p.url LIKE 'https://%')
+    ''').fetchall()
+    return [row['id'] for row in rows]
+
+def add_podcast_schedules(schedules: List[Tuple[int, float]]) -> int:
+    """为播客创建刷新计划，schedules 为 [(播客ID, 首次刷新时间)]，已存在的计划保持不变"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.executemany(
+            'INSERT OR IGNORE INTO podcast_schedules (podcast_id, next_refresh_at) VALUES (?, ?)', schedules)
+    return cursor.rowcount
+
+def get_due_schedules(now: float, limit: int) -> List[dict]:
+    """获取已到刷新时间且没有进行中任务的计划，按到期时间排序"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT s.*, p.url, p.name
+        FROM podcast_schedules s
+        JOIN podcasts p ON p.id = s.podcast_id
+        WHERE s.enabled = 1 AND s.job_id IS NULL AND s.next_refresh_at <= ?
+        ORDER BY s.next_refresh_at
+        LIMIT ?
+    ''', (now, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def count_refreshing_schedules() -> int:
+    """进行中的刷新任务数"""
+    conn = get_db_connection()
+    return conn.execute('SELECT COUNT(*) FROM podcast_schedules WHERE job_id IS NOT NULL').fetchone()[0]
+
+def start_schedule_refresh(podcast_id: int, job_id: int):
+    """记录计划对应的提取任务，并以当前最大节目ID为基线，任务完成后据此找出新增节目"""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            UPDATE podcast_schedules
+            SET job_id = ?,
+                baseline_episode_id = (SELECT COALESCE(MAX(id), 0) FROM podcast_episodes WHERE podcast_id = ?)
+            WHERE podcast_id = ?
+        ''', (job_id, podcast_id, podcast_id))
+
+def get_finished_schedule_refreshes() -> List[dict]:
+    """获取提取任务已结束（完成或失败）但尚未处理结果的计划，附带任务结果"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT s.*, j.status AS job_status, j.inserted AS job_inserted, j.error AS job_error
+        FROM podcast_schedules s
+        JOIN extraction_jobs j ON j.id = s.job_id
+        WHERE j.status IN ('done', 'failed')
+    ''').fetchall()
+    return [dict(row) for row in rows]
+
+def finish_schedule_refresh(podcast_id: int, now: float, next_refresh_at: float,
+                            unchanged_streak: int, error: Optional[str] = None):
+    """记录一次刷新的结果和下次刷新时间"""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            UPDATE podcast_schedules
+            SET job_id = NULL, last_refresh_at = ?, next_refresh_at = ?, unchanged_streak = ?, last_error = ?
+            WHERE podcast_id = ?
+        ''', (now, next_refresh_at, unchanged_streak, error, podcast_id))
+
+def get_podcast_schedules(podcast_id: Optional[int] = None) -> List[dict]:
+    """获取刷新计划（可只取某个播客），附带播客名称"""
+    sql = '''
+        SELECT s.*, p.name, p.url
+        FROM podcast_schedules s
+        JOIN podcasts p ON p.id = s.podcast_id
+    '''
+    params = []
+    if podcast_id is not None:
+        sql += ' WHERE s.podcast_id = ?'
+        params.append(podcast_id)
+    conn = get_db_connection()
+    return [dict(row) for row in conn.execute(sql + ' ORDER BY s.next_refresh_at', params).fetchall()]
+
+def update_podcast_schedule(podcast_id: int, now: float, enabled: Optional[bool] = None,
+                            refresh_interval: Optional[float] = None, auto_download: Optional[bool] = None,
+                            clear_interval: bool = False, refresh_now: bool = False) -> bool:
+    """修改播客的刷新计划，计划不存在时创建；值为 None 的设置保持不变
+
+    clear_interval 为真时恢复使用默认刷新间隔，refresh_now 为真时立即安排一次刷新并清除退避。
+    """
+    conn = get_db_connection()
+    with conn:
+        conn.execute('INSERT OR IGNORE INTO podcast_schedules (podcast_id, next_refresh_at) VALUES (?, ?)',
+                     (podcast_id, now))
+        cursor = conn.execute('''
+            UPDATE podcast_schedules
+            SET enabled = COALESCE(?, enabled),
+                refresh_interval = CASE WHEN ? THEN NULL ELSE COALESCE(?, refresh_interval) END,
+                auto_download = COALESCE(?, auto_download),
+                next_refresh_at = CASE WHEN ? THEN ? ELSE next_refresh_at END,
+                unchanged_streak = CASE WHEN ? THEN 0 ELSE unchanged_streak END
+            WHERE podcast_id = ?
+        ''', (None if enabled is None else int(enabled), clear_interval, refresh_interval,
+              None if auto_download is None else int(auto_download),
+              refresh_now, now, refresh_now, podcast_id))
+    return cursor.rowcount > 0
+
+# 存储配额
+def get_storage_usage() -> dict:
+    """已下载文件的总字节数和文件数"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT bytes, files FROM storage_usage WHERE id = 1').fetchone()
+    return {'bytes': row['bytes'], 'files': row['files']} if row else {'bytes': 0, 'files': 0}
+
+def touch_episode_access(episode_id: int, now: float) -> bool:
+    """记录节目音频的最近访问时间（只更新存储索引，不影响库版本号）"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute(
+            'UPDATE episode_storage SET last_accessed_at = ? WHERE episode_id = ?', (now, episode_id))
+    return cursor.rowcount > 0
+
+def set_episode_pinned(episode_id: int, pinned: bool) -> bool:
+    """固定或取消固定节目，固定的节目不会因超出存储配额被清理"""
+    with write_transaction() as conn:
+        cursor = conn.execute('UPDATE podcast_episodes SET pinned = ? WHERE id = ?', (int(pinned), episode_id))
+    return cursor.rowcount > 0
+
+def get_eviction_candidates(limit: int, policy: str = 'lru') -> List[dict]:
+    """按淘汰顺序取未固定的已下载节目
+
+    lru：按最近访问时间（从未播放的按下载完成时间）从早到晚，顺着访问时间索引读取；
+    oldest：每个播客先淘汰序号最小（最早发布）的节目，各播客轮流淘汰，同一轮内按访问时间排序。
+    每个播客顺着 (downloaded, podcast_id, index_number) 索引最多读取 limit 个节目，
+    读取量与批大小和播客数有关，与已下载的节目总数无关。
+    """
+    conn = get_db_connection()
+    if policy == 'oldest':
+        rows = conn.execute('''
+            SELECT episode_id, file_size, download_path FROM (
+                SELECT s.episode_id, s.file_size, s.last_accessed_at, pe.download_path,
+                       ROW_NUMBER() OVER (PARTITION BY pe.podcast_id ORDER BY pe.index_number, pe.id) AS age_rank
+                FROM podcasts p
+                JOIN podcast_episodes pe ON pe.id IN (
+                    SELECT e.id FROM podcast_episodes e
+                    WHERE e.downloaded = 1 AND e.podcast_id = p.id AND e.pinned = 0
+                      AND EXISTS (SELECT 1 FROM episode_storage WHERE episode_id = e.id)
+                    ORDER BY e.index_number, e.id
+                    LIMIT :limit
+                )
+                JOIN episode_storage s ON s.episode_id = pe.id
+            )
+            ORDER BY age_rank, last_accessed_at
+            LIMIT :limit
+        ''', {'limit': limit}).fetchall()
+    else:
+        rows = conn.execute('''
+            SELECT s.episode_id, s.file_size, pe.download_path
+            FROM episode_storage s
+            JOIN podcast_episodes pe ON pe.id = s.episode_id
+            WHERE pe.pinned = 0
+            ORDER BY s.last_accessed_at
+            LIMIT ?
+        ''', (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
+def evict_episode_file(episode_id: int, download_path: Optional[str],
+                       above_bytes: Optional[int] = None) -> bool:
+    """把节目从存储索引中移除并标记为未下载，返回是否由本次调用完成（并发淘汰时只有一方成功）
+
+    只修改数据库，调用方在成功后再删除文件；节目在此期间被重新下载到其他路径（或已被淘汰）时
+    不做任何修改并返回 False。提供 above_bytes 时只在总用量仍超过该值时淘汰，检查和删除在同一个写事务中，
+    多个进程同时清理时不会因各自读到的旧用量而多删文件。
+    """
+    with write_transaction() as conn:
+        if above_bytes is not None:
+            usage = conn.execute('SELECT bytes FROM storage_usage WHERE id = 1').fetchone()
+            if usage is None or usage['bytes'] <= above_bytes:
+                return False
+        # 先核对节目仍是已下载且路径未变，再移出存储索引：重新下载到新路径的节目保留其存储记录和用量
+        changed = conn.execute('''
+            UPDATE podcast_episodes
+            SET downloaded = 0, download_path = NULL, evicted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND downloaded = 1 AND download_path IS ?
+        ''', (episode_id, download_path)).rowcount
+        if not changed:
+            return False
+        conn.execute('DELETE FROM episode_storage WHERE episode_id = ?', (episode_id,))
+        if download_path:
+            conn.execute('DELETE FROM download_files WHERE name = ? AND episode_id = ?',
+                         (os.path.basename(download_path), episode_id))
+    return True
+
+def mark_downloads_invalid(episode_ids: List[int], error: str) -> int:
+    """把文件缺失或损坏的已下载节目标记为未下载，并移出存储索引和文件名索引，返回修改的节目数"""
+    changed = 0
+    with write_transaction() as conn:
+        for episode_id in episode_ids:
+            row = conn.execute('SELECT download_path FROM podcast_episodes WHERE id = ? AND downloaded = 1',
+                               (episode_id,)).fetchone()
+            if row is None:
+                continue
+            conn.execute('DELETE FROM episode_storage WHERE episode_id = ?', (episode_id,))
+            if row['download_path']:
+                conn.execute('DELETE FROM download_files WHERE name = ? AND episode_id = ?',
+                             (os.path.basename(row['download_path']), episode_id))
+            conn.execute('''
+                UPDATE podcast_episodes
+                SET downloaded = 0, download_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (error, episode_id))
+            changed += 1
+    return changed
+
+# 备用音频地址和主机延迟（与任务表一样不参与库版本号）
+def save_audio_candidates(candidates: dict):
+    """保存提取到的备用音频地址：{主地址: [备用地址, ...]}，替换原有记录"""
+    conn = get_db_connection()
+    with conn:
+        conn.executemany('DELETE FROM audio_url_candidates WHERE audio_url = ?', [(url,) for url in candidates])
+        conn.executemany(
+            'INSERT INTO audio_url_candidates (audio_url, rank, url) VALUES (?, ?, ?)',
+            [(audio_url, rank, url)
+             for audio_url, urls in candidates.items()
+             for rank, url in enumerate(urls, start=1)]
+        )
+
+def get_audio_candidates(audio_url: str) -> List[str]:
+    """获取主地址的备用音频地址，按提取时的优先级排列"""
+    conn = get_db_connection()
+    rows = conn.execute('SELECT url FROM audio_url_candidates WHERE audio_url = ? ORDER BY rank',
+                        (audio_url,)).fetchall()
+    return [row['url'] for row in rows]
+
+def record_host_latency(host: str, ttfb: float, now: float, failed: bool = False, censored: bool = False,
+                        alpha: float = 0.3):
+    """把一次请求的首字节时间计入主机的滑动平均（失败的请求由调用方按惩罚时间计入）
+
+    censored 表示只知道首字节时间不小于 ttfb（对冲中落选、还没有返回的请求）：
+    只在高于当前估计时才向上修正，不计入样本数，不会让慢主机显得更快。
+    """
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO host_latency (host, ttfb_ewma, samples, failures, updated_at)
+            VALUES (:host, :ttfb, :samples, :failed, :now)
+            ON CONFLICT (host) DO UPDATE SET
+                ttfb_ewma = CASE WHEN :censored AND :ttfb <= ttfb_ewma THEN ttfb_ewma
+                                 ELSE ttfb_ewma + :alpha * (:ttfb - ttfb_ewma) END,
+                samples = samples + :samples,
+                failures = failures + :failed,
+                updated_at = :now
+        ''', {'host': host, 'ttfb': ttfb, 'failed': int(failed), 'censored': int(censored),
+              'samples': 0 if censored else 1, 'now': now, 'alpha': alpha})
+
+def get_host_latencies(hosts: Optional[List[str]] = None) -> dict:
+    """获取主机的首字节时间滑动平均 {主机: 秒}；不指定主机时返回全部主机的完整记录"""
+    conn = get_db_connection()
+    if hosts is None:
+        rows = conn.execute('SELECT * FROM host_latency ORDER BY ttfb_ewma').fetchall()
+        return {row['host']: dict(row) for row in rows}
+    hosts = list(hosts)
+    if not hosts:
+        return {}
+    rows = conn.execute(
+        f"SELECT host, ttfb_ewma FROM host_latency WHERE host IN ({', '.join('?' * len(hosts))})", hosts
+    ).fetchall()
+    return {row['host']: row['ttfb_ewma'] for row in rows}
+
+# 下载文件名（与任务表一样不参与库版本号）
+def download_file_relpath(podcast_id: Optional[int], name: str) -> str:
+    """下载文件相对下载目录的分片路径：<播客ID>/<文件名 SHA-1 前两位>/<文件名>"""
+    shard = hashlib.sha1(name.encode('utf-8')).hexdigest()[:2]
+    return os.path.join(str(podcast_id) if podcast_id is not None else 'unsorted', shard, name)
+
+def allocate_download_file(file_name: str, download_dir: str, episode_id: Optional[int] = None,
+                           url: Optional[str] = None) -> str:
+    """为下载文件分配库内唯一的文件名，返回完整路径
+
+    文件名已被占用时依次加序号（title_1.mp3、title_2.mp3……），序号从计数表中记录的位置开始，
+    多个进程同时分配时由数据库保证不会得到同一个名字。下载失败时调用 release_download_file 归还。
+    """
+    conn = get_db_connection()
+    if episode_id is not None:
+        row = conn.execute('SELECT podcast_id FROM podcast_episodes WHERE id = ?', (episode_id,)).fetchone()
+    else:
+        row = conn.execute('SELECT id, podcast_id FROM podcast_episodes WHERE audio_url = ? LIMIT 1',
+                           (url,)).fetchone()
+        episode_id = row['id'] if row else None
+    podcast_id = row['podcast_id'] if row else None
+    
+    stem, ext = os.path.splitext(file_name)
+    with conn:
+        suffix = conn.execute('''
+            INSERT INTO file_name_counters (stem, next_suffix) VALUES (?, 1)
+            ON CONFLICT (stem) DO UPDATE SET next_suffix = next_suffix + 1
+            RETURNING next_suffix - 1
+        ''', (file_name,)).fetchone()[0]
+        while True:
+            name = file_name if suffix == 0 else f"{stem}_{suffix}{ext}"
+            path = download_file_relpath(podcast_id, name)
+            inserted = conn.execute(
+                'INSERT OR IGNORE INTO download_files (name, path, episode_id) VALUES (?, ?, ?)',
+                (name, path, episode_id)
+            ).rowcount
+            if inserted:
+                break
+            # 与其他基础文件名加序号后的名字重合，继续往后找
+            suffix += 1
+        conn.execute('UPDATE file_name_counters SET next_suffix = MAX(next_suffix, ?) WHERE stem = ?',
+                     (suffix + 1, file_name))
+    return os.path.join(download_dir, path)
+
+def release_download_file(path: str) -> bool:
+    """归还下载失败（文件未生成）时分配的文件名"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute('DELETE FROM download_files WHERE name = ?', (os.path.basename(path),))
+    return cursor.rowcount > 0
+
+def get_download_file(name: str) -> Optional[dict]:
+    """按文件名查找下载文件，返回相对下载目录的路径和节目ID"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT name, path, episode_id FROM download_files WHERE name = ?', (name,)).fetchone()
+    return dict(row) if row else None
+
+def get_unsharded_download_files() -> List[dict]:
+    """获取还不在分片目录中的下载文件（旧版平铺在下载目录中的文件）及其所属播客"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT f.name, f.path, f.episode_id, pe.podcast_id, pe.download_path
+        FROM download_files f
+        LEFT JOIN podcast_episodes pe ON pe.id = f.episode_id
+        ORDER BY f.name
+    ''').fetchall()
+    return [dict(row) for row in rows if row['path'] != download_file_relpath(row['podcast_id'], row['name'])]
+
+def move_download_file(name: str, path: str, old_download_path: Optional[str], new_download_path: str):
+    """文件移动到分片目录后更新文件名索引和节目的下载路径"""
+    with write_transaction() as conn:
+        conn.execute('UPDATE download_files SET path = ? WHERE name = ?', (path, name))
+        if old_download_path:
+            conn.execute('''
+                UPDATE podcast_episodes SET download_path = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE download_path = ?
+            ''', (new_download_path, old_download_path))
+
+# 下载租约（与任务表一样不参与库版本号）
+def claim_download_lease(url: str, owner: str, now: float, ttl: float,
+                         episode_id: Optional[int] = None) -> bool:
+    """领取音频地址的下载租约，租约不存在、已过期或已属于 owner 时领取成功
+
+    插入与条件更新在同一条语句中完成，多个进程同时领取时只有一个能成功。
+    """
+    conn = get_db_connection()
+    with conn:
+        row = conn.execute('''
+            INSERT INTO download_leases (url, episode_id, locked_by, lease_expires)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE
+            SET episode_id = excluded.episode_id, locked_by = excluded.locked_by,
+                lease_expires = excluded.lease_expires, bytes_done = 0, bytes_total = NULL,
+                started_at = CURRENT_TIMESTAMP
+            WHERE download_leases.lease_expires < ? OR download_leases.locked_by = excluded.locked_by
+            RETURNING locked_by
+        ''', (url, episode_id, owner, now + ttl, now)).fetchone()
+    return row is not None
+
+def renew_download_lease(url: str, owner: str, now: float, ttl: float,
+                         bytes_done: Optional[int] = None, bytes_total: Optional[int] = None) -> bool:
+    """续约并回写传输进度，租约已不属于 owner（过期后被接管）时返回 False"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute('''
+            UPDATE download_leases
+            SET lease_expires = ?, bytes_done = COALESCE(?, bytes_done), bytes_total = COALESCE(?, bytes_total)
+            WHERE url = ? AND locked_by = ?
+        ''', (now + ttl, bytes_done, bytes_total, url, owner))
+    return cursor.rowcount > 0
+
+def release_download_lease(url: str, owner: str) -> bool:
+    """释放 owner 持有的下载租约"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute('DELETE FROM download_leases WHERE url = ? AND locked_by = ?', (url, owner))
+    return cursor.rowcount > 0
+
+def expire_download_lease(url: str, owner: str) -> bool:
+    """使 owner 持有的租约立即过期（用于持有进程已确认退出的情况）"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute(
+            'UPDATE download_leases SET lease_expires = 0 WHERE url = ? AND locked_by = ?', (url, owner))
+    return cursor.rowcount > 0
+
+def get_download_lease(url: str) -> Optional[dict]:
+    """获取音频地址当前的下载租约"""
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM download_leases WHERE url = ?', (url,)).fetchone()
+    return dict(row) if row else None
+
+def get_active_download_leases(now: float) -> List[dict]:
+    """获取所有未过期的下载租约及对应节目标题，即各进程正在进行的下载"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT l.url, l.episode_id, l.locked_by, l.lease_expires, l.bytes_done, l.bytes_total,
+               l.started_at, pe.title
+        FROM download_leases l
+        LEFT JOIN podcast_episodes pe ON pe.id = l.episode_id
+        WHERE l.lease_expires >= ?
+        ORDER BY l.started_at
+    ''', (now,)).fetchall()
+    return [dict(row) for row in rows]
+
 # 旧的兼容性方法
 def insert_episodes(episodes):
     """将播客数据插入数据库（保持向后兼容）"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with write_transaction() as conn:
+        cursor = conn.cursor()
     
-    inserted_count = 0
-    for episode in episodes:
-        try:
-            cursor.execute(
-                'INSERT INTO episodes (title, url) VALUES (?, ?)',
-                (episode['title'], episode['url'])
-            )
-            inserted_count += 1
-        except sqlite3.IntegrityError:
-            # 如果 URL 已存在，则忽略
-            pass
+        inserted_count = 0
+        for episode in episodes:
+            try:
+                cursor.execute(
+                    'INSERT INTO episodes (title, url) VALUES (?, ?)',
+                    (episode['title'], episode['url'])
+                )
+                inserted_count += 1
+            except sqlite3.IntegrityError:
+                # 如果 URL 已存在，则忽略
+                pass
     
-    conn.commit()
-    conn.close()
     return inserted_count
 
+def get_episodes_after(after_id: int = 0, limit: int = 100) -> List[dict]:
+    """按 id 键集分页获取旧表中的播客数据（保持向后兼容）"""
+    conn = get_db_connection()
+    episodes = conn.execute(
+        'SELECT * FROM episodes WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit)
+    ).fetchall()
+    
+    return [dict(episode) for episode in episodes]
+
 def get_all_episodes():
     """从数据库查询并返回所有播客数据（保持向后兼容）"""
     conn = get_db_connection()
     episodes = conn.execute('SELECT * FROM episodes').fetchall()
-    conn.close()
     
     # 将查询结果转换为字典列表
-    return [dict(episode) for episode in episodes]
\ No newline at end of file
+    return [dict(episode) for episode in episodes]
+
+# 查询耗时按辅助函数名统计
+DB_QUERY_SECONDS = registry.histogram(
+    'podcast_db_query_seconds', '数据库辅助函数耗时（秒）', ('helper',)
+)
+
+# 连接管理函数不计入查询耗时
+_UNTIMED_HELPERS = {'get_db_connection', 'close_db_connection', 'write_transaction'}
+
+def _instrument_helpers():
+    """为本模块的公开辅助函数统一加上耗时统计，其他模块导入的即是包装后的函数"""
+    for name, func in list(globals().items()):
+        if (name.startswith('_') or name in _UNTIMED_HELPERS
+                or not inspect.isfunction(func) or func.__module__ != __name__):
+            continue
+        globals()[name] = timed(DB_QUERY_SECONDS, phase='db', helper=name)(func)
+
+_instrument_helpers()
@@ -1,8 +1,9 @@
 import os
-from database import init_db, insert_episodes
+from database import init_db
+from core.importer import LibraryImporter
 
 def read_podcast_links(file_path):
-    """从文本文件中读取播客标题和链接"""
+    """从文本文件中读取播客标题和链接（整个文件读入列表，批量导入请使用 core.importer）"""
     episodes = []
     if not os.path.exists(file_path):
         print(f"文件 {file_path} 不存在。")
@@ -25,17 +26,19 @@ def main():
     # 初始化数据库
     init_db()
     
-    # 读取播客链接
+    # 流式读取播客链接并分批写入数据库，大文件也不会一次性读入内存
     file_path = 'podcast_links.txt'
-    episodes = read_podcast_links(file_path)
+    if not os.path.exists(file_path):
+        print(f"文件 {file_path} 不存在。")
+        return
     
-    if not episodes:
+    importer = LibraryImporter(on_reject=lambda line, reason, raw: print(f"跳过无效行 {line}（{reason}）: {raw}"))
+    stats = importer.import_file(file_path)
+    if not stats.rows:
         print("没有找到有效的播客数据。")
         return
     
-    # 插入数据到数据库
-    inserted_count = insert_episodes(episodes)
-    print(f"成功插入 {inserted_count} 条播客数据到数据库。")
+    print(f"成功插入 {stats.inserted} 条播客数据到数据库（跳过 {stats.skipped} 条已存在，{stats.rejected} 条无效）。")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,40 +1,55 @@
-
 import json
 import os
 from core.config import Config
+from database import apply_download_updates, is_audio_url_downloaded, get_downloaded_audio_urls
 
 class DownloadStatus:
+    """下载状态查询，以数据库 podcast_episodes 表为唯一数据源
+
+    旧版本把状态保存在 JSON 文件中，import_legacy_status() 用于把其中的记录迁移到数据库。
+    """
+
     def __init__(self):
         self.status_file = Config.STATUS_FILE
-        self.status = {}
-        self.load_status()
-    
-    def load_status(self):
-        """从文件加载下载状态"""
-        if os.path.exists(self.status_file):
-            try:
-                with open(self.status_file, 'r', encoding='utf-8') as f:
-                    self.status = json.load(f)
-            except Exception as e:
-                print(f"加载状态文件时出错: {e}")
-                self.status = {}
     
-    def save_status(self):
-        """将下载状态保存到文件"""
+    def import_legacy_status(self):
+        """将旧版 JSON 状态文件中的已下载记录导入数据库，导入后将文件重命名为 .imported
+
+        多个 gunicorn worker 同时启动时可能同时导入：写入是幂等的，文件已被其他 worker
+        读取或重命名时直接返回。
+        """
+        if not os.path.exists(self.status_file):
+            return 0
         try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(self.status_file), exist_ok=True)
-            
-            with open(self.status_file, 'w', encoding='utf-8') as f:
-                json.dump(self.status, f, ensure_ascii=False, indent=2)
+            with open(self.status_file, 'r', encoding='utf-8') as f:
+                legacy_status = json.load(f)
+        except FileNotFoundError:
+            return 0
         except Exception as e:
-            print(f"保存状态文件时出错: {e}")
+            print(f"加载状态文件时出错: {e}")
+            return 0
+        
+        # 旧文件中还混有 total、current_downloads 等统计字段，只导入“URL: true”的记录
+        updates = [
+            {'url': url, 'downloaded': True}
+            for url, downloaded in legacy_status.items()
+            if downloaded is True and url.startswith(('http://', 'https://'))
+        ]
+        imported = apply_download_updates(updates) if updates else 0
+        try:
+            os.replace(self.status_file, self.status_file + '.imported')
+        except FileNotFoundError:
+            pass  # 其他 worker 已完成导入并重命名
+        return imported
     
     def mark_as_downloaded(self, url):
         """标记特定URL为已下载"""
-        self.status[url] = True
-        self.save_status()
+        apply_download_updates([{'url': url, 'downloaded': True}])
     
     def is_downloaded(self, url):
         """检查特定URL是否已下载"""
-        return self.status.get(url, False)
\ No newline at end of file
+        return is_audio_url_downloaded(url)
+    
+    def get_all_status(self):
+        """获取所有下载状态"""
+        return {url: True for url in get_downloaded_audio_urls()}
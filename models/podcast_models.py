@@ -1,18 +1,108 @@
-from dataclasses import dataclass
-from typing import Optional, List
+from typing import Optional
 from datetime import datetime
 
-@dataclass
-class Podcast:
+# 时间字段尚未解析的标记
+_UNPARSED = object()
+
+def _parse_timestamp(value: str) -> datetime:
+    """解析 ISO 格式的时间字符串"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+class _Timestamp:
+    """延迟解析的时间字段描述符
+
+    字段可以赋值为 datetime 或数据库中存储的 ISO 字符串。字符串只在首次读取时解析，
+    序列化时原样输出，不经过 datetime 往返。
+    """
+
+    __slots__ = ('raw_slot', 'parsed_slot')
+
+    def __set_name__(self, owner, name):
+        self.raw_slot = f'_{name}_raw'
+        self.parsed_slot = f'_{name}'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        parsed = getattr(instance, self.parsed_slot)
+        if parsed is _UNPARSED:
+            parsed = _parse_timestamp(getattr(instance, self.raw_slot))
+            setattr(instance, self.parsed_slot, parsed)
+        return parsed
+
+    def __set__(self, instance, value):
+        if isinstance(value, str) and value:
+            setattr(instance, self.raw_slot, value)
+            setattr(instance, self.parsed_slot, _UNPARSED)
+        else:
+            setattr(instance, self.raw_slot, None)
+            setattr(instance, self.parsed_slot, value or None)
+
+    def isoformat(self, instance) -> Optional[str]:
+        """返回字段的 ISO 字符串：原始字符串直接返回，datetime 才调用 isoformat()"""
+        raw = getattr(instance, self.raw_slot)
+        if raw is not None:
+            return raw
+        parsed = getattr(instance, self.parsed_slot)
+        return parsed.isoformat() if parsed is not None else None
+
+class _RowModel:
+    """基于 __slots__ 的紧凑数据模型基类
+
+    子类通过 FIELDS 声明 (字段名, 默认值)，时间字段使用 _Timestamp 描述符，
+    并为其预留 _<name>_raw 和 _<name> 两个槽位。
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(self.FIELDS):
+            raise TypeError(f"{type(self).__name__} 最多接受 {len(self.FIELDS)} 个位置参数")
+        for (name, default), value in zip(self.FIELDS, args):
+            if name in kwargs:
+                raise TypeError(f"{type(self).__name__} 的参数 '{name}' 重复赋值")
+            kwargs[name] = value
+        for name, default in self.FIELDS:
+            setattr(self, name, kwargs.pop(name, default))
+        if kwargs:
+            raise TypeError(f"{type(self).__name__} 不支持参数: {', '.join(kwargs)}")
+
+    def _values(self):
+        """按字段顺序返回所有字段值"""
+        return tuple(getattr(self, name) for name, _ in self.FIELDS)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name, _ in self.FIELDS)
+        return f'{type(self).__name__}({fields})'
+
+    def _isoformat(self, name) -> Optional[str]:
+        """以 ISO 字符串形式返回时间字段，不触发解析"""
+        return type(self).__dict__[name].isoformat(self)
+
+class Podcast(_RowModel):
     """播客数据模型"""
-    id: Optional[int] = None
-    name: str = ""
-    url: str = ""
-    description: Optional[str] = None
-    cover_image_url: Optional[str] = None
-    created_at: Optional[datetime] = None
-    updated_at: Optional[datetime] = None
-    
+
+    __slots__ = ('id', 'name', 'url', 'description', 'cover_image_url',
+                 '_created_at_raw', '_created_at', '_updated_at_raw', '_updated_at')
+    FIELDS = (
+        ('id', None),
+        ('name', ""),
+        ('url', ""),
+        ('description', None),
+        ('cover_image_url', None),
+        ('created_at', None),
+        ('updated_at', None),
+    )
+
+    created_at = _Timestamp()
+    updated_at = _Timestamp()
+
     def to_dict(self):
         """转换为字典格式"""
         return {
@@ -21,48 +111,74 @@ class Podcast:
             'url': self.url,
             'description': self.description,
             'cover_image_url': self.cover_image_url,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self._isoformat('created_at'),
+            'updated_at': self._isoformat('updated_at')
         }
-    
+
     @classmethod
     def from_dict(cls, data):
         """从字典创建实例"""
-        created_at = data.get('created_at')
-        updated_at = data.get('updated_at')
-        
-        if isinstance(created_at, str):
-            created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-        if isinstance(updated_at, str):
-            updated_at = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
-            
         return cls(
             id=data.get('id'),
             name=data.get('name', ''),
             url=data.get('url', ''),
             description=data.get('description'),
             cover_image_url=data.get('cover_image_url'),
-            created_at=created_at,
-            updated_at=updated_at
+            created_at=data.get('created_at'),
+            updated_at=data.get('updated_at')
         )
 
-@dataclass
-class PodcastEpisode:
+    @classmethod
+    def from_row(cls, row):
+        """从 podcasts 表的查询行创建实例，时间字段保持原始字符串，读取时才解析"""
+        # 热路径：绕过通用 __init__ 直接填充槽位
+        podcast = cls.__new__(cls)
+        podcast.id = row['id']
+        podcast.name = row['name']
+        podcast.url = row['url']
+        podcast.description = row['description']
+        podcast.cover_image_url = row['cover_image_url']
+        podcast._created_at_raw = raw = row['created_at'] or None
+        podcast._created_at = _UNPARSED if raw else None
+        podcast._updated_at_raw = raw = row['updated_at'] or None
+        podcast._updated_at = _UNPARSED if raw else None
+        return podcast
+
+class PodcastEpisode(_RowModel):
     """播客节目数据模型"""
-    id: Optional[int] = None
-    podcast_id: int = 0
-    title: str = ""
-    url: str = ""
-    audio_url: Optional[str] = None
-    description: Optional[str] = None
-    duration: Optional[str] = None
-    publish_date: Optional[datetime] = None
-    index: int = 0
-    downloaded: bool = False
-    download_path: Optional[str] = None
-    created_at: Optional[datetime] = None
-    updated_at: Optional[datetime] = None
-    
+
+    __slots__ = ('id', 'podcast_id', 'title', 'url', 'audio_url', 'description', 'duration',
+                 '_publish_date_raw', '_publish_date', 'index', 'downloaded', 'download_path',
+                 'file_size', 'file_hash', 'download_error',
+                 '_downloaded_at_raw', '_downloaded_at', '_download_started_at_raw', '_download_started_at',
+                 '_created_at_raw', '_created_at', '_updated_at_raw', '_updated_at')
+    FIELDS = (
+        ('id', None),
+        ('podcast_id', 0),
+        ('title', ""),
+        ('url', ""),
+        ('audio_url', None),
+        ('description', None),
+        ('duration', None),
+        ('publish_date', None),
+        ('index', 0),
+        ('downloaded', False),
+        ('download_path', None),
+        ('created_at', None),
+        ('updated_at', None),
+        ('file_size', None),
+        ('file_hash', None),
+        ('download_error', None),
+        ('downloaded_at', None),
+        ('download_started_at', None),
+    )
+
+    publish_date = _Timestamp()
+    downloaded_at = _Timestamp()
+    download_started_at = _Timestamp()
+    created_at = _Timestamp()
+    updated_at = _Timestamp()
+
     def to_dict(self):
         """转换为字典格式"""
         return {
@@ -73,28 +189,22 @@ class PodcastEpisode:
             'audio_url': self.audio_url,
             'description': self.description,
             'duration': self.duration,
-            'publish_date': self.publish_date.isoformat() if self.publish_date else None,
+            'publish_date': self._isoformat('publish_date'),
             'index': self.index,
             'downloaded': self.downloaded,
             'download_path': self.download_path,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'file_size': self.file_size,
+            'file_hash': self.file_hash,
+            'download_error': self.download_error,
+            'downloaded_at': self._isoformat('downloaded_at'),
+            'download_started_at': self._isoformat('download_started_at'),
+            'created_at': self._isoformat('created_at'),
+            'updated_at': self._isoformat('updated_at')
         }
-    
+
     @classmethod
     def from_dict(cls, data):
         """从字典创建实例"""
-        publish_date = data.get('publish_date')
-        created_at = data.get('created_at')
-        updated_at = data.get('updated_at')
-        
-        if isinstance(publish_date, str):
-            publish_date = datetime.fromisoformat(publish_date.replace('Z', '+00:00'))
-        if isinstance(created_at, str):
-            created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-        if isinstance(updated_at, str):
-            updated_at = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
-            
         return cls(
             id=data.get('id'),
             podcast_id=data.get('podcast_id', 0),
@@ -103,10 +213,45 @@ class PodcastEpisode:
             audio_url=data.get('audio_url'),
             description=data.get('description'),
             duration=data.get('duration'),
-            publish_date=publish_date,
+            publish_date=data.get('publish_date'),
             index=data.get('index', 0),
             downloaded=data.get('downloaded', False),
             download_path=data.get('download_path'),
-            created_at=created_at,
-            updated_at=updated_at
-        )
\ No newline at end of file
+            created_at=data.get('created_at'),
+            updated_at=data.get('updated_at'),
+            file_size=data.get('file_size'),
+            file_hash=data.get('file_hash'),
+            download_error=data.get('download_error'),
+            downloaded_at=data.get('downloaded_at'),
+            download_started_at=data.get('download_started_at')
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """从 podcast_episodes 表的查询行创建实例，时间字段保持原始字符串，读取时才解析"""
+        # 热路径：绕过通用 __init__ 直接填充槽位
+        episode = cls.__new__(cls)
+        episode.id = row['id']
+        episode.podcast_id = row['podcast_id']
+        episode.title = row['title']
+        episode.url = row['url']
+        episode.audio_url = row['audio_url']
+        episode.description = row['description']
+        episode.duration = row['duration']
+        episode.index = row['index_number']
+        episode.downloaded = bool(row['downloaded'])
+        episode.download_path = row['download_path']
+        episode.file_size = row['file_size']
+        episode.file_hash = row['file_hash']
+        episode.download_error = row['download_error']
+        episode._publish_date_raw = raw = row['publish_date'] or None
+        episode._publish_date = _UNPARSED if raw else None
+        episode._downloaded_at_raw = raw = row['downloaded_at'] or None
+        episode._downloaded_at = _UNPARSED if raw else None
+        episode._download_started_at_raw = raw = row['download_started_at'] or None
+        episode._download_started_at = _UNPARSED if raw else None
+        episode._created_at_raw = raw = row['created_at'] or None
+        episode._created_at = _UNPARSED if raw else None
+        episode._updated_at_raw = raw = row['updated_at'] or None
+        episode._updated_at = _UNPARSED if raw else None
+        return episode
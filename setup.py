@@ -4,6 +4,7 @@ setup(
     name="castload",
     version="1.0.0",
     packages=find_packages(),
+    py_modules=["database", "import_podcasts", "postinstall"],
     install_requires=[
         "playwright==1.40.0",
         "requests==2.31.0",
@@ -14,6 +15,7 @@ setup(
     entry_points={
         "console_scripts": [
             "postinstall=postinstall:main",
+            "castload=core.cli:main",
         ],
     },
 )
\ No newline at end of file
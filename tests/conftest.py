@@ -0,0 +1,36 @@
+"""测试的公共夹具：每个测试使用独立的临时数据库和下载目录，不读写项目自带的 podcasts.db 和 download/"""
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from core.config import Config
+from database import init_db, close_db_connection, insert_or_update_podcast
+from models.podcast_models import Podcast, PodcastEpisode
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    """把数据库和下载目录指向临时目录并建表，返回下载目录"""
+    download_dir = tmp_path / 'download'
+    download_dir.mkdir()
+    monkeypatch.setattr(Config, 'DATABASE_PATH', str(tmp_path / 'test.db'))
+    monkeypatch.setattr(Config, 'DOWNLOAD_DIR', str(download_dir))
+    monkeypatch.setattr(Config, 'STATUS_FILE', str(download_dir / 'download_status.json'))
+    init_db()
+    yield download_dir
+    close_db_connection()
+
+@pytest.fixture
+def podcast_id(library):
+    """新建一个空播客，返回其ID"""
+    return insert_or_update_podcast(Podcast(name='测试播客', url='https://example.com/channel/test'))
+
+def make_episode(podcast_id, index, url=None, title=None):
+    """构造一个节目，默认地址和标题由序号生成"""
+    url = url or f'https://cdn.example.com/audio/{index}.mp3'
+    return PodcastEpisode(title=title or f'第 {index} 期', url=url, audio_url=url,
+                          podcast_id=podcast_id, index=index)
@@ -0,0 +1,160 @@
+"""节目批量写入、键集分页和下载租约"""
+import threading
+
+import database
+from database import (
+    insert_or_update_podcast, upsert_episodes, get_episodes_page, get_episodes_by_podcast_id, apply_download_updates,
+    claim_download_lease, renew_download_lease, release_download_lease, expire_download_lease, get_download_lease
+)
+from models.podcast_models import Podcast
+from conftest import make_episode
+
+URL = 'https://cdn.example.com/audio/lease.mp3'
+
+def _run_threads(count, target):
+    """同时启动 count 个线程执行 target(序号)，结束后关闭各线程的数据库连接，返回各线程的结果"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(number):
+        barrier.wait()
+        try:
+            results[number] = target(number)
+        finally:
+            database.close_db_connection()
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+# 批量写入计数
+
+def test_upsert_counts_inserted_and_updated(podcast_id):
+    assert upsert_episodes(podcast_id, [make_episode(podcast_id, index) for index in range(5)]) == (5, 0)
+    # 3 个已有节目、2 个新节目
+    assert upsert_episodes(podcast_id, [make_episode(podcast_id, index) for index in range(2, 7)]) == (2, 3)
+    assert len(get_episodes_by_podcast_id(podcast_id)) == 7
+
+def test_upsert_counts_duplicate_urls_once(podcast_id):
+    url = 'https://cdn.example.com/audio/dup.mp3'
+    episodes = [make_episode(podcast_id, 1, url, '旧标题'), make_episode(podcast_id, 2),
+                make_episode(podcast_id, 3, url, '新标题')]
+    assert upsert_episodes(podcast_id, episodes) == (2, 0)
+    # 同一批中后出现的行覆盖标题和序号
+    titles = {episode.url: (episode.title, episode.index) for episode in get_episodes_by_podcast_id(podcast_id)}
+    assert titles[url] == ('新标题', 3)
+
+def test_upsert_keeps_download_state(podcast_id):
+    upsert_episodes(podcast_id, [make_episode(podcast_id, 1)])
+    episode = get_episodes_by_podcast_id(podcast_id)[0]
+    apply_download_updates([{'episode_id': episode.id, 'downloaded': True,
+                             'download_path': '/tmp/1.mp3', 'file_size': 10}])
+    assert upsert_episodes(podcast_id, [make_episode(podcast_id, 1, title='改名')]) == (0, 1)
+    episode = get_episodes_by_podcast_id(podcast_id)[0]
+    assert (episode.title, episode.downloaded, episode.download_path) == ('改名', True, '/tmp/1.mp3')
+
+def test_concurrent_upserts_count_each_episode_once(podcast_id):
+    # 4 个线程写入互相重叠的批次：新增数之和等于不同地址的数量
+    results = _run_threads(4, lambda number: upsert_episodes(
+        podcast_id, [make_episode(podcast_id, index) for index in range(number * 10, number * 10 + 30)]))
+    assert sum(inserted for inserted, _ in results) == 60
+    assert sum(inserted + updated for inserted, updated in results) == 120
+    assert len(get_episodes_by_podcast_id(podcast_id)) == 60
+
+# 键集分页
+
+def _page_key(row):
+    return row['podcast_id'], row['index_number'], row['id']
+
+def _all_pages(limit, **filters):
+    rows = []
+    after = None
+    while True:
+        page = get_episodes_page(after=after, limit=limit, **filters)
+        rows.extend(page)
+        if len(page) < limit:
+            return rows
+        after = _page_key(page[-1])
+
+def test_keyset_pages_cover_every_row_once(library):
+    podcast_ids = [insert_or_update_podcast(Podcast(name=f'播客 {number}', url=f'https://example.com/{number}'))
+                   for number in range(3)]
+    for podcast_id in podcast_ids:
+        # 序号有重复，只靠 index_number 排序时翻页会漏行或重复
+        upsert_episodes(podcast_id, [make_episode(podcast_id, index // 3, f'https://cdn.example.com/{podcast_id}/{index}.mp3')
+                                     for index in range(10)])
+    expected = get_episodes_page(limit=1000)
+    assert len(expected) == 30
+    for limit in (1, 3, 7, 30):
+        assert [row['id'] for row in _all_pages(limit)] == [row['id'] for row in expected]
+    assert [_page_key(row) for row in expected] == sorted(
+        (_page_key(row) for row in expected), key=lambda key: (key[0], -key[1], -key[2]))
+
+def test_keyset_paging_filters_by_podcast_and_download_state(podcast_id):
+    upsert_episodes(podcast_id, [make_episode(podcast_id, index) for index in range(6)])
+    episodes = get_episodes_by_podcast_id(podcast_id)
+    apply_download_updates([{'episode_id': episode.id, 'downloaded': True, 'download_path': f'/tmp/{episode.id}.mp3'}
+                            for episode in episodes if episode.index % 2 == 0])
+    downloaded = _all_pages(2, podcast_id=podcast_id, downloaded=True)
+    assert sorted(row['index_number'] for row in downloaded) == [0, 2, 4]
+    assert len(_all_pages(2, podcast_id=podcast_id + 1)) == 0
+
+def test_keyset_paging_is_stable_under_inserts(podcast_id):
+    upsert_episodes(podcast_id, [make_episode(podcast_id, index) for index in range(10)])
+    first = get_episodes_page(podcast_id=podcast_id, limit=4)
+    # 翻页之间插入更新的节目（序号更大）：排在已读的页之前，后续页不重复也不遗漏
+    upsert_episodes(podcast_id, [make_episode(podcast_id, 100)])
+    rest = []
+    after = _page_key(first[-1])
+    while True:
+        page = get_episodes_page(podcast_id=podcast_id, after=after, limit=4)
+        if not page:
+            break
+        rest.extend(page)
+        after = _page_key(page[-1])
+    assert [row['index_number'] for row in first + rest] == list(range(9, -1, -1))
+
+# 下载租约
+
+def test_lease_is_exclusive_until_released(library):
+    assert claim_download_lease(URL, 'a', now=100, ttl=60)
+    assert not claim_download_lease(URL, 'b', now=110, ttl=60)
+    # 持有者再次领取视为续约
+    assert claim_download_lease(URL, 'a', now=120, ttl=60)
+    assert not release_download_lease(URL, 'b')
+    assert release_download_lease(URL, 'a')
+    assert get_download_lease(URL) is None
+    assert claim_download_lease(URL, 'b', now=130, ttl=60)
+
+def test_expired_lease_is_taken_over(library):
+    assert claim_download_lease(URL, 'a', now=100, ttl=60)
+    assert renew_download_lease(URL, 'a', now=150, ttl=60, bytes_done=10, bytes_total=100)
+    # 续约后到期时间为 210
+    assert not claim_download_lease(URL, 'b', now=200, ttl=60)
+    assert claim_download_lease(URL, 'b', now=211, ttl=60)
+    lease = get_download_lease(URL)
+    assert lease['locked_by'] == 'b'
+    # 接管时重置进度，原持有者无法再续约或释放
+    assert (lease['bytes_done'], lease['bytes_total']) == (0, None)
+    assert not renew_download_lease(URL, 'a', now=212, ttl=60)
+    assert not release_download_lease(URL, 'a')
+
+def test_expire_lease_only_by_holder(library):
+    assert claim_download_lease(URL, 'a', now=100, ttl=60)
+    assert not expire_download_lease(URL, 'b')
+    assert not claim_download_lease(URL, 'b', now=101, ttl=60)
+    assert expire_download_lease(URL, 'a')
+    assert claim_download_lease(URL, 'b', now=101, ttl=60)
+
+def test_concurrent_claims_have_one_winner(library):
+    results = _run_threads(8, lambda number: claim_download_lease(URL, f'owner-{number}', now=100, ttl=60))
+    assert results.count(True) == 1
+    assert get_download_lease(URL)['locked_by'] == f'owner-{results.index(True)}'
+
+def test_concurrent_takeover_of_expired_lease_has_one_winner(library):
+    assert claim_download_lease(URL, 'dead', now=100, ttl=60)
+    results = _run_threads(8, lambda number: claim_download_lease(URL, f'owner-{number}', now=200, ttl=60))
+    assert results.count(True) == 1
@@ -0,0 +1,89 @@
+"""对冲请求和传输中切换地址（使用 benchmarks.fake_cdn 在本机模拟主地址和镜像）"""
+import hashlib
+import os
+
+import pytest
+
+pytest.importorskip('requests')
+
+from database import upsert_episodes, get_episodes_by_podcast_id, get_episode_by_id, save_audio_candidates
+from core.downloader import PodcastDownloader, DOWNLOAD_FAILOVERS, DOWNLOAD_MIRROR_MISMATCHES
+from benchmarks.fake_cdn import FakeCDN, id3_tag, synthetic_mp3
+from conftest import make_episode
+
+SIZE = 256 * 1024
+NAME = 'episode'
+
+@pytest.fixture
+def cdn():
+    with FakeCDN(audio_size=SIZE) as server:
+        yield server
+
+def _download(podcast_id, primary, mirrors, hedge_width=2, stall_timeout=1.0):
+    """以 primary 为主地址、mirrors 为备用地址下载一个节目，等待状态落库后返回数据库中的节目"""
+    upsert_episodes(podcast_id, [make_episode(podcast_id, 1, primary)])
+    save_audio_candidates({primary: mirrors})
+    episode = get_episodes_by_podcast_id(podcast_id)[0]
+    downloader = PodcastDownloader()
+    downloader.hedge_width = hedge_width
+    downloader.stall_timeout = stall_timeout
+    result = downloader.download_episode(episode)
+    assert downloader.state_writer.flush(timeout=10)
+    return result, get_episode_by_id(episode.id)
+
+def _expected_hash(size=SIZE):
+    return hashlib.sha256(synthetic_mp3(id3_tag(NAME), 0, size)).hexdigest()
+
+def _total(counter):
+    """计数器所有标签下的合计值"""
+    return sum(value for _, value in counter._samples())
+
+def _part_files(directory):
+    return [name for _, _, names in os.walk(str(directory)) for name in names if name.endswith('.part')]
+
+def _assert_complete(episode, size=SIZE):
+    assert episode.downloaded
+    assert episode.file_size == size
+    assert episode.file_hash == _expected_hash(size)
+    with open(episode.download_path, 'rb') as f:
+        assert hashlib.sha256(f.read()).hexdigest() == _expected_hash(size)
+
+def test_hedge_uses_mirror_when_primary_fails(podcast_id, cdn):
+    result, episode = _download(podcast_id, cdn.audio_url(NAME, error=1), [cdn.audio_url(NAME, host='localhost')])
+    assert result.startswith('成功下载')
+    _assert_complete(episode)
+
+def test_hedge_rejects_mirror_with_different_length(podcast_id, cdn):
+    # 镜像先返回但长度与主地址不同，等主地址返回后核对不一致，改用主地址
+    primary = cdn.audio_url(NAME, latency=0.3)
+    mismatches = _total(DOWNLOAD_MIRROR_MISMATCHES)
+    result, episode = _download(podcast_id, primary, [cdn.audio_url(NAME, host='localhost', size=SIZE // 2)])
+    assert result.startswith('成功下载')
+    _assert_complete(episode)
+    assert _total(DOWNLOAD_MIRROR_MISMATCHES) == mismatches + 1
+
+def test_failover_resumes_from_mirror_after_stall(podcast_id, cdn):
+    # 只先请求主地址；主地址传到一半卡住，超时后从镜像续传剩余部分
+    primary = cdn.audio_url(NAME, stall=3)
+    failovers = _total(DOWNLOAD_FAILOVERS)
+    result, episode = _download(podcast_id, primary, [cdn.audio_url(NAME, host='localhost')], hedge_width=1)
+    assert result.startswith('成功下载')
+    _assert_complete(episode)
+    assert _total(DOWNLOAD_FAILOVERS) == failovers + 1
+
+def test_failover_restarts_when_resumed_total_is_unknown(podcast_id, cdn):
+    # 镜像的续传响应没有给出总长度，无法确认是同一文件：从头重新下载，不拼接两段
+    primary = cdn.audio_url(NAME, stall=3)
+    mirror = cdn.audio_url(NAME, host='localhost', unknown_total=1)
+    result, episode = _download(podcast_id, primary, [mirror], hedge_width=1)
+    assert result.startswith('成功下载')
+    _assert_complete(episode)
+
+def test_failover_gives_up_when_all_candidates_fail(library, podcast_id, cdn):
+    primary = cdn.audio_url(NAME, stall=3)
+    result, episode = _download(podcast_id, primary, [cdn.audio_url(NAME, host='localhost', error=1)], hedge_width=1)
+    assert result.startswith('下载')
+    assert not episode.downloaded
+    assert episode.download_error
+    # 失败时删除临时文件
+    assert _part_files(library) == []
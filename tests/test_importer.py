@@ -0,0 +1,73 @@
+"""批量导入：拒绝格式错误的行、跳过已存在的节目"""
+from database import get_episodes_by_podcast_id, get_all_podcasts
+from core.importer import LibraryImporter
+
+def _import(path, **options):
+    rejects = []
+    importer = LibraryImporter(on_reject=lambda line, reason, raw: rejects.append((line, reason)), **options)
+    return importer.import_file(str(path)), rejects
+
+def _episodes():
+    return [episode for podcast in get_all_podcasts() for episode in get_episodes_by_podcast_id(podcast.id)]
+
+def test_tsv_rejects_invalid_rows_with_line_numbers(library, tmp_path):
+    path = tmp_path / 'shows.tsv'
+    path.write_text('\n'.join([
+        'title\turl\tindex',
+        '第一期\thttps://cdn.example.com/1.mp3\t1',
+        '\thttps://cdn.example.com/2.mp3\t2',
+        '第三期\tftp://cdn.example.com/3.mp3\t3',
+        '第四期\thttps://cdn.example.com/4.mp3\t四',
+        '只有一列',
+        '',
+        '第五期\thttps://cdn.example.com/5.mp3\t5',
+    ]), encoding='utf-8')
+    stats, rejects = _import(path)
+    assert rejects == [(3, '缺少标题'), (4, '链接不是 http(s) 地址'), (5, '序号不是整数'), (6, '列数不足')]
+    assert (stats.rows, stats.inserted, stats.skipped, stats.rejected) == (6, 2, 0, 4)
+    assert sorted(episode.index for episode in _episodes()) == [1, 5]
+
+def test_reimport_skips_existing_episodes(library, tmp_path):
+    path = tmp_path / 'shows.tsv'
+    path.write_text('第一期\thttps://cdn.example.com/1.mp3\n第二期\thttps://cdn.example.com/2.mp3\n', encoding='utf-8')
+    stats, _ = _import(path)
+    assert (stats.inserted, stats.skipped, stats.podcasts_created) == (2, 0, 1)
+
+    path.write_text('第二期\thttps://cdn.example.com/2.mp3\n第三期\thttps://cdn.example.com/3.mp3\n', encoding='utf-8')
+    stats, rejects = _import(path)
+    assert (stats.inserted, stats.skipped, stats.podcasts_created, stats.rejected) == (1, 1, 0, 0)
+    assert rejects == []
+    # 未指定序号的节目接在已有节目之后
+    assert [episode.title for episode in sorted(_episodes(), key=lambda episode: episode.index)] == ['第一期', '第二期', '第三期']
+
+def test_duplicates_across_batches_are_skipped(library, tmp_path):
+    path = tmp_path / 'shows.csv'
+    rows = ['title,url'] + [f'节目 {index % 5},https://cdn.example.com/{index % 5}.mp3' for index in range(12)]
+    path.write_text('\n'.join(rows), encoding='utf-8')
+    stats, _ = _import(path, batch_size=4)
+    assert (stats.rows, stats.inserted, stats.skipped, stats.rejected) == (12, 5, 7, 0)
+    assert len(_episodes()) == 5
+
+def test_csv_format_error_is_reported_and_import_continues(library, tmp_path):
+    path = tmp_path / 'shows.csv'
+    path.write_text('title,url\n"未闭合的引号,https://cdn.example.com/1.mp3\n', encoding='utf-8')
+    stats, rejects = _import(path)
+    assert stats.inserted == 0
+    assert stats.rejected == len(rejects) >= 1
+
+def test_opml_rejects_outlines_without_feed_and_skips_known_podcasts(library, tmp_path):
+    path = tmp_path / 'subscriptions.opml'
+    path.write_text('''<?xml version="1.0" encoding="UTF-8"?>
+<opml version="2.0"><body>
+  <outline text="分组">
+    <outline text="播客甲" xmlUrl="https://example.com/a.xml"/>
+    <outline text="没有地址"/>
+    <outline text="播客乙" xmlUrl="https://example.com/b.xml"/>
+  </outline>
+</body></opml>''', encoding='utf-8')
+    stats, rejects = _import(path)
+    assert rejects == [(None, '缺少订阅地址')]
+    assert (stats.rows, stats.podcasts_created, stats.skipped) == (3, 2, 0)
+
+    stats, _ = _import(path)
+    assert (stats.podcasts_created, stats.skipped) == (0, 2)
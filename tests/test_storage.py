@@ -0,0 +1,118 @@
+"""存储配额清理和并发淘汰"""
+import os
+import threading
+
+import pytest
+
+import database
+from database import (
+    upsert_episodes, get_episodes_by_podcast_id, get_episode_by_id, apply_download_updates,
+    touch_episode_access, set_episode_pinned, get_storage_usage, evict_episode_file
+)
+from core.storage import StorageManager
+from conftest import make_episode
+
+FILE_SIZE = 100
+
+def _download(library, podcast_id, count):
+    """写入 count 个已下载的节目（每个文件 FILE_SIZE 字节），访问时间按序号递增，返回节目列表"""
+    upsert_episodes(podcast_id, [make_episode(podcast_id, index) for index in range(count)])
+    episodes = sorted(get_episodes_by_podcast_id(podcast_id), key=lambda episode: episode.index)
+    updates = []
+    for episode in episodes:
+        path = os.path.join(str(library), f'{episode.index}.mp3')
+        with open(path, 'wb') as f:
+            f.write(b'\0' * FILE_SIZE)
+        updates.append({'episode_id': episode.id, 'downloaded': True, 'download_path': path, 'file_size': FILE_SIZE})
+    apply_download_updates(updates)
+    for episode in episodes:
+        touch_episode_access(episode.id, 1000 + episode.index)
+    return [get_episode_by_id(episode.id) for episode in episodes]
+
+def _remaining(episodes):
+    return [episode.index for episode in episodes if get_episode_by_id(episode.id).downloaded]
+
+def test_make_room_evicts_least_recently_used(library, podcast_id):
+    episodes = _download(library, podcast_id, 10)
+    storage = StorageManager(quota_bytes=10 * FILE_SIZE, download_dir=str(library))
+    assert storage.make_room(3 * FILE_SIZE) == (3, 3 * FILE_SIZE)
+    assert _remaining(episodes) == list(range(3, 10))
+    assert not os.path.exists(episodes[0].download_path)
+    assert os.path.exists(episodes[3].download_path)
+    assert get_storage_usage() == {'bytes': 7 * FILE_SIZE, 'files': 7}
+
+def test_make_room_skips_pinned_episodes(library, podcast_id):
+    episodes = _download(library, podcast_id, 4)
+    set_episode_pinned(episodes[0].id, True)
+    storage = StorageManager(quota_bytes=4 * FILE_SIZE, download_dir=str(library))
+    storage.make_room(FILE_SIZE)
+    assert _remaining(episodes) == [0, 2, 3]
+
+def test_make_room_refuses_file_larger_than_quota(library, podcast_id):
+    episodes = _download(library, podcast_id, 5)
+    storage = StorageManager(quota_bytes=5 * FILE_SIZE, download_dir=str(library))
+    with pytest.raises(ValueError):
+        storage.make_room(6 * FILE_SIZE)
+    # 不为放不下的文件清空整个库
+    assert _remaining(episodes) == list(range(5))
+
+def test_make_room_never_empties_below_zero_target(library, podcast_id):
+    episodes = _download(library, podcast_id, 5)
+    storage = StorageManager(quota_bytes=5 * FILE_SIZE, download_dir=str(library))
+    # 文件恰好等于配额时清空已有文件，但不会出错或多删
+    assert storage.make_room(5 * FILE_SIZE) == (5, 5 * FILE_SIZE)
+    assert get_storage_usage() == {'bytes': 0, 'files': 0}
+    assert _remaining(episodes) == []
+
+def test_concurrent_make_room_does_not_over_evict(library, podcast_id):
+    _download(library, podcast_id, 20)
+    storage = StorageManager(quota_bytes=20 * FILE_SIZE, download_dir=str(library))
+    barrier = threading.Barrier(6)
+    results = []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(storage.make_room(5 * FILE_SIZE))
+        finally:
+            database.close_db_connection()
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 各线程看到的旧用量都超出配额，但合计只清理到 15 个文件为止
+    assert sum(files for files, _ in results) == 5
+    assert get_storage_usage() == {'bytes': 15 * FILE_SIZE, 'files': 15}
+    assert len(os.listdir(str(library))) == 15
+
+def test_concurrent_evictions_of_same_file_have_one_winner(library, podcast_id):
+    episode = _download(library, podcast_id, 1)[0]
+    barrier = threading.Barrier(4)
+    results = []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(evict_episode_file(episode.id, episode.download_path))
+        finally:
+            database.close_db_connection()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+    assert get_storage_usage() == {'bytes': 0, 'files': 0}
+
+def test_evict_with_stale_path_keeps_redownloaded_file(library, podcast_id):
+    episode = _download(library, podcast_id, 1)[0]
+    # 淘汰候选读出后节目被重新下载到了新路径
+    new_path = os.path.join(str(library), 'redownloaded.mp3')
+    apply_download_updates([{'episode_id': episode.id, 'downloaded': True, 'download_path': new_path, 'file_size': 50}])
+    assert not evict_episode_file(episode.id, episode.download_path)
+    current = get_episode_by_id(episode.id)
+    assert (current.downloaded, current.download_path) == (True, new_path)
+    assert get_storage_usage() == {'bytes': 50, 'files': 1}